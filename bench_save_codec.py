@@ -0,0 +1,92 @@
+"""조선거상 미니 세이브 인코딩 벤치마크
+
+Player_Data의 inventory/mercs 칸을 예전 JSON으로 쓸 때와 save_codec 압축 형식(z2)으로 쓸 때의
+칸 길이(글자 수)와 인코딩/디코딩 시간을 비교합니다. 아이템 종류 수와 보유 품목 수, 용병 수를
+바꿔 가며 측정하고, 구글 시트 한 칸의 글자 수 한도(50,000자)에 얼마나 가까운지도 같이 보여 줍니다.
+
+    python bench_save_codec.py
+    python bench_save_codec.py --items 50 500 5000 --held 0.5 --mercs 5 50 500
+"""
+import argparse
+import json
+import random
+import time
+
+from domain import Catalog, Inventory, MercRoster
+from save_codec import decode_counts, decode_inventory, decode_mercs, encode_counts, encode_inventory, encode_mercs
+
+SHEETS_CELL_LIMIT = 50000
+
+
+def make_catalog(n_items, n_mercs=8):
+    items = {f"품목{i}": {'base': 100 + i, 'w': 1 + i % 5} for i in range(n_items)}
+    mercs = {f"용병{i}": {'price': 1000 * (i + 1), 'w_bonus': 50} for i in range(n_mercs)}
+    return Catalog(items, mercs)
+
+
+def timed(fn, arg, repeat):
+    # repeat회 실행한 평균 마이크로초
+    t = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - t) / repeat * 1e6
+
+
+def row(label, old, new, value, repeat):
+    # old/new: (인코딩 함수, 디코딩 함수) → [이름, 글자 수, 인코딩 µs, 디코딩 µs, ...]
+    out = [label]
+    for encode, decode in (old, new):
+        text = encode(value)
+        out += [len(text), timed(encode, value, repeat), timed(decode, text, repeat)]
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="세이브 칸 JSON ↔ 압축 형식 비교")
+    parser.add_argument("--items", type=int, nargs="+", default=[20, 200, 2000], help="아이템 종류 수")
+    parser.add_argument("--held", type=float, default=0.6, help="보유 중인 품목 비율")
+    parser.add_argument("--mercs", type=int, nargs="+", default=[5, 50, 500], help="용병 수")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    rows = []
+    for n in args.items:
+        catalog = make_catalog(n)
+        names = rng.sample(catalog.item_names, max(1, int(n * args.held)))
+        inv = Inventory(catalog, {name: rng.randint(1, 20000) for name in names})
+        rows.append(row(
+            f"인벤토리 {n}종 중 {len(names)}종",
+            (lambda i: json.dumps(i.to_dict(), ensure_ascii=False), json.loads),
+            (lambda i, c=catalog: encode_inventory(i, c), lambda t, c=catalog: decode_inventory(t, c.item_names)),
+            inv, args.repeat))
+
+    catalog = make_catalog(10)
+    for n in args.mercs:
+        mercs = MercRoster(rng.choice(catalog.merc_names[:3]) for _ in range(n))
+        rows.append(row(
+            f"용병 {n}명",
+            (lambda m: json.dumps(m.to_list(), ensure_ascii=False), json.loads),
+            (lambda m: encode_mercs(m, catalog), lambda t: decode_mercs(t, catalog.merc_names)),
+            mercs, args.repeat))
+
+    # 예전 저장(JSON)과 지금 저장(encode_inventory/encode_mercs: 작은 값은 JSON이 짧으면 JSON)
+    print(f"{'':<22} {'JSON 글자':>9} {'인코딩':>9} {'디코딩':>9} | {'저장 글자':>8} {'인코딩':>9} {'디코딩':>9} | "
+          f"{'줄어듦':>6}  (시간은 µs)")
+    for label, jl, je, jd, zl, ze, zd in rows:
+        print(f"{label:<22} {jl:>9,} {je:>9.1f} {jd:>9.1f} | {zl:>8,} {ze:>9.1f} {zd:>9.1f} | "
+              f"{1 - zl / jl:>6.0%}" + ("  ⚠️ JSON은 시트 한 칸 한도 초과" if jl > SHEETS_CELL_LIMIT else ""))
+
+    # 같은 값으로 되돌아오는지 확인
+    catalog = make_catalog(max(args.items))
+    counts = {name: rng.randint(1, 10 ** 9) for name in catalog.item_names[::3]}
+    assert decode_counts(encode_counts(counts)) == counts
+    # 시트에서 행을 끼워 넣거나 순서를 바꿔도 이름으로 읽힘
+    inv = Inventory(catalog, counts)
+    shuffled = make_catalog(0)
+    assert decode_inventory(encode_inventory(inv, catalog), shuffled.item_names) == counts
+
+
+if __name__ == "__main__":
+    main()
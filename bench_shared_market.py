@@ -0,0 +1,108 @@
+"""공유 시장 동시 거래 처리량 벤치마크
+
+SharedMarket.buy/sell(마을별 잠금)을 여러 스레드에서 동시에 호출해 초당 체결 수를 잽니다.
+마을별 잠금(striped)과 전역 잠금 1개(global)를, 거래가 여러 마을에 흩어진 경우(spread)와
+한 마을에 몰린 경우(hot)로 나눠 비교합니다.
+
+    python bench_shared_market.py --threads 1 2 4 8 --seconds 2
+    python bench_shared_market.py --hold-us 200   # 잠금 안에서 I/O가 있는 경우를 흉내
+"""
+import argparse
+import random
+import threading
+import time
+
+from price_curve import PriceCurve
+from shared_market import SharedMarket
+
+# update_prices와 같은 재고 구간
+PRICE_TIER_BOUNDS = [100, 500, 1000, 2000, 5000]
+PRICE_TIER_FACTORS = [2.0, 1.5, 1.2, 1.0, 0.8, 0.6]
+
+
+def make_market(n_villages, n_items, stock=3000):
+    return {f"마을{v}": {f"품목{i}": {'stock': stock, 'price': 100} for i in range(n_items)}
+            for v in range(n_villages)}
+
+
+def make_curve(base):
+    return PriceCurve(PRICE_TIER_BOUNDS, PRICE_TIER_FACTORS).compile(base)
+
+
+def run(market, n_threads, seconds, hot, hold):
+    villages = list(market)
+    items = list(market[villages[0]])
+    curve = make_curve(100)
+    counts = [0] * n_threads
+    stop = threading.Event()
+    start = threading.Barrier(n_threads + 1)
+
+    if hold:
+        # 잠금 안에서 hold초 동안 머무는 거래 (저장/로그 기록 등을 흉내)
+        def buy(v, i, q):
+            with market.lock_for(v):
+                time.sleep(hold)
+                cell = market[v][i]
+                n = min(q, cell['stock'])
+                cell['stock'] -= n
+                return n, curve.price(cell['stock'])
+
+        def sell(v, i, q):
+            with market.lock_for(v):
+                time.sleep(hold)
+                market[v][i]['stock'] += q
+                return q, curve.price(market[v][i]['stock'])
+    else:
+        def buy(v, i, q):
+            return market.buy(v, i, q, 10 ** 12, 10 ** 9, curve)
+
+        def sell(v, i, q):
+            return market.sell(v, i, q, curve)
+
+    def worker(idx):
+        rng = random.Random(idx)
+        home = villages[idx % len(villages)]
+        n = 0
+        start.wait()
+        while not stop.is_set():
+            v = villages[0] if hot else (home if rng.random() < 0.8 else rng.choice(villages))
+            i = rng.choice(items)
+            q = rng.randint(1, 50)
+            bought, _ = buy(v, i, q)
+            sell(v, i, bought)
+            n += 2
+        counts[idx] = n
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(n_threads)]
+    for t in threads:
+        t.start()
+    start.wait()
+    t0 = time.perf_counter()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(counts) / (time.perf_counter() - t0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="공유 시장 동시 거래 처리량")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--villages", type=int, default=8)
+    parser.add_argument("--items", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--hold-us", type=float, default=0.0, help="잠금 안에서 머무는 시간(마이크로초)")
+    args = parser.parse_args(argv)
+    hold = args.hold_us / 1e6
+
+    print(f"마을 {args.villages}개 × 품목 {args.items}개, 측정 {args.seconds}초, 잠금 내 대기 {args.hold_us}µs")
+    print(f"{'스레드':>6} {'striped/spread':>15} {'global/spread':>14} {'striped/hot':>12}  (체결/초)")
+    for n in args.threads:
+        striped = run(SharedMarket(make_market(args.villages, args.items)), n, args.seconds, False, hold)
+        single = run(SharedMarket(make_market(args.villages, args.items), stripes=1), n, args.seconds, False, hold)
+        hot = run(SharedMarket(make_market(args.villages, args.items)), n, args.seconds, True, hold)
+        print(f"{n:>6} {striped:>15,.0f} {single:>14,.0f} {hot:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
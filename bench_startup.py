@@ -0,0 +1,113 @@
+"""조선거상 미니 콜드 스타트 벤치마크
+
+1) import 시간: 새 파이썬 프로세스에서 게임 스크립트가 시작할 때 불러오는 모듈의 import 시간을
+   재고, 예전처럼 gspread/google-auth까지 바로 불러올 때와 비교합니다.
+2) 첫 화면 시간: 가짜 시트(loadtest.py)에 인증 지연을 넣고 AppTest로 스크립트를 새 프로세스에서
+   한 번 실행해, 실행 시작부터 타이틀(st.title)이 그려지기까지와 실행 완료까지의 시간을 잽니다.
+   로컬 설정 사본이 없을 때(첫 배포)와 있을 때를 나눠 측정합니다.
+
+    python bench_startup.py --repeat 5 --auth-latency 1.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 스크립트가 첫 화면 전에 불러오는 모듈
+APP_MODULES = ["streamlit", "streamlit_autorefresh", "sheets_client", "session_store", "limit_orders",
+               "shared_market", "liquidation", "domain", "sheet_cache", "ledger", "trade_history", "game_config",
+               "config_snapshot", "price_curve", "market_events", "game_rules", "trade_worker",
+               "session_replay", "save_codec", "leaderboard"]
+# 예전에는 시작 시 함께 불러오던 모듈
+EAGER_MODULES = ["gspread", "google.oauth2.service_account"]
+
+
+def measure_imports(modules, repeat):
+    code = ("import time, importlib; t = time.perf_counter()\n"
+            f"for m in {modules!r}: importlib.import_module(m)\n"
+            "print(time.perf_counter() - t)")
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def child(snapshot_path, auth_latency):
+    # 새 프로세스에서 스크립트를 한 번 실행하고 {'first_paint', 'run'} 초를 출력
+    sys.path.insert(0, APP_DIR)
+    import streamlit as st
+    import loadtest
+    import sheets_client
+    from streamlit.testing.v1 import AppTest
+
+    spreadsheet = loadtest.FakeSpreadsheet()
+    loadtest.install_fake_sheets(spreadsheet)
+
+    def slow_authorize(*args, **kwargs):
+        time.sleep(auth_latency)   # OAuth 토큰 교환 + 스프레드시트 열기
+        return loadtest.FakeClient(spreadsheet)
+    sheets_client.authorize = slow_authorize
+
+    marks = {}
+    title = st.title
+
+    def timed_title(*args, **kwargs):
+        marks.setdefault('first_paint', time.perf_counter())
+        return title(*args, **kwargs)
+    st.title = timed_title
+
+    at = AppTest.from_file(loadtest.APP_PATH, default_timeout=60)
+    at.secrets["gspread"] = {}
+    at.secrets["startup"] = {"config_snapshot": snapshot_path}
+    start = time.perf_counter()
+    at.run()
+    end = time.perf_counter()
+    if at.exception:
+        raise SystemExit(f"스크립트 예외: {at.exception}")
+    print(json.dumps({'first_paint': marks.get('first_paint', end) - start, 'run': end - start}))
+
+
+def run_child(snapshot_path, auth_latency):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", snapshot_path, str(auth_latency)],
+                         cwd=APP_DIR, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def fmt(samples):
+    return f"p50 {statistics.median(samples) * 1000:7.0f}ms  min {min(samples) * 1000:7.0f}ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="콜드 스타트(import / 첫 화면) 측정")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--auth-latency", type=float, default=1.5, help="가짜 인증+열기 지연(초)")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        child(args.child[0], float(args.child[1]))
+        return
+
+    print(f"[import] {args.repeat}회, 새 프로세스")
+    print(f"  지연 import (현재)      {fmt(measure_imports(APP_MODULES, args.repeat))}")
+    print(f"  gspread/google-auth 포함 {fmt(measure_imports(APP_MODULES + EAGER_MODULES, args.repeat))}")
+
+    print(f"[첫 화면] 인증 지연 {args.auth_latency}초, {args.repeat}회, 새 프로세스")
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, "config_snapshot.bin")
+        # 사본 없음: 매번 존재하지 않는 경로를 사용
+        cold = [run_child(os.path.join(tmp, f"missing{i}.bin"), args.auth_latency) for i in range(args.repeat)]
+        run_child(snapshot, 0.0)   # 사본 만들기
+        warm = [run_child(snapshot, args.auth_latency) for _ in range(args.repeat)]
+    for name, rows in (("사본 없음", cold), ("로컬 사본 있음", warm)):
+        print(f"  {name:<10} 타이틀 {fmt([r['first_paint'] for r in rows])} | 실행 완료 {fmt([r['run'] for r in rows])}")
+
+
+if __name__ == "__main__":
+    main()
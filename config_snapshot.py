@@ -0,0 +1,209 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections.abc import Mapping
+
+from game_config import PARSERS, split_parsed
+
+# --- 공유 설정 스냅샷 ---
+# 시트 설정과 그로부터 만든 파생 구조(시장 초기 재고표, 마을 거리 행렬, 품목별 가격표)를
+# 파일 하나에 써 두고, 같은 호스트의 모든 워커 프로세스가 읽기 전용 mmap으로 붙어 씁니다.
+# 숫자 배열은 파일에서 바로 memoryview로 읽으므로 프로세스마다 다시 계산하거나 복사하지 않습니다.
+#
+# 파일 구조: MAGIC | 헤더 길이(u32) | 헤더 JSON | 8바이트 정렬 | 배열 구역들
+#   distance: float64 [마을 × 마을]
+#   stock:    int64   [마을 × 품목]  (-1 = 그 마을에서 거래하지 않음)
+#   price:    int64   [품목 × 가격 구간]  (price_curve로 컴파일한 구간별 단가)
+
+MAGIC = b"JSGSNAP1"
+MARKET_EXCLUDED = ("용병 고용소",)
+
+
+def build_distance(village_names, villages):
+    flat = array('d')
+    for a in village_names:
+        ax, ay = villages[a]['x'], villages[a]['y']
+        for b in village_names:
+            bx, by = villages[b]['x'], villages[b]['y']
+            flat.append(((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5)
+    return flat
+
+
+def build_stock(village_names, item_names, villages):
+    flat = array('q')
+    for v in village_names:
+        stocks = villages[v]['items']
+        flat.extend(int(stocks[i]) if i in stocks else -1 for i in item_names)
+    return flat
+
+
+def build_price(item_names, items_info, curve):
+    flat = array('q')
+    for i in item_names:
+        flat.extend(curve.compile(items_info[i]['base']).prices)
+    return flat
+
+
+def publish(path, revision, rows, parsed, curve):
+    # curve: 설정으로 만든 price_curve.PriceCurve
+    # 새 스냅샷을 임시 파일에 다 쓴 뒤 이름을 바꿔 교체 (이미 붙어 있는 워커는 이전 파일을 계속 사용)
+    settings, items_info, merc_data, villages, initial_stocks, slots = parsed
+    village_names = list(villages)
+    item_names = list(items_info)
+    sections = {
+        'distance': ('d', [len(village_names), len(village_names)], build_distance(village_names, villages)),
+        'stock': ('q', [len(village_names), len(item_names)], build_stock(village_names, item_names, villages)),
+        'price': ('q', [len(item_names), len(curve.factors)], build_price(item_names, items_info, curve)),
+    }
+    header = {
+        'revision': revision,
+        'created': time.time(),
+        'villages': village_names,
+        'items': item_names,
+        'tier_bounds': list(curve.bounds),
+        'rows': rows,
+        'parsed': [settings, items_info, merc_data, villages, initial_stocks, slots],
+        'sections': {},
+    }
+    # 구역 오프셋은 헤더 뒤 (8바이트 정렬된) 배열 시작 위치 기준
+    offset = 0
+    for name, (code, shape, data) in sections.items():
+        header['sections'][name] = [offset, len(data), code, shape]
+        offset += len(data) * data.itemsize
+    head = json.dumps(header, ensure_ascii=False).encode()
+    start = _align(len(MAGIC) + 4 + len(head))
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(head)))
+        f.write(head)
+        f.write(b"\0" * (start - len(MAGIC) - 4 - len(head)))
+        for _, (_, _, data) in sections.items():
+            f.write(data.tobytes())
+    os.replace(tmp, path)
+
+
+def _align(n, to=8):
+    return (n + to - 1) // to * to
+
+
+class DistanceRow(Mapping):
+    __slots__ = ('matrix', 'row')
+
+    def __init__(self, matrix, row):
+        self.matrix = matrix
+        self.row = row
+
+    def __getitem__(self, name):
+        m = self.matrix
+        return m.flat[self.row * m.n + m.index[name]]
+
+    def __iter__(self):
+        return iter(self.matrix.index)
+
+    def __len__(self):
+        return self.matrix.n
+
+
+class DistanceMatrix(Mapping):
+    # dist[a][b] 모양으로 쓰는 거리 행렬 (mmap 위의 float64 배열을 그대로 읽음)
+    def __init__(self, names, flat):
+        self.index = {name: i for i, name in enumerate(names)}
+        self.n = len(names)
+        self.flat = flat
+
+    def __getitem__(self, name):
+        return DistanceRow(self, self.index[name])
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return self.n
+
+
+class ConfigSnapshot:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"설정 스냅샷 형식이 아닙니다: {path}")
+        head_len, = struct.unpack_from("<I", self.mm, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self.mm[start:start + head_len])
+        self.revision = header['revision']
+        self.created = header['created']
+        self.village_names = header['villages']
+        self.item_names = header['items']
+        self.item_index = {name: i for i, name in enumerate(self.item_names)}
+        self.tier_bounds = header['tier_bounds']
+        self.rows = header['rows']
+        self.parsed = tuple(header['parsed'])
+        self.villages_key = tuple((v, d['x'], d['y']) for v, d in self.parsed[3].items())
+        base = _align(start + head_len)
+        view = memoryview(self.mm)
+        self.sections = {}
+        for name, (offset, count, code, shape) in header['sections'].items():
+            size = array(code).itemsize
+            self.sections[name] = view[base + offset:base + offset + count * size].cast(code)
+        self.distances = DistanceMatrix(self.village_names, self.sections['distance'])
+
+    def memo(self):
+        # SheetRevisionCache가 그대로 쓸 수 있는 {이름: (워크시트들, 파싱 결과)}
+        parsed = split_parsed(self.parsed)
+        parsed['villages'] = tuple(parsed['villages'])
+        return {name: (titles, parsed[name]) for name, _, titles in PARSERS}
+
+    def price(self, item, stock):
+        # 스냅샷 시점의 가격표로 재고 stock일 때의 단가
+        n_tiers = len(self.tier_bounds) + 1
+        return self.sections['price'][self.item_index[item] * n_tiers + bisect_right(self.tier_bounds, stock)]
+
+    def market_template(self):
+        # build_market_data + update_prices 결과와 같은 새 시장 dict (세션마다 수정하므로 매번 새로 만듦)
+        stock = self.sections['stock']
+        n_items = len(self.item_names)
+        villages = self.parsed[3]
+        market = {}
+        for vi, v in enumerate(self.village_names):
+            if v in MARKET_EXCLUDED:
+                continue
+            cells = {}
+            # 품목 순서는 마을 시트의 열 순서를 따름 (화면 표시 순서 유지)
+            for item in villages[v]['items']:
+                s = stock[vi * n_items + self.item_index[item]]
+                cells[item] = {'stock': s, 'price': self.price(item, s)}
+            market[v] = cells
+        return market
+
+
+class SnapshotFile:
+    # 경로의 스냅샷에 붙어 있다가, 다른 프로세스가 새로 게시하면 다음 조회 때 다시 붙음
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.stat_key = None
+        self.snapshot = None
+        self.attaches = 0
+
+    def current(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self.lock:
+            if key != self.stat_key:
+                try:
+                    self.snapshot = ConfigSnapshot(self.path)
+                except (OSError, ValueError):
+                    self.snapshot = None
+                self.stat_key = key
+                self.attaches += 1
+            return self.snapshot
@@ -0,0 +1,228 @@
+import sys
+from collections import Counter
+from collections.abc import MutableMapping
+from dataclasses import dataclass, field
+from operator import mul
+
+# --- 게임 도메인 모델 ---
+# 시트에서 읽은 아이템/용병/마을/플레이어 dict를 로드 시점에 한 번 변환한 타입.
+# 이름은 sys.intern으로 공유하고 정수 id를 붙여, 반복 계산(무게, 용병 수)을
+# dict 조회 대신 리스트 인덱스와 Counter로 처리합니다.
+# UI 코드가 그대로 동작하도록 item['base'], player['inv'] 같은 dict 방식 접근도 지원합니다.
+
+
+class _DictAccess:
+    # obj['field'] → obj.field (기존 dict 기반 코드 호환)
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+@dataclass(frozen=True, slots=True)
+class ItemSpec(_DictAccess):
+    id: int
+    name: str
+    base: int
+    w: int
+
+
+@dataclass(frozen=True, slots=True)
+class MercSpec(_DictAccess):
+    id: int
+    name: str
+    price: int
+    w_bonus: int
+
+
+@dataclass(frozen=True, slots=True)
+class VillageSpec(_DictAccess):
+    id: int
+    name: str
+    x: int
+    y: int
+    items: dict     # {아이템명: 초기 재고}
+
+
+class Catalog:
+    # 아이템/용병/마을 정의와 이름 ↔ id 매핑 (모든 세션이 공유, 변경 금지)
+    __slots__ = ('items', 'mercs', 'villages', 'item_names', 'item_ids', 'weights', 'merc_names', 'merc_ids')
+
+    def __init__(self, items_info, merc_data, villages=None):
+        self.item_names = [sys.intern(name) for name in items_info]
+        self.item_ids = {name: i for i, name in enumerate(self.item_names)}
+        self.items = {name: ItemSpec(i, name, int(items_info[name]['base']), int(items_info[name]['w']))
+                      for i, name in enumerate(self.item_names)}
+        self.weights = [self.items[name].w for name in self.item_names]
+        self.merc_names = [sys.intern(name) for name in merc_data]
+        self.merc_ids = {name: i for i, name in enumerate(self.merc_names)}
+        self.mercs = {name: MercSpec(i, name, int(merc_data[name]['price']), int(merc_data[name]['w_bonus']))
+                      for i, name in enumerate(self.merc_names)}
+        self.villages = {}
+        for i, (name, v) in enumerate((villages or {}).items()):
+            name = sys.intern(name)
+            stocks = {sys.intern(item): stock for item, stock in v['items'].items()}
+            self.villages[name] = VillageSpec(i, name, int(v['x']), int(v['y']), stocks)
+
+
+class Inventory(MutableMapping):
+    # 아이템 id로 인덱싱하는 수량 배열. 매핑으로는 {아이템명: 수량} (수량 0은 생략)
+    __slots__ = ('catalog', 'counts', 'extra')
+
+    def __init__(self, catalog, data=None):
+        self.catalog = catalog
+        self.counts = [0] * len(catalog.item_names)
+        self.extra = {}     # 시트에서 빠진 아이템 (저장 시 그대로 보존)
+        if data:
+            self.update(data)
+
+    def __getitem__(self, name):
+        i = self.catalog.item_ids.get(name)
+        qty = self.counts[i] if i is not None else self.extra.get(name, 0)
+        if not qty:
+            raise KeyError(name)
+        return qty
+
+    def get(self, name, default=None):
+        i = self.catalog.item_ids.get(name)
+        qty = self.counts[i] if i is not None else self.extra.get(name, 0)
+        return qty if qty else default
+
+    def __setitem__(self, name, qty):
+        i = self.catalog.item_ids.get(name)
+        if i is not None:
+            self.counts[i] = int(qty)
+        elif qty:
+            self.extra[name] = int(qty)
+        else:
+            self.extra.pop(name, None)
+
+    def __delitem__(self, name):
+        self[name] = 0
+
+    def __iter__(self):
+        names = self.catalog.item_names
+        for i, qty in enumerate(self.counts):
+            if qty:
+                yield names[i]
+        yield from list(self.extra)
+
+    def __len__(self):
+        return sum(1 for qty in self.counts if qty) + len(self.extra)
+
+    def clear(self):
+        self.counts = [0] * len(self.counts)
+        self.extra = {}
+
+    def total_weight(self):
+        return sum(map(mul, self.counts, self.catalog.weights))
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"Inventory({self.to_dict()!r})"
+
+
+class MercRoster:
+    # 용병 이름별 인원 Counter. 예전 리스트처럼 len/반복/append도 지원
+    __slots__ = ('counter',)
+
+    def __init__(self, names=()):
+        self.counter = Counter(sys.intern(n) for n in names)
+
+    def count(self, name):
+        return self.counter[name]
+
+    def counts(self):
+        return self.counter
+
+    def append(self, name):
+        self.counter[sys.intern(name)] += 1
+
+    def remove(self, name):
+        if self.counter[name] <= 0:
+            raise ValueError(name)
+        self.counter[name] -= 1
+        if not self.counter[name]:
+            del self.counter[name]
+
+    def __len__(self):
+        return sum(self.counter.values())
+
+    def __iter__(self):
+        return self.counter.elements()
+
+    def __bool__(self):
+        return bool(self.counter)
+
+    def to_list(self):
+        return list(self.counter.elements())
+
+    def __repr__(self):
+        return f"MercRoster({dict(self.counter)!r})"
+
+
+@dataclass(slots=True)
+class Player(_DictAccess):
+    slot: int
+    money: int
+    pos: str
+    inv: Inventory
+    mercs: MercRoster
+    week: int = 1
+    month: int = 1
+    year: int = 1592
+    last_save: str = ''
+    extra: dict = field(default_factory=dict)   # 이후 기능이 추가하는 필드
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            try:
+                return self.extra[key]
+            except KeyError:
+                raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key in self.__slots__:
+            setattr(self, key, value)
+        else:
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return key in self.__slots__ or key in self.extra
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    @classmethod
+    def from_record(cls, record, catalog):
+        # load_game_data의 슬롯 dict → Player
+        return cls(
+            slot=int(record['slot']),
+            money=int(record['money']),
+            pos=sys.intern(str(record['pos'])),
+            inv=Inventory(catalog, record.get('inv') or {}),
+            mercs=MercRoster(record.get('mercs') or []),
+            week=int(record.get('week', 1)),
+            month=int(record.get('month', 1)),
+            year=int(record.get('year', 1592)),
+            last_save=str(record.get('last_save', '')),
+        )
@@ -0,0 +1,392 @@
+"""조선거상 미니 명령 API
+
+브라우저 없이 게임 상태에 명령을 묶음으로 보내는 인터페이스입니다 (자동 매매 봇, 회귀 테스트용).
+명령은 화면과 같은 규칙(game_rules.py: 100개 단위 체결, 이동비, 용병 인원 제한)으로 실행되고,
+결과와 함께 바뀐 상태만 담은 diff를 돌려줍니다. Streamlit 재실행이 없으므로 초당 수천 개를 처리합니다.
+
+명령 형식 (한 명령에 키 하나):
+    [{"buy": {"item": "쌀", "qty": 100}}, {"move": "개성"}, {"sell": {"item": "쌀", "qty": 100}},
+     {"hire": "짐꾼"}, {"fire": "짐꾼"}, {"save": {}}]
+
+    python game_api.py serve --port 8765             # prewarm.py가 만든 설정 스냅샷 사용
+    python game_api.py serve --fake                  # 인증 없이 loadtest.py의 가짜 시트 사용
+    python game_api.py bench --commands 20000
+    curl -d '[{"buy": {"item": "쌀", "qty": 10}}]' localhost:8765/slots/1/commands
+"""
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from domain import Catalog, Player
+from game_rules import MERC_CAMP, buy_batches, sell_batches, move, hire, fire, save_player
+from leaderboard import DEFAULT_PATH as LEADERBOARD_PATH, Leaderboard
+from limit_orders import BUY, SELL
+from price_curve import compile_prices
+from shared_market import SharedMarket
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class GameWorld:
+    # 시트 설정 하나로 만든 카탈로그/가격표/거리표 (모든 세션이 공유, 변경 금지)
+    def __init__(self, settings, items_info, merc_data, villages, initial_stocks, slots=()):
+        self.settings = settings
+        self.catalog = Catalog(items_info, merc_data, villages)
+        self.items_info = self.catalog.items
+        self.merc_data = self.catalog.mercs
+        self.villages = self.catalog.villages
+        self.initial_stocks = initial_stocks
+        _, self.curves = compile_prices(settings, items_info)
+        self.distances = {
+            a: {b: math.sqrt((va.x - vb.x) ** 2 + (va.y - vb.y) ** 2) for b, vb in self.villages.items()}
+            for a, va in self.villages.items()
+        }
+        self.slots = {int(s['slot']): s for s in slots}
+        self.shared = SharedMarket(self.new_market()) if settings.get('shared_market', 0) >= 1 else None
+
+    @classmethod
+    def from_parsed(cls, data):
+        # load_game_data / parse_game_data의 6개 반환값
+        return cls(*data)
+
+    def new_market(self):
+        # build_market_data + update_prices와 같은 초기 시장
+        return {
+            v: {item: {'stock': stock, 'price': self.curves[item].price(stock)} for item, stock in spec['items'].items()}
+            for v, spec in self.villages.items() if v != MERC_CAMP
+        }
+
+    def session(self, slot, **kwargs):
+        if slot not in self.slots:
+            raise KeyError(f"없는 슬롯입니다: {slot}")
+        if self.slots[slot].get('load_error'):
+            raise ValueError(f"슬롯 {slot}의 세이브를 읽지 못했습니다: {self.slots[slot]['load_error']}")
+        player = Player.from_record(self.slots[slot], self.catalog)
+        market = self.shared if self.shared is not None else self.new_market()
+        return GameSession(self, player, market, **kwargs)
+
+
+class GameSession:
+    # 플레이어 한 명의 상태 + 명령 실행. 같은 세션에 동시에 명령을 보내면 순서대로 처리
+    def __init__(self, world, player, market_data, on_save=None, on_trade=None, device_id="api", events=None):
+        self.world = world
+        self.player = player
+        self.market_data = market_data
+        # 시장 충격 엔진 (공유 시장이면 시장에 붙은 것)
+        self.events = events if events is not None else getattr(market_data, 'events', None)
+        self.on_save = on_save          # on_save(player, device_id, market_data) → 저장 여부
+        self.on_trade = on_trade        # on_trade(player, side, village, item, fills)
+        self.device_id = device_id
+        self.lock = threading.Lock()
+        self.commands = 0
+        self.handlers = {
+            'buy': self._buy, 'sell': self._sell, 'move': self._move,
+            'hire': self._hire, 'fire': self._fire, 'save': self._save,
+        }
+
+    def state(self):
+        p = self.player
+        return {
+            'slot': p['slot'], 'money': p['money'], 'pos': p['pos'],
+            'inv': p['inv'].to_dict(), 'mercs': dict(p['mercs'].counts()),
+            'week': p['week'], 'month': p['month'], 'year': p['year'],
+        }
+
+    def execute(self, commands, stop_on_error=True):
+        # 반환 {'results': [명령별 결과], 'diff': 바뀐 상태만 [이전, 이후]}
+        with self.lock:
+            before = self.state()
+            cells = {}          # 명령이 건드린 시장 칸의 이전 (재고, 가격)
+            results = []
+            for command in commands:
+                try:
+                    if not isinstance(command, dict) or len(command) != 1:
+                        raise ValueError("명령은 {\"종류\": 인자} 형식이어야 합니다.")
+                    (op, arg), = command.items()
+                    if op not in self.handlers:
+                        raise ValueError(f"알 수 없는 명령입니다: {op}")
+                    results.append({'ok': True, op: self.handlers[op](arg, cells)})
+                except (ValueError, KeyError, TypeError) as e:
+                    results.append({'ok': False, 'error': str(e)})
+                    if stop_on_error:
+                        break
+            self.commands += len(results)
+            return {'results': results, 'diff': self._diff(before, self.state(), cells)}
+
+    def _diff(self, before, after, cells):
+        diff = {}
+        for key in ('money', 'pos', 'week', 'month', 'year'):
+            if before[key] != after[key]:
+                diff[key] = [before[key], after[key]]
+        for key in ('inv', 'mercs'):
+            changed = {k: [before[key].get(k, 0), after[key].get(k, 0)]
+                       for k in before[key].keys() | after[key].keys()
+                       if before[key].get(k, 0) != after[key].get(k, 0)}
+            if changed:
+                diff[key] = changed
+        market = {}
+        for (v, item), (stock, price) in cells.items():
+            cell = self.market_data[v][item]
+            if (stock, price) != (cell['stock'], cell['price']):
+                market.setdefault(v, {})[item] = {'stock': [stock, cell['stock']], 'price': [price, cell['price']]}
+        if market:
+            diff['market'] = market
+        return diff
+
+    def _trade_args(self, arg, cells):
+        if not isinstance(arg, dict) or 'item' not in arg or 'qty' not in arg:
+            raise ValueError("buy/sell 명령에는 item과 qty가 필요합니다.")
+        item, qty = arg['item'], int(arg['qty'])
+        pos = self.player['pos']
+        if item not in self.market_data.get(pos, {}) or item not in self.world.items_info:
+            raise ValueError(f"{pos}에서 거래하지 않는 품목입니다: {item}")
+        if qty <= 0:
+            raise ValueError("0보다 큰 수량을 입력하세요")
+        cell = self.market_data[pos][item]
+        cells.setdefault((pos, item), (cell['stock'], cell['price']))
+        curve = self.world.curves[item]
+        if self.events is not None and self.events.modifier(pos, item) != 1.0:
+            curve = curve.scaled(self.events.modifier(pos, item))
+        return pos, item, qty, curve
+
+    def _finish_trade(self, side, pos, item, fills):
+        done = sum(n for _, n in fills)
+        amount = sum(n * price for price, n in fills)
+        if self.on_trade is not None and fills:
+            self.on_trade(self.player, side, pos, item, fills)
+        return {'item': item, 'qty': done, 'amount': amount, 'fills': fills}
+
+    def _buy(self, arg, cells):
+        pos, item, qty, curve = self._trade_args(arg, cells)
+        fills = [(price, n) for n, price in buy_batches(self.player, self.world.items_info, self.world.merc_data,
+                                                        self.market_data, pos, item, qty, curve)]
+        if not fills:
+            raise ValueError("구매 가능한 수량이 없거나 돈/무게가 부족합니다.")
+        return self._finish_trade(BUY, pos, item, fills)
+
+    def _sell(self, arg, cells):
+        pos, item, qty, curve = self._trade_args(arg, cells)
+        fills = [(price, n) for n, price in sell_batches(self.player, self.market_data, pos, item, qty, curve)]
+        if not fills:
+            raise ValueError("보유 수량이 없습니다.")
+        return self._finish_trade(SELL, pos, item, fills)
+
+    def _move(self, arg, cells):
+        dest = arg['to'] if isinstance(arg, dict) else arg
+        cost = move(self.player, self.world.villages, self.world.distances, self.world.settings, dest)
+        return {'to': dest, 'cost': cost}
+
+    def _hire(self, arg, cells):
+        name = arg['name'] if isinstance(arg, dict) else arg
+        return {'name': name, 'price': hire(self.player, self.world.merc_data, self.world.settings, name)}
+
+    def _fire(self, arg, cells):
+        name = arg['name'] if isinstance(arg, dict) else arg
+        return {'name': name, 'refund': fire(self.player, self.world.merc_data, self.world.settings, name)}
+
+    def _save(self, arg, cells):
+        if self.on_save is None:
+            raise ValueError("저장소가 설정되지 않았습니다.")
+        if not self.on_save(self.player, self.device_id, self.market_data):
+            raise ValueError("슬롯 행을 찾지 못해 저장하지 못했습니다.")
+        return {'saved': True}
+
+
+# --- HTTP 서버 ---
+class GameServer:
+    # 슬롯마다 세션 하나를 메모리에 두고 JSON 요청으로 명령을 실행
+    def __init__(self, world, on_save=None):
+        self.world = world
+        self.on_save = on_save
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def session(self, slot):
+        with self.lock:
+            if slot not in self.sessions:
+                self.sessions[slot] = self.world.session(slot, on_save=self.on_save)
+            return self.sessions[slot]
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, body):
+                data = json.dumps(body, ensure_ascii=False).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _slot(self):
+                # /slots/<n> 또는 /slots/<n>/commands
+                parts = self.path.strip("/").split("/")
+                if len(parts) < 2 or parts[0] != "slots" or not parts[1].isdigit():
+                    return None, None
+                return int(parts[1]), parts[2:]
+
+            def do_GET(self):
+                slot, rest = self._slot()
+                if slot is None or rest:
+                    return self._reply(404, {'error': "GET /slots/<n>"})
+                try:
+                    session = server.session(slot)
+                except KeyError as e:
+                    return self._reply(404, {'error': e.args[0]})
+                except ValueError as e:
+                    return self._reply(409, {'error': str(e)})
+                with session.lock:
+                    self._reply(200, session.state())
+
+            def do_POST(self):
+                slot, rest = self._slot()
+                if slot is None or rest != ["commands"]:
+                    return self._reply(404, {'error': "POST /slots/<n>/commands"})
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"[]")
+                except ValueError as e:
+                    return self._reply(400, {'error': f"JSON 형식 오류: {e}"})
+                try:
+                    session = server.session(slot)
+                except KeyError as e:
+                    return self._reply(404, {'error': e.args[0]})
+                except ValueError as e:
+                    return self._reply(409, {'error': str(e)})
+                if isinstance(body, dict):
+                    commands, stop = body.get('commands', []), body.get('stop_on_error', True)
+                else:
+                    commands, stop = body, True
+                if not isinstance(commands, list):
+                    return self._reply(400, {'error': "명령 목록(list)이 필요합니다."})
+                self._reply(200, session.execute(commands, stop))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve(self, host, port):
+        httpd = ThreadingHTTPServer((host, port), self.handler())
+        httpd.daemon_threads = True
+        return httpd
+
+
+# --- 설정 불러오기 ---
+def fake_world(slots=3):
+    # loadtest.py의 가짜 시트로 만든 설정 (인증 없이 봇/회귀 테스트용)
+    import loadtest
+    from game_config import GAME_SHEETS, fetch_sheet_rows, parse_game_data
+
+    return GameWorld.from_parsed(parse_game_data(fetch_sheet_rows(loadtest.FakeSpreadsheet(slots), GAME_SHEETS)))
+
+
+def snapshot_world(path):
+    from config_snapshot import ConfigSnapshot
+
+    return GameWorld.from_parsed(ConfigSnapshot(path).parsed)
+
+
+def sheet_saver(secrets_path, world):
+    # 저장 명령을 실제 Player_Data 시트에 씀 (처음 저장할 때 인증).
+    # 화면과 같은 save_player로 저장하므로 같은 호스트의 화면과 거상 순위 파일을 함께 갱신
+    import prewarm
+
+    secrets = prewarm.load_secrets(secrets_path)
+    conf = secrets.get("leaderboard", {})
+    board = Leaderboard(conf.get("path") or LEADERBOARD_PATH, size=int(conf.get("size", 10)))
+    board.sync()
+    state = {}
+    lock = threading.Lock()
+
+    def save(player, device_id, market_data):
+        with lock:
+            if 'ws' not in state:
+                state['ws'] = prewarm.open_spreadsheet(secrets).worksheet("Player_Data")
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            return save_player(state['ws'], player, device_id, now, world.settings, world.items_info,
+                               market_data, board)
+    return save
+
+
+# --- 벤치마크 ---
+def bot_commands(world, rng, n):
+    # 사고팔고 이동하는 무작위 명령 n개
+    markets = [v for v in world.villages if v != MERC_CAMP]
+    commands = []
+    for _ in range(n):
+        r = rng.random()
+        if r < 0.1:
+            commands.append({'move': rng.choice(markets)})
+        else:
+            item = rng.choice(list(world.items_info))
+            commands.append({'buy' if r < 0.55 else 'sell': {'item': item, 'qty': rng.randint(1, 20)}})
+    return commands
+
+
+def bench(world, total, batch, seed):
+    import http.client
+
+    rng = random.Random(seed)
+    session = world.session(min(world.slots))
+    commands = bot_commands(world, rng, total)
+    start = time.perf_counter()
+    ok = 0
+    for i in range(0, total, batch):
+        out = session.execute(commands[i:i + batch], stop_on_error=False)
+        ok += sum(r['ok'] for r in out['results'])
+    elapsed = time.perf_counter() - start
+    print(f"[in-process] {total:,}개 명령 ({batch}개씩) {elapsed:.2f}초 → {total / elapsed:,.0f}개/초 (성공 {ok:,})")
+
+    server = GameServer(world)
+    httpd = server.serve("127.0.0.1", 0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    conn = http.client.HTTPConnection("127.0.0.1", httpd.server_address[1])
+    slot = min(world.slots)
+    start = time.perf_counter()
+    for i in range(0, total, batch):
+        body = json.dumps({'commands': commands[i:i + batch], 'stop_on_error': False}, ensure_ascii=False).encode()
+        conn.request("POST", f"/slots/{slot}/commands", body, {"Content-Type": "application/json"})
+        json.loads(conn.getresponse().read())
+    elapsed = time.perf_counter() - start
+    httpd.shutdown()
+    print(f"[HTTP]       {total:,}개 명령 ({batch}개씩) {elapsed:.2f}초 → {total / elapsed:,.0f}개/초")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="조선거상 미니 명령 API")
+    sub = parser.add_subparsers(dest="mode", required=True)
+    serve = sub.add_parser("serve", help="로컬 HTTP/JSON 서버")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--snapshot", default=os.path.join(APP_DIR, ".config_snapshot.bin"))
+    serve.add_argument("--fake", action="store_true", help="가짜 시트 설정 사용")
+    serve.add_argument("--secrets", help="지정하면 save 명령을 실제 시트에 저장")
+    b = sub.add_parser("bench", help="처리량 측정 (가짜 시트 설정)")
+    b.add_argument("--commands", type=int, default=20000)
+    b.add_argument("--batch", type=int, default=100)
+    b.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.mode == "bench":
+        bench(fake_world(), args.commands, args.batch, args.seed)
+        return
+
+    world = fake_world() if args.fake else snapshot_world(args.snapshot)
+    server = GameServer(world, sheet_saver(args.secrets, world) if args.secrets else None)
+    httpd = server.serve(args.host, args.port)
+    print(f"✅ 명령 API: http://{args.host}:{httpd.server_address[1]}/slots/<n>/commands (슬롯 {sorted(world.slots)})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+from datetime import datetime
+
+from save_codec import decode_inventory, decode_mercs
+
+# --- 시트 설정 파싱 ---
+# 구글 시트 워크시트 값(행 목록)을 게임 설정 dict로 바꾸는 함수들.
+# 게임 스크립트와 서버 시작 시 미리 데우는 prewarm.py가 함께 사용합니다.
+
+GAME_SHEETS = ("Setting_Data", "Item_Data", "Balance_Data", "Village_Data", "Player_Data")
+
+
+def sheet_revision(spreadsheet):
+    # Drive 메타데이터의 파일 버전 (시트 내용이 바뀔 때마다 증가, 기존 drive 스코프로 조회 가능)
+    meta = spreadsheet.client.request(
+        "get", f"https://www.googleapis.com/drive/v3/files/{spreadsheet.id}",
+        params={"fields": "version,modifiedTime", "supportsAllDrives": True}
+    ).json()
+    return meta.get("version") or meta.get("modifiedTime")
+
+
+def fetch_sheet_rows(spreadsheet, titles):
+    # 모든 워크시트 값을 batchGet 요청 한 번으로 받음 (get_all_values와 같은 표시 형식 문자열,
+    # 기록형 시트의 숫자 변환은 sheet_records에서)
+    res = spreadsheet.values_batch_get([f"'{t}'" for t in titles])
+    return {t: vr.get("values", []) for t, vr in zip(titles, res.get("valueRanges", []))}
+
+
+def numericise(value):
+    # gspread.utils.numericise와 같은 규칙 (get_all_records가 칸마다 적용하던 변환)
+    # batchGet은 표시 형식 그대로의 문자열을 주므로 예전처럼 숫자로 바꿔 둠. "1.5" → 1.5, "2,000" → 2000,
+    # 밑줄이 든 값과 숫자가 아닌 값은 그대로. gspread를 시작 경로에서 import하지 않으려고 직접 둠
+    if not isinstance(value, str) or "_" in value:
+        return value
+    cleaned = value.replace(",", "")
+    try:
+        return int(cleaned)
+    except ValueError:
+        try:
+            return float(cleaned)
+        except ValueError:
+            return value
+
+
+def sheet_records(rows):
+    # get_all_records와 같은 모양 ({헤더: 값} 목록, 빈 칸은 "", 숫자 칸은 int/float)
+    if not rows:
+        return []
+    header = rows[0]
+    return [dict(zip(header, map(numericise, r + [""] * (len(header) - len(r))))) for r in rows[1:]]
+
+
+def parse_settings(rows):
+    # volatility 값이 settings 딕셔너리에 자동으로 포함됨
+    return {r['변수명']: float(r['값']) for r in sheet_records(rows)}
+
+
+def parse_items(rows):
+    items_info = {}
+    for r in sheet_records(rows):
+        if r.get('item_name'):
+            name = str(r['item_name']).strip()
+            items_info[name] = {
+                'base': int(r['base_price']),
+                'w': int(r['weight'])
+            }
+    return items_info
+
+
+def parse_mercs(rows):
+    merc_data = {}
+    for r in sheet_records(rows):
+        if r.get('name'):
+            name = str(r['name']).strip()
+            merc_data[name] = {
+                'price': int(r['price']),
+                'w_bonus': int(r.get('weight_bonus', 0))
+            }
+    return merc_data
+
+
+def parse_villages(vil_vals, item_rows):
+    items_info = parse_items(item_rows)
+    headers = [h.strip() for h in vil_vals[0]]
+    
+    villages = {}
+    initial_stocks = {}
+    seen_villages = set()
+    
+    for row in vil_vals[1:]:
+        if not row or not row[0].strip():
+            continue
+        v_name = row[0].strip()
+        
+        if v_name in seen_villages:
+            continue
+        seen_villages.add(v_name)
+        
+        try:
+            x = int(row[1]) if len(row) > 1 and row[1] else 0
+            y = int(row[2]) if len(row) > 2 and row[2] else 0
+        except:
+            x, y = 0, 0
+        
+        villages[v_name] = {'items': {}, 'x': x, 'y': y}
+        initial_stocks[v_name] = {}
+        
+        if v_name != "용병 고용소":
+            for i in range(3, len(headers)):
+                if headers[i] in items_info:
+                    if len(row) > i and row[i].strip():
+                        try:
+                            stock = int(row[i])
+                            villages[v_name]['items'][headers[i]] = stock
+                            initial_stocks[v_name][headers[i]] = stock
+                        except:
+                            pass
+    return villages, initial_stocks
+
+
+def parse_slots(rows, item_rows=None, merc_rows=None):
+    # inventory/mercs 칸은 예전 JSON과 압축 형식(save_codec) 모두 읽음. 예전 압축 형식(z1)은 설정의 이름 순서가 필요
+    item_names = list(parse_items(item_rows)) if item_rows else []
+    merc_names = list(parse_mercs(merc_rows)) if merc_rows else []
+    slots = []
+    for r in sheet_records(rows):
+        if str(r.get('slot', '')).strip():
+            error = None
+            try:
+                inv = decode_inventory(r.get('inventory'), item_names)
+                mercs = decode_mercs(r.get('mercs'), merc_names)
+            except ValueError as e:
+                # 읽지 못한 슬롯도 목록에 남겨 화면에 오류를 보여 줌 (시작/저장은 막아 시트의 원래 값을 보존)
+                inv, mercs, error = {}, [], str(e)
+            slot = {
+                'slot': int(r['slot']),
+                'money': int(r.get('money', 0)),
+                'pos': str(r.get('pos', '한양')),
+                'inv': inv,
+                'mercs': mercs,
+                'week': int(r.get('week', 1)),
+                'month': int(r.get('month', 1)),
+                'year': int(r.get('year', 1592)),
+                'last_save': r.get('last_save', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            }
+            if error is not None:
+                slot['load_error'] = error
+            slots.append(slot)
+    return slots
+
+
+# 파싱 결과 이름, 파서, 사용하는 워크시트 (SheetRevisionCache.parsed의 메모 키)
+PARSERS = (
+    ("settings", parse_settings, ("Setting_Data",)),
+    ("items", parse_items, ("Item_Data",)),
+    ("mercs", parse_mercs, ("Balance_Data",)),
+    ("villages", parse_villages, ("Village_Data", "Item_Data")),
+    ("slots", parse_slots, ("Player_Data", "Item_Data", "Balance_Data")),
+)
+
+
+def join_parsed(parsed):
+    # {이름: 파싱 결과} → (settings, items_info, merc_data, villages, initial_stocks, slots)
+    villages, initial_stocks = parsed["villages"]
+    return parsed["settings"], parsed["items"], parsed["mercs"], villages, initial_stocks, parsed["slots"]
+
+
+def split_parsed(data):
+    settings, items_info, merc_data, villages, initial_stocks, slots = data
+    return {"settings": settings, "items": items_info, "mercs": merc_data,
+            "villages": (villages, initial_stocks), "slots": slots}
+
+
+def parse_game_data(rows):
+    # rows: {워크시트: 행 목록} → (settings, items_info, merc_data, villages, initial_stocks, slots)
+    return join_parsed({name: parse(*(rows.get(t, []) for t in titles)) for name, parse, titles in PARSERS})
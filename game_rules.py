@@ -0,0 +1,180 @@
+import json
+
+from domain import Inventory, MercRoster
+from leaderboard import saved_entry
+from save_codec import encode_inventory, encode_mercs
+from shared_market import buy_from, sell_to, market_lock
+
+# --- 게임 규칙 ---
+# 화면(Streamlit)과 명령 API(game_api.py)가 함께 쓰는 거래/이동/용병 규칙.
+# 상태(player, market_data)만 바꾸고 화면 출력은 하지 않습니다. 규칙 위반은 ValueError.
+
+BATCH_SIZE = 100            # 연속 체결 단위 (가격 구간 경계에서도 끊고, 끊을 때마다 현재 재고로 가격을 다시 계산)
+BASE_CAPACITY = 200
+MERC_CAMP = "용병 고용소"
+
+
+def carry_weight(player, items_info, merc_data):
+    # 반환 (현재 무게, 최대 적재량)
+    inv, mercs = player['inv'], player['mercs']
+    if isinstance(inv, Inventory) and isinstance(mercs, MercRoster):
+        # 타입 모델: 수량 배열 × 무게 배열, 용병은 종류별 인원 × 보너스
+        tw = BASE_CAPACITY
+        for merc, n in mercs.counts().items():
+            if merc in merc_data:
+                tw += n * merc_data[merc]['w_bonus']
+        return inv.total_weight(), tw
+
+    cw = 0
+    for item, qty in player['inv'].items():
+        if item in items_info:
+            cw += qty * items_info[item]['w']
+
+    tw = BASE_CAPACITY
+    for merc in player['mercs']:
+        if merc in merc_data:
+            tw += merc_data[merc]['w_bonus']
+
+    return cw, tw
+
+
+def buy_batches(player, items_info, merc_data, market_data, pos, item_name, qty, curve):
+    # BATCH_SIZE개씩(가격 구간 경계에서는 더 짧게) 매수하며 (체결수량, 단가)를 하나씩 내보냄. 돈/무게/재고가 모자라면 멈춤
+    # 체결 금액의 합은 화면의 최대 매수 계산(ItemCurve.affordable)과 같은 구간별 단가 합
+    item_weight = items_info[item_name]['w']
+    bought = 0
+    while bought < qty:
+        cw, tw = carry_weight(player, items_info, merc_data)
+        can_load = (tw - cw) // item_weight if item_weight > 0 else 999999
+        # 공유 시장이면 마을 잠금 안에서 가격 확인과 재고 차감을 함께 처리
+        with market_lock(market_data, pos):
+            n, price = buy_from(market_data[pos][item_name], min(BATCH_SIZE, qty - bought),
+                                player['money'], can_load, curve)
+        if n <= 0:
+            return
+        player['money'] -= n * price
+        player['inv'][item_name] = player['inv'].get(item_name, 0) + n
+        bought += n
+        yield n, price
+
+
+def sell_batches(player, market_data, pos, item_name, qty, curve):
+    # BATCH_SIZE개씩(가격 구간 경계에서는 더 짧게) 매도하며 (체결수량, 단가)를 하나씩 내보냄. 보유 수량까지만
+    sold = 0
+    while sold < qty:
+        n = min(BATCH_SIZE, qty - sold, player['inv'].get(item_name, 0))
+        if n <= 0:
+            return
+        with market_lock(market_data, pos):
+            n, price = sell_to(market_data[pos][item_name], n, curve)
+        player['money'] += n * price
+        player['inv'][item_name] -= n
+        sold += n
+        yield n, price
+
+
+def travel_cost(distances, settings, src, dest):
+    return int(distances[src][dest] * settings.get('travel_cost', 15))
+
+
+def move(player, villages, distances, settings, dest):
+    # 반환: 이동비
+    if dest not in villages or dest == player['pos']:
+        raise ValueError(f"이동할 수 없는 마을입니다: {dest}")
+    if player['pos'] not in villages:
+        raise ValueError(f"현재 위치에서 이동할 수 없습니다: {player['pos']}")
+    cost = travel_cost(distances, settings, player['pos'], dest)
+    if player['money'] < cost:
+        raise ValueError("잔액이 부족합니다.")
+    player['money'] -= cost
+    player['pos'] = dest
+    return cost
+
+
+def hire(player, merc_data, settings, name):
+    # 반환: 고용비
+    if player['pos'] != MERC_CAMP:
+        raise ValueError(f"{MERC_CAMP}에서만 고용할 수 있습니다.")
+    if name not in merc_data:
+        raise ValueError(f"없는 용병입니다: {name}")
+    max_mercs = int(settings.get('max_mercenaries', 5))
+    if len(player['mercs']) >= max_mercs:
+        raise ValueError(f"최대 인원({max_mercs}명)입니다.")
+    price = merc_data[name]['price']
+    if player['money'] < price:
+        raise ValueError("잔액 부족")
+    player['money'] -= price
+    player['mercs'].append(name)
+    return price
+
+
+def fire(player, merc_data, settings, name):
+    # 반환: 환불액
+    if name not in merc_data or player['mercs'].count(name) <= 0:
+        raise ValueError(f"고용 중인 용병이 아닙니다: {name}")
+    refund = int(merc_data[name]['price'] * settings.get('fire_refund_rate', 0.7))
+    player['mercs'].remove(name)
+    player['money'] += refund
+    return refund
+
+
+def advance_weeks(player, weeks, market_data=None, initial_stocks=None):
+    # 게임 시간을 weeks주 진행. market_data를 주면 달이 바뀔 때마다 초기 재고로 되돌림 (개인 시장)
+    # 반환: 바뀐 달 수
+    months = 0
+    for _ in range(weeks):
+        player['week'] += 1
+        if player['week'] > 4:
+            player['week'] = 1
+            player['month'] += 1
+            months += 1
+            for v_name, v_items in (initial_stocks.items() if market_data is not None else ()):
+                if v_name in market_data:
+                    for item_name, initial_stock_val in v_items.items():
+                        if item_name in market_data[v_name]:
+                            market_data[v_name][item_name]['stock'] = initial_stock_val
+            if player['month'] > 12:
+                player['month'] = 1
+                player['year'] += 1
+    return months
+
+
+def save_values(player, device_id, now, compact=True):
+    # Player_Data 한 행 (A~J열). compact면 인벤토리/용병을 save_codec 형식으로, 아니면 예전 JSON으로
+    if compact:
+        catalog = player['inv'].catalog
+        inv, mercs = encode_inventory(player['inv'], catalog), encode_mercs(player['mercs'], catalog)
+    else:
+        inv = json.dumps(player['inv'].to_dict(), ensure_ascii=False)
+        mercs = json.dumps(player['mercs'].to_list(), ensure_ascii=False)
+    return [
+        player['slot'],
+        player['money'],
+        player['pos'],
+        mercs,
+        inv,
+        now,
+        player['week'],
+        player['month'],
+        player['year'],
+        device_id
+    ]
+
+
+def write_player_row(worksheet, player, device_id, now, compact=True):
+    # 슬롯 행을 찾아 덮어씀. 반환: 저장 여부 (슬롯 행이 없으면 False)
+    for i, record in enumerate(worksheet.get_all_records(), start=2):
+        if record.get('slot') == player['slot']:
+            worksheet.update(f'A{i}:J{i}', [save_values(player, device_id, now, compact)])
+            return True
+    return False
+
+
+def save_player(worksheet, player, device_id, now, settings, items_info, market_data, board=None):
+    # 화면과 명령 API가 함께 쓰는 저장: 슬롯 행을 쓰고, 저장됐으면 거상 순위(board)에도 반영. 반환: 저장 여부
+    # Setting_Data의 compact_saves = 0 이면 예전 JSON 형식으로 저장 (예전 버전 서버와 함께 돌릴 때)
+    if not write_player_row(worksheet, player, device_id, now, settings.get('compact_saves', 1) >= 1):
+        return False
+    if board is not None:
+        board.update(saved_entry(player, items_info, market_data))
+    return True
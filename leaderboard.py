@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+from bisect import bisect_left, insort
+
+# --- 거상 순위 ---
+# 모든 슬롯의 순자산(소지금 + 인벤토리 평가액) 순위입니다. 슬롯마다 항목 하나를 두고
+# (-순자산, 슬롯) 순으로 정렬된 목록을 유지해, 저장할 때마다 그 슬롯 항목만 빼고 다시 끼워 넣습니다.
+# 화면에는 미리 잘라 둔 상위 size개(top)를 그대로 보여 주므로 슬롯 수와 상관없이 바로 그립니다.
+#
+# 로컬 파일은 항목을 한 줄씩 덧붙이는 JSONL입니다 (같은 슬롯은 마지막 줄이 유효).
+# 저장은 한 줄 추가로 끝나고, 같은 호스트의 다른 워커가 덧붙인 줄은 sync()가 이어서 읽습니다.
+# 줄이 항목 수보다 많이 쌓이면 현재 항목만 새 파일에 써서 교체(compact)하며, 다른 워커는 파일이
+# 바뀐 것을 보고 처음부터 다시 읽습니다. 파일이 없을 때(첫 배포)만 시트의 슬롯으로 다시 만듭니다.
+
+COMPACT_FACTOR = 4      # 줄 수가 항목 수 × 이 값 + COMPACT_SLACK을 넘으면 교체
+COMPACT_SLACK = 64
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".leaderboard.jsonl")
+
+
+def net_worth(money, inv, price_of):
+    # inv: {아이템: 수량}, price_of(아이템) → 평가 단가
+    return int(money) + sum(int(qty) * price_of(item) for item, qty in inv.items() if qty)
+
+
+def slot_entry(slot, worth, player):
+    # player: 슬롯 dict 또는 Player (money/pos/year/month)
+    return {'slot': int(slot), 'worth': int(worth), 'money': int(player['money']), 'pos': str(player['pos']),
+            'year': int(player['year']), 'month': int(player['month'])}
+
+
+def market_price_of(items_info, cells):
+    # 인벤토리 평가 단가: 그 마을 시세, 그 마을에서 거래하지 않는 품목은 기준가
+    def price_of(item_name):
+        cell = cells.get(item_name) if cells else None
+        if cell is not None:
+            return cell['price']
+        return items_info[item_name]['base'] if item_name in items_info else 0
+    return price_of
+
+
+def saved_entry(player, items_info, market_data):
+    # 저장한 슬롯의 순위 항목 (지금 있는 마을의 시세로 평가)
+    price_of = market_price_of(items_info, market_data.get(player['pos']))
+    return slot_entry(player['slot'], net_worth(player['money'], player['inv'], price_of), player)
+
+
+class Leaderboard:
+    def __init__(self, path, size=10):
+        self.path = path
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries = {}       # 슬롯 -> 항목
+        self.order = []         # 정렬된 (-순자산, 슬롯)
+        self.top = []           # 상위 size개 항목 (순위가 바뀔 때만 다시 만듦)
+        self.ready = False      # 로컬 파일이나 시트로 한 번이라도 채웠는지
+        self.lines = 0          # 파일의 줄 수
+        self.file_id = None     # (inode, 읽은 위치)
+
+    def _apply(self, entry):
+        slot = entry['slot']
+        old = self.entries.get(slot)
+        if old is not None:
+            if old['worth'] == entry['worth']:
+                self.entries[slot] = entry
+                if old in self.top:
+                    self.top[self.top.index(old)] = entry
+                return
+            del self.order[bisect_left(self.order, (-old['worth'], slot))]
+        self.entries[slot] = entry
+        insort(self.order, (-entry['worth'], slot))
+        # 상위권에 들어오거나 상위권에서 움직인 경우만 다시 자름
+        if old in self.top or len(self.top) < self.size or entry['worth'] >= self.top[-1]['worth']:
+            self.top = [self.entries[s] for _, s in self.order[:self.size]]
+
+    def _reset(self):
+        self.entries = {}
+        self.order = []
+        self.top = []
+        self.lines = 0
+
+    def _read(self, f, start):
+        # start부터 끝까지의 완성된 줄을 반영. 반환: 다음에 읽을 위치
+        f.seek(start)
+        pos = start
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break   # 다른 워커가 아직 쓰는 중인 줄
+            pos += len(raw)
+            self.lines += 1
+            try:
+                self._apply(json.loads(raw))
+            except (ValueError, KeyError, TypeError):
+                continue
+        return pos
+
+    def sync(self):
+        # 로컬 파일의 변경분을 반영 (바뀐 게 없으면 stat 한 번). 반환: 파일이 있었는지
+        with self.lock:
+            return self._sync()
+
+    def _sync(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        ino, pos = self.file_id or (None, 0)
+        if ino == st.st_ino and pos == st.st_size:
+            return True
+        try:
+            with open(self.path, 'rb') as f:
+                if ino != st.st_ino or st.st_size < pos:
+                    # 교체된(compact/rebuild) 파일 → 처음부터
+                    self._reset()
+                    pos = 0
+                self.file_id = (st.st_ino, self._read(f, pos))
+        except OSError:
+            return False
+        self.ready = True
+        return True
+
+    def update(self, entry):
+        # 저장한 슬롯 하나를 반영하고 파일에 한 줄 추가
+        with self.lock:
+            if not self._sync() and not self.ready:
+                # 아직 시트로 만들기 전: 한 슬롯만 든 파일이 생기면 다음 시작에 다시 만들지 않으므로 건너뜀
+                return
+            line = json.dumps(entry, ensure_ascii=False) + "\n"
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+            except OSError:
+                self._apply(entry)  # 파일을 못 써도 이 프로세스의 순위는 갱신
+                return
+            self._sync()
+            if self.lines > len(self.entries) * COMPACT_FACTOR + COMPACT_SLACK:
+                self._write_all()
+
+    def rebuild(self, entries):
+        # 시트의 슬롯으로 처음부터 만들고 파일을 새로 씀 (로컬 파일이 없을 때)
+        with self.lock:
+            self._reset()
+            for entry in entries:
+                self._apply(entry)
+            self.ready = True
+            self._write_all()
+
+    def _write_all(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for _, slot in self.order:
+                    f.write(json.dumps(self.entries[slot], ensure_ascii=False) + "\n")
+            os.replace(tmp, self.path)
+            st = os.stat(self.path)
+        except OSError:
+            return
+        self.lines = len(self.entries)
+        self.file_id = (st.st_ino, st.st_size)
+
+    def ranking(self):
+        # 상위 size개 항목 (순자산 내림차순)
+        return self.top
@@ -0,0 +1,75 @@
+# --- 품목별 원가/손익 장부 ---
+# 거래가 체결될 때마다 품목별 (보유 수량, 취득 원가 합계)를 갱신합니다 (이동평균법).
+# - 매수: 수량과 원가에 그대로 더함
+# - 매도: 평균 원가만큼 원가를 덜어 내고, 판매액과의 차이를 실현 손익으로 기록
+# 모든 갱신은 거래 1건당 O(1)이고, 화면은 저장된 합계만 읽습니다.
+
+
+class Ledger:
+    def __init__(self):
+        self.positions = {}      # item -> [보유 수량, 취득 원가 합계]
+        self.realised = {}       # item -> 실현 손익 누계
+        self.realised_total = 0
+        self.cost_total = 0      # 보유 중인 모든 품목의 원가 합계
+
+    @classmethod
+    def opening(cls, inv, price_of):
+        # 불러온 세이브의 보유분은 취득 원가를 알 수 없으므로 price_of(item) 단가로 시작
+        ledger = cls()
+        for item, qty in inv.items():
+            if qty > 0:
+                ledger.buy(item, qty, qty * price_of(item))
+        return ledger
+
+    def buy(self, item, qty, amount):
+        if qty <= 0:
+            return
+        pos = self.positions.setdefault(item, [0, 0])
+        pos[0] += qty
+        pos[1] += amount
+        self.cost_total += amount
+
+    def sell(self, item, qty, amount):
+        # 반환: 이번 매도의 실현 손익
+        if qty <= 0:
+            return 0
+        pos = self.positions.get(item)
+        held, cost = pos if pos else (0, 0)
+        tracked = min(qty, held)
+        # 전량 매도면 남은 원가를 모두 덜어 내어 반올림 오차가 쌓이지 않게 함
+        basis = cost if tracked == held else cost * tracked // held
+        # 장부에 없는 수량(장부 생성 이전 보유분)은 판매가를 원가로 간주
+        untracked_basis = amount * (qty - tracked) // qty
+        pnl = amount - basis - untracked_basis
+
+        if pos:
+            pos[0] -= tracked
+            pos[1] -= basis
+            self.cost_total -= basis
+            if pos[0] <= 0:
+                del self.positions[item]
+        self.realised[item] = self.realised.get(item, 0) + pnl
+        self.realised_total += pnl
+        return pnl
+
+    def qty(self, item):
+        pos = self.positions.get(item)
+        return pos[0] if pos else 0
+
+    def cost(self, item):
+        pos = self.positions.get(item)
+        return pos[1] if pos else 0
+
+    def avg_cost(self, item):
+        pos = self.positions.get(item)
+        return pos[1] / pos[0] if pos and pos[0] else 0
+
+    def unrealised(self, item, price):
+        # 보유 수량을 price에 팔았을 때의 평가 손익
+        pos = self.positions.get(item)
+        return pos[0] * price - pos[1] if pos else 0
+
+    def reset_realised(self):
+        # 통계 초기화: 실현 손익만 지우고 보유 원가는 유지
+        self.realised = {}
+        self.realised_total = 0
@@ -0,0 +1,97 @@
+import bisect
+import math
+
+# --- 지정가 주문 장부 ---
+# (마을, 품목) 칸마다 지정가 기준으로 정렬된 주문 목록을 유지합니다.
+# - 매수: 지정가가 높은 순 (현재가 ≤ 지정가이면 체결)
+# - 매도: 지정가가 낮은 순 (현재가 ≥ 지정가이면 체결)
+# 따라서 체결 가능한 주문은 항상 목록의 앞쪽 구간이고, bisect 한 번으로 그 경계를 찾습니다.
+
+BUY = 'buy'
+SELL = 'sell'
+
+
+class OrderBook:
+    def __init__(self):
+        self.cells = {}     # (village, item) -> {'buy': [(key, seq, order)], 'sell': [...]}
+        self.by_id = {}
+        self.next_id = 1
+
+    def add(self, village, item, side, limit, qty):
+        # 같은 칸의 반대 주문과 가격이 겹치면 자기 주문끼리 계속 체결되므로 거부
+        opposite = self.best_limit(village, item, SELL if side == BUY else BUY)
+        if opposite is not None and (limit >= opposite if side == BUY else limit <= opposite):
+            raise ValueError(f"반대 주문 지정가({opposite:,}냥)와 겹칩니다")
+        order = {
+            'id': self.next_id,
+            'village': village,
+            'item': item,
+            'side': side,
+            'limit': int(limit),
+            'qty': int(qty),
+            'filled': 0,
+        }
+        self.next_id += 1
+        key = -order['limit'] if side == BUY else order['limit']
+        cell = self.cells.setdefault((village, item), {BUY: [], SELL: []})
+        bisect.insort(cell[side], (key, order['id'], order))
+        self.by_id[order['id']] = order
+        return order
+
+    def cancel(self, order_id):
+        order = self.by_id.pop(order_id, None)
+        if order is None:
+            return None
+        cell = self.cells[(order['village'], order['item'])]
+        side = cell[order['side']]
+        for i, entry in enumerate(side):
+            if entry[1] == order_id:
+                del side[i]
+                break
+        if not cell[BUY] and not cell[SELL]:
+            del self.cells[(order['village'], order['item'])]
+        return order
+
+    def best_limit(self, village, item, side):
+        cell = self.cells.get((village, item))
+        if not cell or not cell[side]:
+            return None
+        return cell[side][0][2]['limit']
+
+    def triggered(self, village, item, side, price):
+        # 현재가에서 체결 조건을 만족하는 주문만 (우선순위 순서로) 반환
+        cell = self.cells.get((village, item))
+        if not cell or not cell[side]:
+            return []
+        entries = cell[side]
+        key = -price if side == BUY else price
+        n = bisect.bisect_right(entries, (key, math.inf))
+        return [entry[2] for entry in entries[:n]]
+
+    def prune(self, village, item):
+        # 전량 체결된 주문 정리
+        cell = self.cells.get((village, item))
+        if not cell:
+            return []
+        done = []
+        for side in (BUY, SELL):
+            keep = []
+            for entry in cell[side]:
+                if entry[2]['qty'] > 0:
+                    keep.append(entry)
+                else:
+                    done.append(entry[2])
+                    self.by_id.pop(entry[1], None)
+            cell[side] = keep
+        if not cell[BUY] and not cell[SELL]:
+            del self.cells[(village, item)]
+        return done
+
+    def active_cells(self):
+        return list(self.cells.keys())
+
+    def orders(self):
+        return sorted(self.by_id.values(), key=lambda o: o['id'])
+
+    def __len__(self):
+        return len(self.by_id)
@@ -0,0 +1,93 @@
+import heapq
+
+# --- 일괄 처분(청산) 계획 ---
+# 인벤토리를 여러 마을에 나눠 팔 때의 예상 수익을 가격 구간 단위로 계산합니다.
+# 한 마을에서 팔수록 재고가 늘어 가격이 내려가므로, 모든 마을의 구간을 단가 순으로 합쳐
+# 비싼 구간부터 채우는 것이 (이동비를 빼면) 최적입니다. 이동비는 방문할 마을 집합을
+# 하나씩 늘려 가며 순이익이 더 이상 늘지 않을 때 멈추는 방식으로 반영합니다.
+
+
+def route_cost(pos, stops, dist, travel_cost):
+    # 현재 위치에서 가장 가까운 마을부터 차례로 방문하는 경로와 총 이동비
+    route = []
+    total = 0
+    here = pos
+    left = set(stops) - {pos}
+    while left:
+        nxt = min(left, key=lambda v: (dist[here][v], v))
+        total += int(dist[here][nxt] * travel_cost)
+        route.append(nxt)
+        here = nxt
+        left.discard(nxt)
+    return route, total
+
+
+def allocate(inv, stops, segments):
+    # stops 마을들에 인벤토리를 비싼 구간부터 배분
+    # segments(village, item) → (단가, 개수) 이터레이터 (매도할수록 싸지는 순서) 또는 None
+    plan = {}
+    revenue = 0
+    unsold = {}
+    for item, qty in inv.items():
+        if qty <= 0:
+            continue
+        heap = []
+        for v in stops:
+            it = segments(v, item)
+            if it is None:
+                continue
+            seg = next(it, None)
+            if seg:
+                heapq.heappush(heap, (-seg[0], v, seg[1], it))
+        left = qty
+        while left > 0 and heap:
+            neg_price, v, units, it = heapq.heappop(heap)
+            price = -neg_price
+            if price <= 0:
+                break
+            take = min(left, units)
+            row = plan.setdefault(v, {}).setdefault(item, [0, 0])
+            row[0] += take
+            row[1] += take * price
+            revenue += take * price
+            left -= take
+            if units > take:
+                heapq.heappush(heap, (neg_price, v, units - take, it))
+            else:
+                seg = next(it, None)
+                if seg:
+                    heapq.heappush(heap, (-seg[0], v, seg[1], it))
+        if left > 0:
+            unsold[item] = left
+    return plan, revenue, unsold
+
+
+def plan_liquidation(inv, pos, markets, dist, travel_cost, segments):
+    # markets: 매도 가능한 마을 이름 목록
+    candidates = [v for v in markets if any(segments(v, item) is not None for item in inv if inv[item] > 0)]
+    stops = {pos} if pos in markets else set()
+
+    def evaluate(stop_set):
+        plan, revenue, unsold = allocate(inv, stop_set, segments)
+        route, cost = route_cost(pos, [v for v in stop_set if v in plan], dist, travel_cost)
+        return {'plan': plan, 'revenue': revenue, 'unsold': unsold,
+                'route': route, 'travel_cost': cost, 'net': revenue - cost}
+
+    best = evaluate(stops)
+    local = best
+    while True:
+        step = None
+        for v in candidates:
+            if v in stops:
+                continue
+            trial = evaluate(stops | {v})
+            if trial['net'] > (step or best)['net']:
+                step, step_v = trial, v
+        if step is None:
+            break
+        stops.add(step_v)
+        best = step
+
+    best['local_net'] = local['net']   # 지금 마을에서 전부 팔 때와 비교용
+    return best
+
@@ -0,0 +1,403 @@
+"""조선거상 미니 동시 접속 부하 테스트
+
+streamlit.testing.v1.AppTest로 실제 게임 스크립트를 N개 세션에서 동시에 돌립니다.
+세션마다 별도 프로세스를 띄우고, 구글 시트 대신 로컬 가짜 시트를 사용하므로
+인증 정보 없이 실행됩니다. 단계별로 세션 수를 늘려 p95 지연이 꺾이는 지점을 찾습니다.
+매수/매도 지연은 주문 접수가 아니라 작업 스레드의 체결이 끝나 화면에 반영되기까지의 시간입니다.
+
+    python loadtest.py --levels 1 2 4 8 16 --rounds 5
+"""
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, "제미나이 test2.py")
+MERC_VILLAGE = "용병 고용소"
+TRADE_RERUNS = 20        # 매수/매도 뒤 체결 결과를 기다리며 다시 실행하는 최대 횟수
+
+# --- 1. 로컬 가짜 시트 ---
+DEFAULT_SHEETS = {
+    "Setting_Data": [
+        ["변수명", "값"],
+        ["seconds_per_month", 8],   # 2초마다 1주 → 시간 진행 경로도 실행됨
+        ["travel_cost", 15],
+        ["max_mercenaries", 5],
+        ["fire_refund_rate", 0.7],
+        ["min_price_rate", 0.4],
+        ["max_price_rate", 3.0],
+        ["inventoryResponsivePrice", 5000],
+    ],
+    "Item_Data": [
+        ["item_name", "base_price", "weight"],
+        ["쌀", 100, 2], ["소금", 60, 1], ["비단", 900, 3],
+        ["인삼", 1500, 1], ["목재", 80, 5], ["철", 300, 4],
+    ],
+    "Balance_Data": [
+        ["name", "price", "weight_bonus"],
+        ["짐꾼", 1000, 100], ["호위무사", 3000, 50], ["상단 마차", 8000, 400],
+    ],
+    "Village_Data": [
+        ["village", "x", "y", "쌀", "소금", "비단", "인삼", "목재", "철"],
+        ["한양", 0, 0, 1500, 300, 50, 80, 2500, 700],
+        ["부산", 30, 40, 4000, 6000, "", 20, 900, 1200],
+        ["평양", -10, -50, 800, 1500, 400, "", 6000, 3000],
+        ["개성", -5, -8, 2000, 90, 1200, 500, "", 450],
+        [MERC_VILLAGE, 5, 5],
+    ],
+}
+PLAYER_HEADER = ["slot", "money", "pos", "mercs", "inventory", "last_save",
+                 "week", "month", "year", "device_id"]
+
+
+class FakeWorksheet:
+    def __init__(self, rows, latency, on_change=None):
+        self.rows = rows
+        self.latency = latency
+        self.on_change = on_change
+        self.lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_all_values(self):
+        self._wait()
+        with self.lock:
+            return [[str(c) for c in r] for r in self.rows]
+
+    def get_all_records(self):
+        self._wait()
+        with self.lock:
+            header = self.rows[0]
+            return [dict(zip(header, r)) for r in self.rows[1:]]
+
+    def update(self, range_name, values):
+        # 'A{row}:J{row}' 형식만 사용됨
+        self._wait()
+        row = int(range_name.split(":")[0][1:])
+        with self.lock:
+            while len(self.rows) < row:
+                self.rows.append([""] * len(self.rows[0]))
+            self.rows[row - 1] = list(values[0])
+        if self.on_change:
+            self.on_change()
+
+
+class FakeSpreadsheet:
+    def __init__(self, slots=3, latency=0.0):
+        sheets = copy.deepcopy(DEFAULT_SHEETS)
+        sheets["Player_Data"] = [PLAYER_HEADER] + [
+            [s, 200000, "한양", "[]", "{}", "", 1, 1, 1592, ""] for s in range(1, slots + 1)
+        ]
+        self.id = "fake-spreadsheet"
+        self.version = 1
+        self.latency = latency
+        self.client = FakeHTTPClient(self)
+        self.worksheets = {name: FakeWorksheet(rows, latency, self._bump) for name, rows in sheets.items()}
+
+    def _bump(self):
+        self.version += 1
+
+    def worksheet(self, name):
+        return self.worksheets[name]
+
+    def values_batch_get(self, ranges):
+        if self.latency:
+            time.sleep(self.latency)
+        return {"valueRanges": [{"range": r, "values": self.worksheets[r.strip("'")].get_all_values()}
+                                for r in ranges]}
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class FakeHTTPClient:
+    # Drive 파일 메타데이터 요청(sheet_revision)만 흉내
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def request(self, method, url, params=None, **kwargs):
+        if self.spreadsheet.latency:
+            time.sleep(self.spreadsheet.latency)
+        return FakeResponse({"version": str(self.spreadsheet.version)})
+
+
+class FakeClient:
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def open(self, title):
+        return self.spreadsheet
+
+
+def install_fake_sheets(spreadsheet):
+    # 실제 시트 연결 대신 가짜 시트를 돌려주도록 교체
+    import sheets_client
+    from google.oauth2 import service_account
+
+    sheets_client.authorize = lambda *args, **kwargs: FakeClient(spreadsheet)
+    service_account.Credentials.from_service_account_info = staticmethod(lambda *args, **kwargs: None)
+
+
+# --- 2. 시뮬레이션 세션 ---
+class SessionError(Exception):
+    pass
+
+
+class SimSession:
+    def __init__(self, slot, seed, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.slot = slot
+        self.rng = random.Random(seed)
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.at.secrets["gspread"] = {}
+        self.latencies = defaultdict(list)
+
+    def _timed(self, action, fn):
+        start = time.perf_counter()
+        fn()
+        self.latencies[action].append(time.perf_counter() - start)
+        if self.at.exception:
+            raise SessionError(f"{action}: {self.at.exception[0].message}")
+
+    def _button(self, label=None, key_prefix=None):
+        for b in self.at.button:
+            if label is not None and b.label == label:
+                return b
+            if key_prefix is not None and b.key and b.key.startswith(key_prefix) and not b.disabled:
+                return b
+        return None
+
+    @property
+    def player(self):
+        return self.at.session_state["player"]
+
+    def start(self):
+        self._timed("load", self.at.run)
+        slot_box = next(s for s in self.at.selectbox if s.label == "슬롯 번호")
+        slot_box.set_value(self.slot)
+        self._timed("start", self._button("🎮 게임 시작").click().run)
+
+    def tick(self):
+        # 자동 새로고침/시간 프래그먼트: update_game_time → update_prices → sync_time_ui
+        self._timed("tick", self.at.run)
+
+    def _trade(self, button):
+        # 주문은 접수만 되고 작업 스레드가 체결하므로, 체결이 끝나고 결과가 화면에 반영될 때까지를 잰다
+        button.click().run()
+        desk = self.at.session_state["trade_desk"]
+        for _ in range(TRADE_RERUNS):
+            desk.wait()
+            if not desk.busy():
+                return
+            self.at.run()   # 완료 알림을 처리(collect_trades)해 인벤토리/로그에 반영
+        raise SessionError(f"체결 결과가 {TRADE_RERUNS}번 새로고침 안에 반영되지 않았습니다.")
+
+    def market(self):
+        return self.at.session_state["market_data"].get(self.player["pos"], {})
+
+    def buy(self):
+        items = list(self.market())
+        if not items:
+            return
+        item = self.rng.choice(items)
+        self.at.text_input(key=f"qty_{self.player['pos']}_{item}").set_value(str(self.rng.randint(1, 250)))
+        self._timed("buy", lambda: self._trade(self.at.button(key=f"buy_{item}")))
+
+    def sell(self):
+        held = [i for i, q in self.player["inv"].items() if q > 0 and i in self.market()]
+        if not held:
+            return
+        item = self.rng.choice(held)
+        qty = self.rng.randint(1, self.player["inv"][item])
+        self.at.text_input(key=f"qty_{self.player['pos']}_{item}").set_value(str(qty))
+        self._timed("sell", lambda: self._trade(self.at.button(key=f"sell_{item}")))
+
+    def move(self, dest=None):
+        box = self.at.selectbox(key="move_selectbox")
+        options = [o for o in box.options if dest is None or o.startswith(f"{dest} (")]
+        if not options:
+            return
+        box.set_value(self.rng.choice(options))
+        self._timed("move", self._button("🚀 이동").click().run)
+
+    def hire(self):
+        if self.player["pos"] != MERC_VILLAGE:
+            self.move(MERC_VILLAGE)
+        button = self._button(key_prefix="merc_")
+        if button is not None:
+            self._timed("hire", button.click().run)
+
+    def save(self):
+        self._timed("save", self._button("💾 저장").click().run)
+
+    def play_round(self, index):
+        self.tick()
+        self.buy()
+        self.tick()
+        self.sell()
+        if index % 3 == 2:
+            self.hire()
+        self.move()
+        self.buy()
+        if index % 2 == 1:
+            self.save()
+
+
+# --- 3. 측정 ---
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        # ru_maxrss는 최대치이므로 /proc이 없는 환경에서만 사용
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _worker(slot, slots, seed, rounds, timeout, latency, barrier, queue):
+    # 세션 하나 = 프로세스 하나 (AppTest는 한 프로세스 안에서 동시 실행을 지원하지 않음)
+    sys.path.insert(0, APP_DIR)
+    install_fake_sheets(FakeSpreadsheet(slots=slots, latency=latency))
+    from streamlit.testing.v1 import AppTest  # noqa: F401  (임포트 비용은 측정에서 제외)
+
+    rss_before = rss_mb()
+    barrier.wait()
+    cpu_before = time.process_time()
+    wall_start = time.perf_counter()
+    error = None
+    session = None
+    try:
+        session = SimSession(slot, seed, timeout)
+        session.start()
+        for i in range(rounds):
+            session.play_round(i)
+    except Exception as e:
+        error = f"slot {slot}: {e!r}"
+    queue.put({
+        'latencies': dict(session.latencies) if session else {},
+        'wall': time.perf_counter() - wall_start,
+        'cpu': time.process_time() - cpu_before,
+        'rss': max(0.0, rss_mb() - rss_before),
+        'error': error,
+    })
+
+
+def run_level(n_sessions, rounds, slots, timeout, seed, latency):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(n_sessions)
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_worker,
+                         args=((i % slots) + 1, slots, seed + i, rounds, timeout, latency, barrier, queue))
+             for i in range(n_sessions)]
+    for p in procs:
+        p.start()
+    reports = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    by_action = defaultdict(list)
+    for r in reports:
+        for action, values in r['latencies'].items():
+            by_action[action].extend(values)
+    everything = [v for values in by_action.values() for v in values]
+    wall = max(r['wall'] for r in reports)
+    return {
+        'sessions': n_sessions,
+        'reruns': len(everything),
+        'wall_sec': wall,
+        'throughput': len(everything) / wall if wall > 0 else 0.0,
+        'p50': percentile(everything, 50),
+        'p95': percentile(everything, 95),
+        'p99': percentile(everything, 99),
+        'cpu_per_session': sum(r['cpu'] for r in reports) / n_sessions,
+        'rss_per_session_mb': sum(r['rss'] for r in reports) / n_sessions,
+        'actions': {a: (len(v), percentile(v, 50), percentile(v, 95)) for a, v in by_action.items()},
+        'errors': [r['error'] for r in reports if r['error']],
+    }
+
+
+def find_knee(results, factor):
+    # p95 지연이 1세션 기준의 factor배를 넘기 직전 단계를 한계로 봄
+    if not results:
+        return None
+    baseline = results[0]['p95']
+    knee = results[0]
+    for r in results[1:]:
+        if r['p95'] > baseline * factor:
+            return knee, r
+        knee = r
+    return knee, None
+
+
+def print_report(results, factor):
+    print(f"{'세션':>4} {'rerun':>6} {'rerun/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'CPU s/세션':>10} {'RSS MB/세션':>11}")
+    for r in results:
+        print(f"{r['sessions']:>4} {r['reruns']:>6} {r['throughput']:>8.1f} {r['p50'] * 1000:>8.0f} "
+              f"{r['p95'] * 1000:>8.0f} {r['p99'] * 1000:>8.0f} {r['cpu_per_session']:>10.2f} "
+              f"{r['rss_per_session_mb']:>11.1f}")
+        for action, (count, p50, p95) in sorted(r['actions'].items()):
+            print(f"       - {action:<6} {count:>5}회  p50 {p50 * 1000:>6.0f}ms  p95 {p95 * 1000:>6.0f}ms")
+        for e in r['errors']:
+            print(f"       ! {e}")
+
+    knee, degraded = find_knee(results, factor)
+    if degraded:
+        print(f"\n⚠️ {degraded['sessions']}세션에서 p95가 기준의 {factor}배를 넘음 → "
+              f"한계: {knee['sessions']}세션, {knee['throughput']:.1f} rerun/s")
+    elif knee:
+        print(f"\n✅ 측정 범위 내 지연 저하 없음 (최대 {knee['sessions']}세션, {knee['throughput']:.1f} rerun/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="조선거상 미니 동시 세션 부하 테스트")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rounds", type=int, default=3, help="세션당 플레이 라운드 수")
+    parser.add_argument("--slots", type=int, default=3)
+    parser.add_argument("--sheet-latency", type=float, default=0.0, help="가짜 시트 호출당 지연(초)")
+    parser.add_argument("--degrade-factor", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1592)
+    parser.add_argument("--json", help="결과를 JSON으로 저장할 경로")
+    args = parser.parse_args(argv)
+
+    results = []
+    for n in args.levels:
+        print(f"▶ {n}세션 실행 중...", flush=True)
+        results.append(run_level(n, args.rounds, args.slots, args.timeout, args.seed, args.sheet_latency))
+    print_report(results, args.degrade_factor)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
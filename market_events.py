@@ -0,0 +1,135 @@
+import heapq
+import math
+import random
+import threading
+
+# --- 시장 충격 이벤트 ---
+# 급등/급락 같은 시장 충격을 게임 시간(주 단위 tick) 기준 최소 힙에 예약해 두고,
+# 시간이 흐를 때 기한이 된 이벤트만 꺼내 처리합니다 (이벤트 하나당 O(log n)).
+# - spawn: 다음 충격 발생 시각. 주당 발생률(shock_rate)로 지수분포 간격을 뽑아 하나만 예약
+# - decay: 진행 중인 충격의 다음 감쇠 단계. 매주 배율이 1에 가까워지다가 decay_weeks 뒤 사라짐
+# 충격은 가격 곡선 위에 곱하는 배율({마을: {품목: 배율}})로만 남으므로
+# 재고 변화로 가격을 다시 계산해도 덮어써지지 않습니다.
+#
+# Setting_Data 변수 (모두 선택):
+#   shock_rate           주당 평균 충격 횟수 (기본 0.25)
+#   shock_min_pct        충격 크기 하한 % (기본 10)
+#   shock_max_pct        충격 크기 상한 % (기본 30). inventoryResponsivePrice / 1000 %를 더함
+#   shock_decay_weeks    충격이 사라지기까지 주 수 (기본 4)
+
+SPAWN = 'spawn'
+DECAY = 'decay'
+
+
+def game_week(player):
+    # 게임 시간 → 1592년 1월 1주차부터 지난 주 수처럼 단조 증가하는 tick
+    return (player['year'] * 12 + player['month'] - 1) * 4 + player['week'] - 1
+
+
+class MarketEvents:
+    def __init__(self, seed=None):
+        self.heap = []          # (tick, seq, 종류, 충격 id)
+        self.seq = 0
+        self.tick = None
+        self.shocks = {}        # 충격 id -> {'village', 'item', 'amp', 'start', 'weeks'}
+        self.by_cell = {}       # (village, item) -> 충격 id (한 칸에 하나, 새 충격이 덮어씀)
+        self.modifiers = {}     # village -> {item: 배율}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()   # 공유 시장이면 여러 세션이 함께 진행시킴
+        self.processed = 0
+
+    def __getstate__(self):
+        # 세션 스냅샷(pickle)용: 잠금은 저장하지 않음
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def _push(self, tick, kind, shock_id=None):
+        self.seq += 1
+        heapq.heappush(self.heap, (tick, self.seq, kind, shock_id))
+
+    def _schedule_spawn(self, tick, settings):
+        rate = float(settings.get('shock_rate', 0.25))
+        if rate > 0:
+            self._push(tick + max(1, math.ceil(self.rng.expovariate(rate))), SPAWN)
+
+    def modifier(self, village, item):
+        return self.modifiers.get(village, {}).get(item, 1.0)
+
+    def advance(self, tick, market_data, settings):
+        # tick까지 기한이 된 이벤트만 처리. 반환: 새로 시작된(아직 진행 중인) 충격 알림 목록
+        with self.lock:
+            if self.tick is None:
+                self.tick = tick
+                self._schedule_spawn(tick, settings)
+                return []
+            if tick <= self.tick:
+                return []
+            self.tick = tick
+            started = []
+            while self.heap and self.heap[0][0] <= tick:
+                due, _, kind, shock_id = heapq.heappop(self.heap)
+                self.processed += 1
+                if kind == SPAWN:
+                    shock_id = self._spawn(due, market_data, settings)
+                    if shock_id is not None:
+                        started.append(shock_id)
+                    self._schedule_spawn(due, settings)
+                else:
+                    self._decay(shock_id, due)
+            # 한꺼번에 여러 주가 지나 이미 끝난 충격은 알리지 않음
+            return [self._describe(self.shocks[s]) for s in started if s in self.shocks]
+
+    def _spawn(self, due, market_data, settings):
+        villages = [v for v in market_data if market_data[v]]
+        if not villages:
+            return None
+        village = self.rng.choice(villages)
+        item = self.rng.choice(list(market_data[village]))
+        bonus = int(settings.get('inventoryResponsivePrice', 5000) / 1000)
+        pct = self.rng.randint(int(settings.get('shock_min_pct', 10)), int(settings.get('shock_max_pct', 30))) + bonus
+        amp = pct / 100 if self.rng.random() < 0.5 else -min(pct, 90) / 100
+        weeks = max(1, int(settings.get('shock_decay_weeks', 4)))
+
+        old = self.by_cell.get((village, item))
+        if old is not None:
+            del self.shocks[old]     # 남아 있는 감쇠 이벤트는 꺼낼 때 무시됨
+        self.seq += 1
+        shock_id = self.seq
+        self.shocks[shock_id] = {'village': village, 'item': item, 'amp': amp, 'start': due, 'weeks': weeks}
+        self.by_cell[(village, item)] = shock_id
+        self.modifiers.setdefault(village, {})[item] = 1 + amp
+        self._push(due + 1, DECAY, shock_id)
+        return shock_id
+
+    def _decay(self, shock_id, due):
+        shock = self.shocks.get(shock_id)
+        if shock is None:
+            return
+        left = 1 - (due - shock['start']) / shock['weeks']
+        village, item = shock['village'], shock['item']
+        if left <= 0:
+            del self.shocks[shock_id]
+            del self.by_cell[(village, item)]
+            cell = self.modifiers[village]
+            del cell[item]
+            if not cell:
+                del self.modifiers[village]
+            return
+        self.modifiers[village][item] = 1 + shock['amp'] * left
+        self._push(due + 1, DECAY, shock_id)
+
+    def _describe(self, shock):
+        pct = round(abs(shock['amp']) * 100)
+        if shock['amp'] > 0:
+            return f"📈 {shock['village']}의 {shock['item']} 가격 {pct}% 급등! ({shock['weeks']}주에 걸쳐 회복)"
+        return f"📉 {shock['village']}의 {shock['item']} 가격 {pct}% 급락! ({shock['weeks']}주에 걸쳐 회복)"
+
+    def active(self):
+        # 진행 중인 충격 목록 (현재 배율 포함)
+        with self.lock:
+            return [dict(s, modifier=self.modifier(s['village'], s['item'])) for s in self.shocks.values()]
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+# --- 시세표 (표 보기) ---
+# 한 마을의 모든 품목을 한 DataFrame으로 만듭니다. 품목마다 위젯을 그리는 대신 표 하나를 보내므로
+# 품목이 많아도 화면 요소 수가 늘지 않고, 파생 열(추세, 최대 매수)은 품목 전체를 배열로 한 번에 계산합니다.
+# 최대 매수는 ItemCurve.affordable과 같은 규칙(살수록 재고가 줄어 오르는 가격을 구간별로 합산)입니다.
+
+TREND_UP = 1.2      # 기준가 대비 이 배율 초과면 ▲▲
+TREND_DOWN = 0.8    # 이 배율 미만이면 ▼▼
+NO_WEIGHT_LIMIT = 999999
+
+
+def affordable_counts(stock, money, bounds, prices):
+    # stock: 품목별 재고 (I), prices: 품목별 구간 단가 (I × 구간 수), bounds: 구간 경계 (모든 품목 공통)
+    # 반환: money로 살 수 있는 품목별 최대 수량 (재고가 0이 될 때까지)
+    bounds = np.asarray(bounds, dtype=np.int64)
+    lo = np.maximum(np.concatenate(([0], bounds)), 1)                          # 구간의 최소 재고 (0개째는 살 수 없음)
+    hi = np.concatenate((bounds, [np.iinfo(np.int64).max])) - 1                 # 구간의 최대 재고
+    units = np.clip(np.minimum(stock[:, None], hi[None, :]) - lo[None, :] + 1, 0, None)
+
+    # 매수는 현재 구간에서 아래(비싼) 구간으로 내려가므로 구간 순서를 뒤집어 누적
+    units = units[:, ::-1]
+    unit_price = prices[:, ::-1]
+    # 단가가 0인 구간은 살 수 없음 (ItemCurve.affordable과 같이 거기서 멈춤)
+    unit_price = np.where(unit_price > 0, unit_price, money + 1)
+    cost = units * unit_price
+    spent = np.cumsum(cost, axis=1)
+    full = spent <= money                       # 누적 금액은 단조 증가 → 앞쪽부터 연속으로 True
+    bought = (units * full).sum(axis=1)
+
+    # 처음으로 다 사지 못한 구간에서 남은 돈만큼 추가
+    k = full.sum(axis=1)
+    rows = np.nonzero(k < units.shape[1])[0]
+    if len(rows):
+        col = k[rows]
+        left = money - (spent[rows, col] - cost[rows, col])
+        bought[rows] += np.minimum(left // unit_price[rows, col], units[rows, col])
+    return bought
+
+
+def market_frame(cells, items_info, curves, modifiers, money, free_weight, inv=None):
+    # cells: {품목: {'stock', 'price'}} (한 마을), curves: {품목: ItemCurve}, modifiers: {품목: 시장 충격 배율}
+    # free_weight: 남은 적재량 (최대 적재량 - 현재 무게)
+    names = [n for n in cells if n in items_info and n in curves]
+    if not names:
+        return pd.DataFrame(columns=['품목', '가격', '추세', '기준가 대비', '재고', '보유', '무게', '최대 매수'])
+    inv = inv or {}
+    stock = np.array([cells[n]['stock'] for n in names], dtype=np.int64)
+    price = np.array([cells[n]['price'] for n in names], dtype=np.int64)
+    base = np.array([items_info[n]['base'] for n in names], dtype=np.int64)
+    weight = np.array([items_info[n]['w'] for n in names], dtype=np.int64)
+    mod = np.array([modifiers.get(n, 1.0) for n in names], dtype=np.float64)
+
+    trend = np.select([price > base * TREND_UP, price > base, price < base * TREND_DOWN, price < base],
+                      ['▲▲', '▲', '▼▼', '▼'], '■').astype(object)
+    trend = np.where(mod != 1.0, trend + ' ⚡', trend)     # 시장 충격 진행 중
+
+    # 충격 배율을 곱한 구간 단가 (ItemCurve.scaled와 같이 소수점 버림)
+    prices = np.array([curves[n].prices for n in names], dtype=np.float64)
+    prices = (prices * mod[:, None]).astype(np.int64)
+    by_money = affordable_counts(stock, money, curves[names[0]].bounds, prices)
+    by_weight = np.where(weight > 0, max(free_weight, 0) // np.maximum(weight, 1), NO_WEIGHT_LIMIT)
+    max_buy = np.minimum(np.minimum(by_money, by_weight), stock)
+
+    return pd.DataFrame({
+        '품목': names,
+        '가격': price,
+        '추세': trend,
+        '기준가 대비': np.where(base > 0, np.round((price / np.maximum(base, 1) - 1) * 100), 0).astype(np.int64),
+        '재고': stock,
+        '보유': np.array([inv.get(n, 0) for n in names], dtype=np.int64),
+        '무게': weight,
+        '최대 매수': max_buy,
+    })
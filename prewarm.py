@@ -0,0 +1,83 @@
+"""조선거상 미니 서버 시작 전 설정 미리 데우기
+
+streamlit을 띄우기 전에 한 번 실행해 구글 시트 설정을 받아 파싱하고, 파생 구조(시장 초기 재고표,
+마을 거리 행렬, 가격표)와 함께 공유 스냅샷 파일로 게시합니다. 서버의 모든 워커는 첫 접속 때
+시트 리비전만 확인하고, 리비전이 같으면 이 스냅샷에 mmap으로 붙어 시트를 다시 받거나 파싱하지 않습니다.
+
+    python prewarm.py && streamlit run "제미나이 test2.py"
+"""
+import argparse
+import os
+import sys
+import time
+import tomllib
+
+from config_snapshot import ConfigSnapshot, publish
+from game_config import GAME_SHEETS, fetch_sheet_rows, parse_game_data, sheet_revision
+from price_curve import curve_from_settings
+from sheets_client import SheetsMetrics, TokenBucket, authorize
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+
+
+def load_secrets(path):
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def open_spreadsheet(secrets):
+    from google.oauth2.service_account import Credentials
+    quota = secrets.get("sheets_quota", {})
+    limiter = TokenBucket(rate=float(quota.get("requests_per_minute", 60)) / 60,
+                          capacity=float(quota.get("burst", 10)), reserve=float(quota.get("save_reserve", 2)))
+    creds = Credentials.from_service_account_info(secrets["gspread"], scopes=SCOPES)
+    client = authorize(creds, limiter, SheetsMetrics(), pool_size=int(quota.get("pool_size", 10)),
+                       max_retries=int(quota.get("max_retries", 5)))
+    return client.open("조선거상_DB")
+
+
+def prewarm(spreadsheet, path, force=False):
+    # 반환: (게시 여부, 리비전)
+    revision = sheet_revision(spreadsheet)
+    if not force and os.path.exists(path):
+        try:
+            if ConfigSnapshot(path).revision == revision:
+                return False, revision
+        except (OSError, ValueError):
+            pass
+    rows = fetch_sheet_rows(spreadsheet, GAME_SHEETS)
+    data = parse_game_data(rows)
+    publish(path, revision, rows, data, curve_from_settings(data[0]))
+    return True, revision
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="서버 시작 전 시트 설정 스냅샷 게시")
+    parser.add_argument("--secrets", default=os.path.join(APP_DIR, ".streamlit", "secrets.toml"))
+    parser.add_argument("--out", help="스냅샷 경로 (기본: secrets의 [startup] config_snapshot 또는 .config_snapshot.bin)")
+    parser.add_argument("--force", action="store_true", help="리비전이 같아도 다시 받음")
+    args = parser.parse_args(argv)
+
+    try:
+        secrets = load_secrets(args.secrets)
+    except OSError as e:
+        print(f"⚠️ secrets를 읽지 못해 건너뜁니다: {e}", file=sys.stderr)
+        return 0
+    path = args.out or secrets.get("startup", {}).get("config_snapshot") or os.path.join(APP_DIR, ".config_snapshot.bin")
+
+    start = time.perf_counter()
+    try:
+        published, revision = prewarm(open_spreadsheet(secrets), path, args.force)
+    except Exception as e:
+        # 미리 데우기에 실패해도 서버는 평소처럼 시트에서 직접 읽으므로 시작을 막지 않음
+        print(f"⚠️ 미리 데우기 실패: {e}", file=sys.stderr)
+        return 0
+    elapsed = time.perf_counter() - start
+    state = "게시" if published else "최신 (그대로 사용)"
+    print(f"✅ 설정 스냅샷 {state}: {path} (리비전 {revision}, {elapsed:.2f}초)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
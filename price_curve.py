@@ -0,0 +1,143 @@
+import math
+from bisect import bisect_right
+
+# --- 가격 곡선 ---
+# 재고 → 가격 배율 곡선을 Setting_Data 값으로 정하고, 불러올 때 구간 경계 배열로 컴파일합니다.
+# 곡선이 아무리 복잡해도 가격 조회는 경계 배열 이분 탐색(O(log 구간 수)) 한 번이고,
+# 대량 체결 금액은 구간(같은 단가로 이어지는 재고 범위)별 합으로 계산합니다.
+#
+# Setting_Data 변수 (모두 선택):
+#   price_curve          0 = 구간표 (기본), 1 = 탄력성 곡선
+#   min_price_rate       배율 하한 (기본 0.4)
+#   max_price_rate       배율 상한 (기본 3.0)
+#   price_tier_N         구간표 N번째 경계 재고 (N = 1, 2, ...)
+#   price_factor_N       구간표 배율. price_factor_0은 첫 경계 미만, price_factor_N은 N번째 경계 이상
+#   price_ref_stock      탄력성 곡선에서 배율이 1.0인 재고 (기본 1000)
+#   price_elasticity     탄력성 (기본 0.5): 배율 = (price_ref_stock / 재고) ** 탄력성
+#   price_curve_steps    탄력성 곡선을 재고가 두 배가 될 때마다 몇 구간으로 나눌지 (기본 8)
+
+DEFAULT_BOUNDS = (100, 500, 1000, 2000, 5000)
+DEFAULT_FACTORS = (2.0, 1.5, 1.2, 1.0, 0.8, 0.6)
+MAX_TIERS = 512
+
+
+class PriceCurve:
+    # bounds[i] 이상 bounds[i+1] 미만 재고의 배율이 factors[i+1] (factors[0]은 첫 경계 미만)
+    __slots__ = ('bounds', 'factors')
+
+    def __init__(self, bounds, factors, min_rate=0.0, max_rate=math.inf):
+        if len(factors) != len(bounds) + 1:
+            raise ValueError("가격 배율 개수는 경계 개수 + 1이어야 합니다.")
+        if any(a >= b for a, b in zip(bounds, bounds[1:])):
+            raise ValueError("가격 구간 경계는 오름차순이어야 합니다.")
+        self.bounds = tuple(int(b) for b in bounds)
+        self.factors = tuple(min(max(f, min_rate), max_rate) for f in factors)
+
+    def factor(self, stock):
+        return self.factors[bisect_right(self.bounds, stock)]
+
+    def compile(self, base):
+        return ItemCurve(self.bounds, tuple(int(base * f) for f in self.factors))
+
+
+class ItemCurve:
+    # 한 품목의 구간별 단가표 (기준가 × 배율을 미리 계산)
+    __slots__ = ('bounds', 'prices')
+
+    def __init__(self, bounds, prices):
+        self.bounds = bounds
+        self.prices = prices
+
+    def scaled(self, modifier):
+        # 시장 충격 배율을 곱한 단가표 (구간 경계는 같음)
+        return ItemCurve(self.bounds, tuple(int(p * modifier) for p in self.prices))
+
+    def price(self, stock):
+        return self.prices[bisect_right(self.bounds, stock)]
+
+    def tier_range(self, stock):
+        # stock이 속한 구간 [하한, 상한)
+        idx = bisect_right(self.bounds, stock)
+        lo = self.bounds[idx - 1] if idx > 0 else 0
+        hi = self.bounds[idx] if idx < len(self.bounds) else math.inf
+        return lo, hi
+
+    def sell_segments(self, stock):
+        # 현재 재고에서 매도할 때 지나가는 구간 (단가, 개수). 한 개 팔 때마다 재고 +1
+        idx = bisect_right(self.bounds, stock)
+        for i in range(idx, len(self.bounds)):
+            yield self.prices[i], self.bounds[i] - stock
+            stock = self.bounds[i]
+        yield self.prices[-1], math.inf
+
+    def buy_segments(self, stock):
+        # 현재 재고에서 매수할 때 지나가는 구간 (단가, 개수). 한 개 살 때마다 재고 -1, 재고가 0이면 끝
+        idx = bisect_right(self.bounds, stock)
+        while stock > 0:
+            lo = self.bounds[idx - 1] if idx > 0 else 0
+            n = stock - lo + 1 if idx > 0 else stock
+            yield self.prices[idx], n
+            stock -= n
+            idx -= 1
+
+    def affordable(self, stock, money, limit=math.inf):
+        # money로 최대 몇 개를 살 수 있는지 (재고가 줄며 오르는 가격을 구간별로 합산). 반환 (수량, 금액)
+        done = amount = 0
+        for price, n in self.buy_segments(stock):
+            take = min(n, limit - done, (money - amount) // price if price > 0 else 0)
+            done += take
+            amount += take * price
+            if take < n or done >= limit:
+                break
+        return done, amount
+
+
+def setting_series(settings, prefix, start):
+    # prefix1, prefix2, ... 처럼 번호가 이어지는 설정값 목록
+    values = []
+    n = start
+    while f"{prefix}{n}" in settings:
+        values.append(settings[f"{prefix}{n}"])
+        n += 1
+    return values
+
+
+def elasticity_curve(ref_stock, elasticity, min_rate, max_rate, steps):
+    # 배율 = (ref_stock / 재고) ** elasticity 를 상·하한 사이에서 기하 간격 구간으로 나눔
+    # (각 구간은 구간 하한 재고의 배율을 사용하므로 재고가 늘수록 배율은 단조 감소)
+    if elasticity <= 0:
+        return PriceCurve((), (1.0,), min_rate, max_rate)
+    lo_stock = max(1, ref_stock * max_rate ** (-1 / elasticity))    # 이 재고 미만은 상한
+    hi_stock = ref_stock * min_rate ** (-1 / elasticity) if min_rate > 0 else ref_stock * 1024
+    ratio = 2 ** (1 / max(1, steps))
+    bounds = []
+    s = lo_stock
+    while s < hi_stock and len(bounds) < MAX_TIERS:
+        b = int(math.ceil(s))
+        if not bounds or b > bounds[-1]:
+            bounds.append(b)
+        s *= ratio
+    factors = [max_rate] + [(ref_stock / b) ** elasticity for b in bounds]
+    return PriceCurve(bounds, factors, min_rate, max_rate)
+
+
+def curve_from_settings(settings):
+    min_rate = float(settings.get('min_price_rate', 0.4))
+    max_rate = float(settings.get('max_price_rate', 3.0))
+    if settings.get('price_curve', 0) >= 1:
+        return elasticity_curve(float(settings.get('price_ref_stock', 1000)),
+                                float(settings.get('price_elasticity', 0.5)),
+                                min_rate, max_rate, int(settings.get('price_curve_steps', 8)))
+    bounds = setting_series(settings, 'price_tier_', 1) or DEFAULT_BOUNDS
+    factors = setting_series(settings, 'price_factor_', 0) or DEFAULT_FACTORS
+    try:
+        return PriceCurve(bounds, factors, min_rate, max_rate)
+    except ValueError:
+        # 시트의 구간표가 잘못됐으면 기본 구간표 사용
+        return PriceCurve(DEFAULT_BOUNDS, DEFAULT_FACTORS, min_rate, max_rate)
+
+
+def compile_prices(settings, items_info):
+    # {품목: ItemCurve} (설정을 불러올 때 한 번 만듦)
+    curve = curve_from_settings(settings or {})
+    return curve, {name: curve.compile(info['base']) for name, info in items_info.items()}
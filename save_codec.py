@@ -0,0 +1,164 @@
+import base64
+import binascii
+import json
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+
+# --- 세이브 인코딩 ---
+# Player_Data의 inventory/mercs 칸을 JSON 문자열 대신 짧은 이진 형식으로 저장합니다.
+# 용병은 이름을 반복하지 않고 인원수로 적고, 수량은 고정 폭 배열로 묶어 zlib(헤더 없는 deflate) + base64로 씁니다.
+#   "z2:<base64>"  형식 2 (지금 쓰는 형식)
+#   "z1:<base64>"  형식 1 (읽기만 함)
+# 읽을 때는 예전 JSON("{...}", "[...]")과 빈 칸도 그대로 읽고, 쓸 때도 몇 종류 안 되는 작은 값
+# (빈 인벤토리, 용병 한두 명)은 JSON이 더 짧으면 JSON으로 둡니다.
+#
+# 형식 2 본문 (리틀 엔디언):
+#   u32 개수 k, u32 이름 길이 m
+#   m바이트   가진 것들의 이름을 "\x00"으로 이은 UTF-8
+#   i64 × k   같은 순서의 수량
+# 이름을 칸 안에 같이 적으므로 시트에서 아이템/용병 행을 끼워 넣거나 지우거나 순서를 바꿔도 그대로 읽힙니다.
+# (설정에서 빠진 이름도 그대로 돌아와 Inventory.extra로 보존됩니다.)
+#
+# 형식 1은 이름 대신 설정 순서의 id를 적고 이름표 crc로만 확인했기 때문에, 행을 끼워 넣거나 순서를 바꾼
+# 시트에서는 읽을 수 없습니다. 그런 칸은 오류를 내고(parse_slots가 슬롯에 오류를 붙여 화면에 보여 줌),
+# 읽을 수 있는 칸은 다음 저장 때 형식 2로 다시 씁니다.
+#   u32 이름표 길이 n, u32 crc32(앞 n개 이름), u32 id 개수 k, u32 설정에 없는 이름 JSON 길이 m
+#   u32 × k   id 차이값, i64 × k 수량, m바이트 설정에 없는 이름의 {이름: 수량} JSON
+
+PREFIX = "z2:"
+V1_PREFIX = "z1:"
+SMALL_KINDS = 8      # 이 종류 수 이하면 JSON과 길이를 비교해 짧은 쪽으로 저장
+HEADER = struct.Struct("<II")
+V1_HEADER = struct.Struct("<IIII")
+LITTLE = sys.byteorder == "little"
+
+
+def _to_bytes(arr):
+    if not LITTLE:
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _from_bytes(code, data):
+    arr = array(code)
+    arr.frombytes(data)
+    if not LITTLE:
+        arr.byteswap()
+    return arr
+
+
+def _names_crc(names, n):
+    return zlib.crc32("\x00".join(names[:n]).encode("utf-8"))
+
+
+def _encode(names, qtys):
+    # names: 이름 목록, qtys: 같은 순서의 수량 → "z2:..." 문자열
+    blob = "\x00".join(names).encode("utf-8")
+    body = b"".join((HEADER.pack(len(names), len(blob)), blob, _to_bytes(array("q", qtys))))
+    # 수량 배열은 압축이 잘 되지 않아 레벨을 올려도 거의 줄지 않고 느려지기만 함 → 1
+    return PREFIX + base64.b64encode(zlib.compress(body, 1, -15)).decode("ascii")
+
+
+def encode_counts(counts):
+    # counts: {이름: 수량} → "z2:..." 문자열 (수량이 0인 이름은 뺌)
+    held = [(name, int(qty)) for name, qty in counts.items() if qty]
+    return _encode([name for name, _ in held], [qty for _, qty in held])
+
+
+def _inflate(text, prefix):
+    try:
+        return zlib.decompress(base64.b64decode(text[len(prefix):]), -15)
+    except (binascii.Error, zlib.error) as e:
+        raise ValueError(f"손상된 세이브 값입니다: {e}") from None
+
+
+def decode_counts(text, names=None):
+    # encode_counts의 역. 반환 {이름: 수량}. names(설정 순서의 이름 목록)는 형식 1 칸에만 필요
+    if text.startswith(V1_PREFIX):
+        return _decode_v1(_inflate(text, V1_PREFIX), names or [])
+    if not text.startswith(PREFIX):
+        raise ValueError(f"알 수 없는 세이브 형식입니다: {text[:8]!r}")
+    data = _inflate(text, PREFIX)
+    try:
+        k, m = HEADER.unpack_from(data)
+    except struct.error as e:
+        raise ValueError(f"손상된 세이브 값입니다: {e}") from None
+    if len(data) != HEADER.size + m + 8 * k:
+        raise ValueError("손상된 세이브 값입니다: 길이가 맞지 않습니다.")
+    pos = HEADER.size
+    try:
+        names = data[pos:pos + m].decode("utf-8").split("\x00") if k else []
+    except UnicodeDecodeError as e:
+        raise ValueError(f"손상된 세이브 값입니다: {e}") from None
+    if len(names) != k:
+        raise ValueError("손상된 세이브 값입니다: 이름 수가 맞지 않습니다.")
+    return dict(zip(names, _from_bytes("q", data[pos + m:])))
+
+
+def _decode_v1(data, names):
+    try:
+        table, crc, k, m = V1_HEADER.unpack_from(data)
+    except struct.error as e:
+        raise ValueError(f"손상된 세이브 값입니다: {e}") from None
+    if len(data) != V1_HEADER.size + 12 * k + m:
+        raise ValueError("손상된 세이브 값입니다: 길이가 맞지 않습니다.")
+    if table > len(names) or _names_crc(names, table) != crc:
+        raise ValueError("예전 형식(z1)으로 저장한 뒤 시트의 아이템/용병 행이 바뀌어 읽을 수 없습니다. "
+                         "행 순서를 저장 당시로 되돌리면 읽을 수 있습니다.")
+
+    pos = V1_HEADER.size
+    id_list = list(accumulate(_from_bytes("I", data[pos:pos + 4 * k])))
+    qtys = _from_bytes("q", data[pos + 4 * k:pos + 12 * k])
+    if id_list and id_list[-1] >= table:
+        raise ValueError("손상된 세이브 값입니다: 이름표 밖의 id")
+    counts = dict(zip(map(names.__getitem__, id_list), qtys))
+    if m:
+        counts.update(json.loads(data[pos + 12 * k:].decode("utf-8")))
+    return counts
+
+
+def _shorter(binary, make_plain, kinds):
+    # 몇 종류 안 되는 작은 값은 JSON이 더 짧을 수 있어 비교 (많으면 JSON을 만들지 않음)
+    if kinds > SMALL_KINDS:
+        return binary
+    plain = make_plain()
+    return plain if len(plain) <= len(binary) else binary
+
+
+def encode_inventory(inv, catalog):
+    # Inventory.counts는 id 순서의 수량 목록 → 가진 것만 골라 이름과 함께 묶음 (설정에 없는 이름은 뒤에)
+    counts = inv.counts
+    names = catalog.item_names
+    id_list = [i for i, q in enumerate(counts) if q]
+    unknown = [(name, qty) for name, qty in inv.extra.items() if qty]
+    binary = _encode([names[i] for i in id_list] + [name for name, _ in unknown],
+                     [counts[i] for i in id_list] + [qty for _, qty in unknown])
+    return _shorter(binary, lambda: json.dumps(inv.to_dict(), ensure_ascii=False), len(id_list) + len(unknown))
+
+
+def encode_mercs(mercs, catalog):
+    counts = mercs.counts()
+    return _shorter(encode_counts(counts), lambda: json.dumps(mercs.to_list(), ensure_ascii=False), len(counts))
+
+
+def decode_inventory(cell, item_names):
+    # Player_Data inventory 칸 → {아이템명: 수량} (빈 칸, 예전 JSON, 형식 1/2 모두)
+    cell = str(cell or "").strip()
+    if not cell:
+        return {}
+    if cell.startswith("{"):
+        return json.loads(cell)
+    return decode_counts(cell, item_names)
+
+
+def decode_mercs(cell, merc_names):
+    # Player_Data mercs 칸 → 용병 이름 목록 (예전 JSON 목록과 같은 모양)
+    cell = str(cell or "").strip()
+    if not cell:
+        return []
+    if cell.startswith("["):
+        return json.loads(cell)
+    return [name for name, n in decode_counts(cell, merc_names).items() for _ in range(n)]
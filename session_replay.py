@@ -0,0 +1,268 @@
+"""조선거상 미니 세션 녹화/재생
+
+"거래가 느려졌다"는 제보를 그대로 재현하기 위한 도구입니다. 녹화를 켜면 게임을 시작할 때 불러온
+시트 원본, 슬롯의 플레이어 상태, 시장 재고, 시장 충격 시드를 기록하고, 이후 플레이어 행동
+(매수/매도, 이동, 고용/해고, 시간 진행, 지정가/장바구니 체결)을 시각과 함께 한 줄씩 남깁니다.
+매수/매도는 주문 단위가 아니라 작업 스레드가 반영한 체결 단위(수량, 단가)마다 한 줄입니다.
+각 행동 뒤에는 player/market_data/시장 충격 상태의 해시를 같이 기록합니다.
+
+재생은 Streamlit 없이 명령 API(game_api.GameSession)로 같은 규칙을 실행합니다. time.time()은 녹화된
+시각을 돌려주는 가상 시계로, random은 녹화된 시드로 바꿔 두고 행동마다 실행 시간을 재며,
+매 행동 뒤 상태 해시를 녹화와 비교해 처음 어긋난 지점을 알려 줍니다. 녹화 파일은 그대로 성능 회귀
+테스트 입력으로 쓸 수 있습니다. 공유 시장(shared_market = 1) 세션은 다른 플레이어의 거래가
+섞이므로 녹화하지 않습니다.
+
+    # .streamlit/secrets.toml
+    [session_recording]
+    enabled = true
+    dir = ".recordings"
+
+    python session_replay.py .recordings/20261019-153000-slot1-ab12cd34.jsonl
+    python session_replay.py rec.jsonl --top 20 --json
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from limit_orders import BUY
+
+VERSION = 1
+
+
+def player_record(player):
+    # 슬롯 dict와 같은 모양 (Player.from_record로 되살릴 수 있음)
+    return {
+        'slot': player['slot'], 'money': player['money'], 'pos': player['pos'],
+        'inv': {i: q for i, q in sorted(player['inv'].to_dict().items()) if q},
+        'mercs': sorted(player['mercs'].to_list()),
+        'week': player['week'], 'month': player['month'], 'year': player['year'],
+    }
+
+
+def canonical_state(player, market_data, events):
+    # 가격은 재고와 충격 배율로 정해지므로 재고와 배율만 비교
+    return {
+        'player': player_record(player),
+        'market': {v: {i: cell['stock'] for i, cell in cells.items()} for v, cells in market_data.items()},
+        'modifiers': {v: dict(m) for v, m in events.modifiers.items()} if events is not None else {},
+    }
+
+
+def state_digest(player, market_data, events):
+    data = json.dumps(canonical_state(player, market_data, events), sort_keys=True,
+                      ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+# --- 녹화 ---
+class SessionRecorder:
+    # 한 세션의 행동을 JSONL 파일에 한 줄씩 추가. 스크립트 스레드와 체결 작업 스레드에서 함께 호출됨
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.file = None
+        self.t0 = None
+        self.player = None
+        self.market_data = None
+        self.events = None
+        self.actions = 0
+
+    def bind(self, player, market_data, events):
+        # 기록할 상태 객체 (세션 스냅샷에서 복원되면 새 객체로 다시 연결)
+        with self.lock:
+            self.player = player
+            self.market_data = market_data
+            self.events = events
+
+    def start(self, rows, player, market_data, events, seed):
+        self.bind(player, market_data, events)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.t0 = self.clock()
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self._write({
+            'type': 'start', 'version': VERSION, 't0': self.t0, 'seed': seed, 'rows': rows,
+            'player': player_record(player),
+            'market': {v: {i: [c['stock'], c['price']] for i, c in cells.items()} for v, cells in market_data.items()},
+            'digest': state_digest(player, market_data, events),
+        })
+
+    def record(self, op, args):
+        # op: buy/sell (args {'item', 'qty', 'price'}: 체결 단위 하나), move (마을), hire/fire (용병), advance ({'weeks', 'tick'}),
+        #     fill ({'village', 'trades': [{'side', 'item', 'fills': [(단가, 수량)]}]}: 지정가/장바구니 체결)
+        with self.lock:
+            if self.file is None:
+                return
+            self._write({
+                'type': 'action', 't': round(self.clock() - self.t0, 6), 'op': op, 'args': args,
+                'digest': state_digest(self.player, self.market_data, self.events),
+            })
+            self.actions += 1
+
+    def _write(self, line):
+        try:
+            self.file.write(json.dumps(line, ensure_ascii=False) + '\n')
+            self.file.flush()
+        except (OSError, ValueError):
+            # 녹화 실패로 게임(체결 작업 스레드)을 멈추지 않음 → 이후 녹화만 중단
+            self.file = None
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def recording_path(root, slot, clock=time.time):
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(clock()))
+    return os.path.join(root, f"{stamp}-slot{slot}-{os.urandom(4).hex()}.jsonl")
+
+
+# --- 재생 ---
+class VirtualClock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@contextmanager
+def virtualized(clock, seed):
+    # time.time()과 random 모듈을 녹화 기준으로 고정 (재생이 끝나면 되돌림)
+    real_time = time.time
+    random_state = random.getstate()
+    time.time = clock.time
+    random.seed(seed)
+    try:
+        yield clock
+    finally:
+        time.time = real_time
+        random.setstate(random_state)
+
+
+def load_recording(path):
+    with open(path, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get('type') != 'start':
+        raise ValueError(f"녹화 파일이 아닙니다: {path}")
+    if lines[0].get('version') != VERSION:
+        raise ValueError(f"지원하지 않는 녹화 버전입니다: {lines[0].get('version')}")
+    return lines[0], [line for line in lines[1:] if line.get('type') == 'action']
+
+
+def apply_fill(player, market_data, args):
+    # 지정가/장바구니 체결을 녹화된 체결가 그대로 반영
+    for trade in args['trades']:
+        cell = market_data[args['village']][trade['item']]
+        sign = 1 if trade['side'] == BUY else -1
+        for price, n in trade['fills']:
+            player['money'] -= sign * n * price
+            player['inv'][trade['item']] = player['inv'].get(trade['item'], 0) + sign * n
+            cell['stock'] -= sign * n
+
+
+def replay(header, actions):
+    # 반환: {'actions', 'timings': [(op, 초)], 'mismatch': 처음 어긋난 행동 번호 또는 None, 'final_ok', ...}
+    from game_api import GameWorld, GameSession
+    from game_config import parse_game_data
+    from game_rules import advance_weeks
+    from domain import Player
+    from market_events import MarketEvents
+
+    world = GameWorld.from_parsed(parse_game_data(header['rows']))
+    player = Player.from_record(header['player'], world.catalog)
+    market = {v: {i: {'stock': s, 'price': p} for i, (s, p) in cells.items()} for v, cells in header['market'].items()}
+    events = MarketEvents(header['seed'])
+    session = GameSession(world, player, market, events=events)
+    if state_digest(player, market, events) != header['digest']:
+        raise ValueError("시작 상태가 녹화와 다릅니다 (시트 파싱 규칙이 바뀌었을 수 있음).")
+
+    timings = []
+    mismatch = None
+    with virtualized(VirtualClock(header['t0']), header['seed']) as clock:
+        for n, action in enumerate(actions):
+            clock.now = header['t0'] + action['t']
+            op, args = action['op'], action['args']
+            start = time.perf_counter()
+            if op == 'advance':
+                advance_weeks(player, args['weeks'], market, world.initial_stocks)
+                events.advance(args['tick'], market, world.settings)
+            elif op == 'fill':
+                apply_fill(player, market, args)
+            elif op in ('buy', 'sell'):
+                # 체결 단위 하나를 같은 규칙으로 다시 체결 (단가가 녹화와 다르면 해시에서 드러남)
+                session.execute([{op: {'item': args['item'], 'qty': args['qty']}}])
+            else:
+                session.execute([{op: args}])
+            timings.append((op, time.perf_counter() - start))
+            if mismatch is None and state_digest(player, market, events) != action['digest']:
+                mismatch = n
+
+    final = state_digest(player, market, events)
+    expected = actions[-1]['digest'] if actions else header['digest']
+    return {
+        'actions': actions, 'timings': timings, 'mismatch': mismatch,
+        'final_ok': final == expected, 'final_state': canonical_state(player, market, events),
+    }
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def summarize(result, top=10):
+    by_op = {}
+    for op, sec in result['timings']:
+        by_op.setdefault(op, []).append(sec)
+    ops = {
+        op: {'count': len(v), 'total_ms': round(sum(v) * 1000, 3), 'p50_ms': round(percentile(v, 0.5) * 1000, 3),
+             'p95_ms': round(percentile(v, 0.95) * 1000, 3), 'max_ms': round(max(v) * 1000, 3)}
+        for op, v in sorted(by_op.items())
+    }
+    ranked = sorted(range(len(result['timings'])), key=lambda n: -result['timings'][n][1])[:top]
+    slowest = [{'index': n, 't': result['actions'][n]['t'], 'op': result['actions'][n]['op'],
+                'args': result['actions'][n]['args'], 'ms': round(result['timings'][n][1] * 1000, 3)} for n in ranked]
+    return {'verified': result['mismatch'] is None and result['final_ok'], 'mismatch': result['mismatch'],
+            'ops': ops, 'slowest': slowest}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="녹화된 세션을 헤드리스로 재생하고 상태를 검증")
+    parser.add_argument("path", help="녹화 파일 (.jsonl)")
+    parser.add_argument("--top", type=int, default=10, help="가장 느린 행동 몇 개를 보여줄지")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args(argv)
+
+    header, actions = load_recording(args.path)
+    report = summarize(replay(header, actions), args.top)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0 if report['verified'] else 1
+
+    print(f"[재생] {args.path} · 행동 {len(actions)}개 · 녹화 길이 {actions[-1]['t'] if actions else 0:.1f}초")
+    for op, s in report['ops'].items():
+        print(f"  {op:8s} {s['count']:6d}회  합계 {s['total_ms']:9.3f}ms  p50 {s['p50_ms']:8.3f}ms  "
+              f"p95 {s['p95_ms']:8.3f}ms  최대 {s['max_ms']:8.3f}ms")
+    if report['slowest']:
+        print("[가장 느린 행동]")
+        for s in report['slowest']:
+            print(f"  #{s['index']:<6d} t={s['t']:9.3f}s  {s['op']:8s} {s['ms']:8.3f}ms  {json.dumps(s['args'], ensure_ascii=False)}")
+    if report['verified']:
+        print("✅ 최종 상태가 녹화와 비트 단위로 같습니다.")
+        return 0
+    where = f"#{report['mismatch']} ({actions[report['mismatch']]['op']})" if report['mismatch'] is not None else "마지막"
+    print(f"❌ 상태가 녹화와 다릅니다: 처음 어긋난 행동 {where}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
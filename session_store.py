@@ -0,0 +1,199 @@
+import os
+import pickle
+import sys
+import threading
+import time
+
+# --- 세션 메모리 관리 ---
+# 세션별 session_state 키의 대략적인 메모리 사용량을 집계하고,
+# 오래 방치된 세션의 게임 상태를 로컬 스냅샷 파일로 내보냈다가 돌아오면 복원합니다.
+
+# 스냅샷으로 내보내는 변경 가능한 게임 상태
+MUTABLE_KEYS = ('player', 'market_data', 'stats', 'trade_logs', 'last_qty', 'events', 'limit_orders',
+                'trade_cart', 'ledger', 'market_events')
+# 시트 설정 사본 (복원 시 load_game_data 캐시에서 다시 채움)
+CONFIG_KEYS = ('settings', 'items_info', 'merc_data', 'villages', 'initial_stocks')
+
+EVICTED_KEY = '_evicted_snapshot'
+
+
+def deep_sizeof(obj, seen=None):
+    # sys.getsizeof를 컨테이너 안쪽까지 재귀적으로 합산 (공유 객체는 한 번만)
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += deep_sizeof(k, seen) + deep_sizeof(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for v in obj:
+            size += deep_sizeof(v, seen)
+    elif hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    elif hasattr(obj, '__slots__'):
+        for name in obj.__slots__:
+            if hasattr(obj, name):
+                size += deep_sizeof(getattr(obj, name), seen)
+    return size
+
+
+def state_sizes(state, keys):
+    sizes = {}
+    for key in keys:
+        try:
+            sizes[key] = deep_sizeof(state[key])
+        except KeyError:
+            continue
+    return sizes
+
+
+class _Entry:
+    def __init__(self, session_id, handle):
+        self.session_id = session_id
+        self.handle = handle        # 마지막 실행의 세션 상태 (다른 세션 스레드에서 접근할 때 사용)
+        self.lock = threading.Lock()
+        self.last_seen = time.time()
+        self.sizes = {}
+        self.sized_at = 0.0
+        self.snapshot = None      # 내보낸 스냅샷 경로
+        self.snapshot_bytes = 0
+
+
+class SessionRegistry:
+    # 프로세스 전역 세션 목록 (st.cache_resource로 1개만 생성)
+    def __init__(self, snapshot_dir, idle_sec=600, sweep_every=60, size_every=30,
+                 forget_sec=86400, is_alive=None):
+        self.snapshot_dir = snapshot_dir
+        self.idle_sec = idle_sec
+        self.forget_sec = forget_sec    # 연결이 끊긴 세션을 목록/스냅샷에서 지우기까지의 시간
+        self.is_alive = is_alive
+        self.sweep_every = sweep_every
+        self.size_every = size_every
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.last_sweep = time.time()
+        self.evictions = 0
+        self.rehydrations = 0
+        os.makedirs(snapshot_dir, exist_ok=True)
+
+    def touch(self, session_id, state, handle):
+        # 현재 세션의 접속 시각을 갱신하고, 내보낸 상태가 있으면 복원
+        # state: 이 세션 스레드의 st.session_state, handle: 이번 실행의 세션 상태 객체(ScriptRunContext.session_state)
+        # 전체 실행과 프래그먼트 실행 모두 게임 상태를 읽기 전에 호출해야 함 (정리는 entry.lock과 last_seen으로 피함)
+        # 반환값: 이번 실행에서 복원했는지 여부
+        with self.lock:
+            entry = self.entries.get(session_id)
+            if entry is None:
+                entry = self.entries[session_id] = _Entry(session_id, handle)
+        with entry.lock:
+            # 실행마다 새 상태 객체가 만들어지므로 매번 바꿔 둠
+            entry.handle = handle
+            entry.last_seen = time.time()
+            restored = self._rehydrate(entry, state)
+            if entry.last_seen - entry.sized_at >= self.size_every:
+                entry.sizes = state_sizes(state, list(state.keys()))
+                entry.sized_at = entry.last_seen
+        return restored
+
+    def _path(self, session_id):
+        return os.path.join(self.snapshot_dir, f"{session_id}.pkl")
+
+    def _rehydrate(self, entry, state):
+        path = entry.snapshot or (state[EVICTED_KEY] if EVICTED_KEY in state else None)
+        if path is None:
+            return False
+        if EVICTED_KEY in state:
+            del state[EVICTED_KEY]
+        if not os.path.exists(path):
+            # 스냅샷이 사라졌으면 (서버 정리 등) 타이틀 화면부터 다시 시작
+            state['game_started'] = False
+            entry.snapshot = None
+            return False
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        for key, value in data.items():
+            state[key] = value
+        os.remove(path)
+        entry.snapshot = None
+        entry.snapshot_bytes = 0
+        self.rehydrations += 1
+        return True
+
+    def _evict(self, entry, state):
+        # 다른 세션 스레드에서 호출됨. state는 대상 세션의 상태 객체로, 키 하나를 읽고 쓸 때마다 그 세션의
+        # 상태 잠금을 잡음. 대상 세션의 다음 실행은 touch()에서 entry.lock을 기다리므로 정리 도중에 게임 상태를 읽지 않음
+        if not _get(state, 'game_started'):
+            return
+        desk = _get(state, 'trade_desk')
+        if desk is not None and desk.busy():
+            return  # 체결 중이거나 결과를 아직 반영하지 않은 주문이 있음
+        data = {k: state[k] for k in MUTABLE_KEYS if k in state}
+        path = self._path(entry.session_id)
+        with open(path, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # 복원 표시를 먼저 남겨 두어, 지우는 중에 보더라도 복원 대상임을 알 수 있게 함
+        state[EVICTED_KEY] = path
+        for key in MUTABLE_KEYS + CONFIG_KEYS:
+            if key in state:
+                del state[key]
+        entry.snapshot = path
+        entry.snapshot_bytes = os.path.getsize(path)
+        entry.sizes = {}
+        self.evictions += 1
+
+    def sweep(self, current=None, now=None):
+        # sweep_every 초마다 한 번, idle_sec 이상 방치된 세션을 스냅샷으로 내보냄 (current 세션은 제외)
+        now = now or time.time()
+        with self.lock:
+            if now - self.last_sweep < self.sweep_every:
+                return 0
+            self.last_sweep = now
+            entries = list(self.entries.items())
+        evicted = 0
+        for session_id, entry in entries:
+            if (now - entry.last_seen >= self.forget_sec
+                    and self.is_alive is not None and not self.is_alive(session_id)):
+                # 연결이 끊긴 채 오래 지난 세션 → 목록과 스냅샷 삭제
+                with self.lock:
+                    self.entries.pop(session_id, None)
+                if entry.snapshot and os.path.exists(entry.snapshot):
+                    os.remove(entry.snapshot)
+                continue
+            if session_id == current or entry.snapshot is not None or now - entry.last_seen < self.idle_sec:
+                continue
+            if not entry.lock.acquire(blocking=False):
+                continue  # 세션이 막 돌아오는 중
+            try:
+                if time.time() - entry.last_seen >= self.idle_sec:
+                    self._evict(entry, entry.handle)
+                evicted += entry.snapshot is not None
+            finally:
+                entry.lock.release()
+        return evicted
+
+    def report(self):
+        # 관리자 화면용 세션별 메모리 요약
+        now = time.time()
+        with self.lock:
+            entries = list(self.entries.values())
+        rows = []
+        for e in entries:
+            rows.append({
+                'session': e.session_id[:8],
+                'idle_sec': int(now - e.last_seen),
+                'state_kb': round(sum(e.sizes.values()) / 1024, 1),
+                'evicted': e.snapshot is not None,
+                'snapshot_kb': round(e.snapshot_bytes / 1024, 1),
+            })
+        rows.sort(key=lambda r: r['state_kb'], reverse=True)
+        return rows
+
+
+def _get(state, key):
+    try:
+        return state[key]
+    except KeyError:
+        return None
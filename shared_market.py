@@ -0,0 +1,89 @@
+import threading
+import time
+from contextlib import nullcontext
+
+# --- 공유 시장 ---
+# 모든 세션이 하나의 시장(market_data)을 함께 사용하는 모드.
+# 마을마다 잠금(lock striping)을 두어 같은 마을의 거래만 서로 기다리고,
+# 다른 마을의 거래는 절대 경합하지 않습니다.
+
+
+def buy_from(cell, qty, money, capacity, curve):
+    # 현재 재고가 속한 가격 구간 안에서 최대 qty개 매수. 반환 (체결수량, 단가)
+    # curve: price_curve.ItemCurve. 구간 끝에서 멈추므로 체결된 수량은 모두 같은 단가이고,
+    # 이어서 호출한 금액의 합은 구간별 단가 합(ItemCurve.affordable)과 같음
+    stock = cell['stock']
+    price = curve.price(stock)
+    lo, _ = curve.tier_range(stock)
+    in_tier = stock - max(lo, 1) + 1      # 재고 0개째는 살 수 없음
+    can_pay = money // price if price > 0 else 0
+    n = max(0, min(qty, in_tier, can_pay, capacity))
+    cell['stock'] -= n
+    cell['price'] = curve.price(cell['stock'])
+    return n, price
+
+
+def sell_to(cell, qty, curve):
+    # 현재 재고가 속한 가격 구간 안에서 최대 qty개 매도. 반환 (체결수량, 단가)
+    stock = cell['stock']
+    price = curve.price(stock)
+    _, hi = curve.tier_range(stock)
+    n = max(0, min(qty, hi - stock))
+    cell['stock'] += n
+    cell['price'] = curve.price(cell['stock'])
+    return n, price
+
+
+class SharedMarket(dict):
+    # market_data와 같은 모양의 dict ({마을: {품목: {'stock', 'price'}}}) + 마을별 잠금
+    def __init__(self, market_data, stripes=None):
+        super().__init__(market_data)
+        villages = list(market_data)
+        n = stripes or max(1, len(villages))
+        self.locks = [threading.Lock() for _ in range(n)]
+        # 잠금 수가 마을 수 이상이면 마을마다 다른 잠금을 받음
+        self.stripe = {v: i % n for i, v in enumerate(villages)}
+        self.reset_lock = threading.Lock()
+        self.last_reset = time.time()
+        self.events = None      # 공유 시장의 충격 이벤트 (market_events.MarketEvents)
+
+    def lock_for(self, village):
+        return self.locks[self.stripe.get(village, 0)]
+
+    def buy(self, village, item, qty, money, capacity, curve):
+        with self.lock_for(village):
+            return buy_from(self[village][item], qty, money, capacity, curve)
+
+    def sell(self, village, item, qty, curve):
+        with self.lock_for(village):
+            return sell_to(self[village][item], qty, curve)
+
+    def maybe_reset(self, initial_stocks, period):
+        # 실제 시간 기준으로 period초마다 한 번 재고 초기화 (어느 세션이 먼저 발견하든 한 번만)
+        now = time.time()
+        if now - self.last_reset < period or not self.reset_lock.acquire(blocking=False):
+            return False
+        try:
+            if now - self.last_reset < period:
+                return False
+            for v_name, v_items in initial_stocks.items():
+                if v_name not in self:
+                    continue
+                with self.lock_for(v_name):
+                    for item_name, stock in v_items.items():
+                        if item_name in self[v_name]:
+                            self[v_name][item_name]['stock'] = stock
+            self.last_reset = now
+            return True
+        finally:
+            self.reset_lock.release()
+
+    def __reduce__(self):
+        # 세션 스냅샷 등으로 피클될 때는 잠금 없이 일반 dict 사본으로 저장
+        return (dict, (dict(self),))
+
+
+def market_lock(market_data, village):
+    # 공유 시장이면 해당 마을 잠금, 개인 시장이면 아무것도 하지 않음
+    lock_for = getattr(market_data, 'lock_for', None)
+    return lock_for(village) if lock_for else nullcontext()
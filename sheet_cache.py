@@ -0,0 +1,106 @@
+import hashlib
+import json
+import math
+import threading
+import time
+
+# --- 시트 리비전 캐시 ---
+# 고정 TTL로 모든 워크시트를 다시 받는 대신, Drive 메타데이터의 파일 버전만 주기적으로 확인하고
+# 버전이 바뀐 경우에만 값을 한 번의 batchGet으로 다시 받습니다.
+# 워크시트마다 내용 해시를 비교해 실제로 바뀐 워크시트만 새 버전으로 올리고,
+# 파싱 결과도 그 워크시트(와 의존하는 워크시트)의 버전이 바뀐 경우에만 다시 계산합니다.
+
+
+def rows_digest(rows):
+    return hashlib.blake2b(json.dumps(rows, ensure_ascii=False).encode(), digest_size=16).digest()
+
+
+class SheetRevisionCache:
+    def __init__(self, titles, check_interval=10.0, clock=time.monotonic):
+        self.titles = tuple(titles)
+        self.check_interval = float(check_interval)
+        self.clock = clock
+        self.lock = threading.Lock()   # 동시에 여러 세션이 확인해도 요청은 한 번만
+        self.revision = None
+        self.checked_at = -math.inf
+        self.rows = {}
+        self.digests = {}
+        self.versions = {t: 0 for t in self.titles}   # 내용이 바뀔 때마다 +1
+        self.memo = {}
+        self.checks = 0
+        self.reloads = 0
+        self.changes = {t: 0 for t in self.titles}
+        self.seeded = 0
+
+    def refresh(self, fetch_revision, fetch_rows, seed=None):
+        # check_interval이 지났으면 리비전을 확인하고, 바뀌었으면 다시 받음. 반환: 내용이 바뀐 워크시트 집합
+        # seed: 미리 데워 둔 스냅샷 (.revision, .rows, .memo()). 캐시가 비어 있고 리비전이 같으면 다시 받지 않고 그대로 사용
+        with self.lock:
+            now = self.clock()
+            if self.rows and now - self.checked_at < self.check_interval:
+                return set()
+            try:
+                revision = fetch_revision()
+            except Exception:
+                revision = None     # 메타데이터를 못 받으면 값을 직접 비교
+            self.checks += 1
+            self.checked_at = now
+            if self.rows and revision is not None and revision == self.revision:
+                return set()
+            if not self.rows and seed is not None and revision is not None and seed.revision == revision:
+                self._adopt(seed)
+                return set()
+
+            fetched = fetch_rows(self.titles)
+            self.reloads += 1
+            changed = set()
+            for title in self.titles:
+                rows = fetched.get(title, [])
+                digest = rows_digest(rows)
+                if digest != self.digests.get(title):
+                    self.rows[title] = rows
+                    self.digests[title] = digest
+                    self.versions[title] += 1
+                    self.changes[title] += 1
+                    changed.add(title)
+            self.revision = revision
+            return changed
+
+    def _adopt(self, seed):
+        # 잠금을 잡은 상태에서 호출: 스냅샷의 행과 파싱 결과를 현재 버전으로 등록
+        for title in self.titles:
+            rows = seed.rows.get(title, [])
+            self.rows[title] = rows
+            self.digests[title] = rows_digest(rows)
+            self.versions[title] += 1
+        for name, (titles, value) in seed.memo().items():
+            self.memo[name] = (tuple(self.versions[t] for t in titles), value)
+        self.revision = seed.revision
+        self.seeded += 1
+
+    def expire(self):
+        # 다음 refresh에서 바로 리비전을 확인 (이 프로세스가 시트를 고친 직후 등)
+        with self.lock:
+            self.checked_at = -math.inf
+
+    def parsed(self, name, parse, *titles):
+        # titles 워크시트 행으로 parse(*rows)를 계산하되, 그 워크시트들의 버전이 같으면 이전 결과 재사용
+        with self.lock:
+            key = tuple(self.versions[t] for t in titles)
+            hit = self.memo.get(name)
+            if hit is not None and hit[0] == key:
+                return hit[1]
+            value = parse(*(self.rows.get(t, []) for t in titles))
+            self.memo[name] = (key, value)
+            return value
+
+    def stats(self):
+        with self.lock:
+            return {
+                'revision': self.revision,
+                'checks': self.checks,
+                'reloads': self.reloads,
+                'seeded': self.seeded,
+                'versions': dict(self.versions),
+                'changes': dict(self.changes),
+            }
@@ -0,0 +1,208 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# --- 구글 시트 통신 계층 ---
+# 모든 세션이 하나의 토큰 버킷을 공유하여 프로젝트 쿼터(기본 분당 60회)를 넘지 않게 하고,
+# 429/5xx 응답은 지터가 섞인 지수 백오프로 재시도합니다.
+# gspread/requests는 무거우므로 실제로 인증할 때(authorize) 처음 import 합니다.
+
+# 요청 우선순위 (숫자가 작을수록 먼저 처리)
+PRIORITY_SAVE = 0      # 플레이어 저장
+PRIORITY_REFRESH = 1   # 설정/캐시 새로고침
+
+PRIORITY_NAMES = {PRIORITY_SAVE: "save", PRIORITY_REFRESH: "refresh"}
+
+_local = threading.local()
+_jitter = random.Random()  # 게임 로직의 random 시드와 분리
+
+
+@contextmanager
+def sheets_priority(priority):
+    # 이 블록 안에서 현재 스레드가 보내는 시트 요청의 우선순위를 지정
+    prev = getattr(_local, 'priority', PRIORITY_REFRESH)
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = prev
+
+
+def current_priority():
+    return getattr(_local, 'priority', PRIORITY_REFRESH)
+
+
+class TokenBucket:
+    # 스레드 안전한 우선순위 토큰 버킷
+    # - 저장 요청은 토큰이 1개만 있어도 통과
+    # - 새로고침 요청은 reserve 개를 저장용으로 남겨두고, 대기 중인 저장 요청이 있으면 양보
+    def __init__(self, rate, capacity, reserve=0):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.reserve = min(float(reserve), self.capacity - 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiting_save = 0
+        self.cond = threading.Condition()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def acquire(self, priority=PRIORITY_REFRESH):
+        # 토큰 1개를 얻을 때까지 대기하고, 대기한 시간(초)을 반환
+        is_save = priority == PRIORITY_SAVE
+        start = time.monotonic()
+        with self.cond:
+            if is_save:
+                self.waiting_save += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    floor = 0 if is_save else self.reserve
+                    if now < self.blocked_until:
+                        wait = self.blocked_until - now
+                    elif not is_save and self.waiting_save > 0:
+                        wait = 1.0 / self.rate
+                    elif self.tokens >= floor + 1:
+                        self.tokens -= 1
+                        return time.monotonic() - start
+                    else:
+                        wait = (floor + 1 - self.tokens) / self.rate
+                    self.cond.wait(wait)
+            finally:
+                if is_save:
+                    self.waiting_save -= 1
+                self.cond.notify_all()
+
+    def penalize(self, seconds):
+        # 쿼터 초과 응답을 받으면 모든 세션의 요청을 잠시 멈추고 버킷을 비움
+        with self.cond:
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+            self.blocked_until = max(self.blocked_until, self.updated + seconds)
+            self.cond.notify_all()
+
+
+class SheetsMetrics:
+    # 시트 요청/스로틀/재시도 통계 (프로세스 전역)
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.throttled = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.throttle_wait = 0.0
+        self.retries = 0
+        self.retry_wait = 0.0
+        self.quota_errors = 0
+        self.failures = 0
+
+    def record_request(self, priority, waited):
+        name = PRIORITY_NAMES.get(priority, "refresh")
+        with self.lock:
+            self.requests[name] += 1
+            if waited > 0.001:
+                self.throttled[name] += 1
+                self.throttle_wait += waited
+
+    def record_retry(self, delay, quota_hit):
+        with self.lock:
+            self.retries += 1
+            self.retry_wait += delay
+            if quota_hit:
+                self.quota_errors += 1
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'requests': dict(self.requests),
+                'throttled': dict(self.throttled),
+                'throttle_wait_sec': round(self.throttle_wait, 2),
+                'retries': self.retries,
+                'retry_wait_sec': round(self.retry_wait, 2),
+                'quota_errors': self.quota_errors,
+                'failures': self.failures,
+            }
+
+
+def backoff_delay(attempt, base=1.0, cap=32.0):
+    # full jitter: 0 ~ min(cap, base * 2^attempt) 사이 임의값
+    return _jitter.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class BackgroundConnection:
+    # 인증 + 스프레드시트 열기를 백그라운드 스레드에서 미리 진행하고,
+    # 실제로 시트를 읽거나 쓸 때(worksheet) 처음으로 완료를 기다림
+    def __init__(self, connect):
+        self._connect = connect
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.spreadsheet = None
+        self.error = None
+        self.elapsed = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sheets-connect", daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.spreadsheet = self._connect()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.elapsed = time.perf_counter() - start
+            self._done.set()
+
+    def ready(self):
+        return self._done.is_set()
+
+    def failed(self):
+        return self._done.is_set() and self.error is not None
+
+    def wait(self, timeout=None):
+        self.start()
+        if not self._done.wait(timeout):
+            raise TimeoutError("시트 연결 대기 시간 초과")
+        if self.error is not None:
+            raise self.error
+        return self.spreadsheet
+
+    def worksheet(self, title):
+        return self.wait().worksheet(title)
+
+    def __bool__(self):
+        # 연결 중에는 참 (실패가 확정된 경우만 거짓)
+        return not self.failed()
+
+
+def authorize(creds, limiter, metrics, pool_size=10, max_retries=5):
+    # gspread.authorize 대신 사용 (쿼터 제한 + 재시도가 적용된 클라이언트)
+    import gspread
+    from sheets_http import QuotaHTTPClient
+
+    def http_client(auth, session=None):
+        return QuotaHTTPClient(auth, session, limiter=limiter, metrics=metrics,
+                               pool_size=pool_size, max_retries=max_retries)
+
+    return gspread.authorize(creds, http_client=http_client)
+
+
+def __getattr__(name):
+    # sheets_client.QuotaHTTPClient 접근 시에만 gspread를 불러옴
+    if name == 'QuotaHTTPClient':
+        from sheets_http import QuotaHTTPClient
+        return QuotaHTTPClient
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,63 @@
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+from sheets_client import SheetsMetrics, backoff_delay, current_priority
+
+# --- 쿼터 제한 HTTP 클라이언트 ---
+# gspread에 의존하는 부분만 따로 둔 모듈. sheets_client.authorize가 처음 호출될 때 import 됩니다.
+
+_RETRY_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def _is_quota_error(err):
+    if err.code == 429:
+        return True
+    # Drive API는 사용량 초과를 403 usageLimits로 알려줌
+    if err.code == 403:
+        errors = err.error.get('errors') if isinstance(err.error, dict) else None
+        return bool(errors) and errors[0].get('domain') == 'usageLimits'
+    return False
+
+
+class QuotaHTTPClient(HTTPClient):
+    # gspread HTTPClient에 토큰 버킷, 커넥션 풀, 재시도를 붙인 버전
+    def __init__(self, auth, session=None, limiter=None, metrics=None,
+                 pool_size=10, max_retries=5, base_delay=1.0, max_delay=32.0):
+        super().__init__(auth, session)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.limiter = limiter
+        self.metrics = metrics or SheetsMetrics()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def request(self, *args, **kwargs):
+        priority = current_priority()
+        attempt = 0
+        while True:
+            waited = self.limiter.acquire(priority) if self.limiter else 0.0
+            self.metrics.record_request(priority, waited)
+            try:
+                return super().request(*args, **kwargs)
+            except APIError as err:
+                quota_hit = _is_quota_error(err)
+                if not (quota_hit or err.code in _RETRY_CODES) or attempt >= self.max_retries:
+                    self.metrics.record_failure()
+                    raise
+            except (requests.ConnectionError, requests.Timeout):
+                quota_hit = False
+                if attempt >= self.max_retries:
+                    self.metrics.record_failure()
+                    raise
+
+            delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+            if quota_hit and self.limiter:
+                self.limiter.penalize(delay)
+            self.metrics.record_retry(delay, quota_hit)
+            time.sleep(delay)
+            attempt += 1
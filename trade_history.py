@@ -0,0 +1,212 @@
+"""분석용 거래 기록 (Parquet)
+
+체결된 거래를 가격 구간(같은 체결가로 이어진 구간)마다 한 행으로 기록합니다.
+행은 메모리에 열 단위로 모아 두었다가 batch_rows개가 차거나 flush_sec초가 지나면
+백그라운드 스레드가 날짜별 파티션(root/date=YYYY-MM-DD/)에 Parquet 파일로 씁니다.
+pyarrow는 처음 파일을 쓰거나 읽을 때 import 합니다.
+
+    python trade_history.py --root .trade_history --since 2026-10-01
+"""
+import argparse
+import atexit
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+# 열 이름과 Arrow 타입 이름 (pyarrow 없이도 버퍼를 만들 수 있도록 문자열로 둠)
+COLUMNS = (
+    ('ts', 'timestamp[ms]'),
+    ('trade_id', 'string'),
+    ('session', 'string'),
+    ('slot', 'int32'),
+    ('year', 'int16'),
+    ('month', 'int8'),
+    ('week', 'int8'),
+    ('village', 'string'),
+    ('item', 'string'),
+    ('side', 'string'),
+    ('source', 'string'),     # manual / cart / limit
+    ('tier', 'int8'),         # 이 거래 안에서 몇 번째 가격 구간인지 (0부터)
+    ('qty', 'int32'),
+    ('price', 'int64'),
+    ('amount', 'int64'),
+)
+
+
+def arrow_schema():
+    import pyarrow as pa
+    types = {
+        'timestamp[ms]': pa.timestamp('ms'), 'string': pa.string(), 'int8': pa.int8(),
+        'int16': pa.int16(), 'int32': pa.int32(), 'int64': pa.int64(),
+    }
+    return pa.schema([(name, types[t]) for name, t in COLUMNS])
+
+
+def merge_fills(fills):
+    # [(단가, 수량)] → 연속해서 같은 단가인 체결을 합친 구간 목록
+    tiers = []
+    for price, qty in fills:
+        if qty <= 0:
+            continue
+        if tiers and tiers[-1][0] == price:
+            tiers[-1][1] += qty
+        else:
+            tiers.append([price, qty])
+    return tiers
+
+
+class TradeHistory:
+    def __init__(self, root, batch_rows=500, flush_sec=30.0):
+        self.root = root
+        self.batch_rows = int(batch_rows)
+        self.flush_sec = float(flush_sec)
+        self.lock = threading.Lock()
+        self.buffer = self._empty()
+        self.buffered_at = None
+        self.seq = 0
+        self.rows_written = 0
+        self.files_written = 0
+        self.errors = 0
+        self.last_error = None
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target=self._write_loop, name="trade-history", daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def _empty(self):
+        return {name: [] for name, _ in COLUMNS}
+
+    def record(self, side, village, item, fills, slot, session, game_time, source='manual'):
+        # fills: [(단가, 수량)] 체결 순서대로. game_time: (year, month, week)
+        tiers = merge_fills(fills)
+        if not tiers:
+            return
+        now = datetime.now()
+        trade_id = uuid.uuid4().hex[:16]
+        year, month, week = game_time
+        with self.lock:
+            buf = self.buffer
+            for tier, (price, qty) in enumerate(tiers):
+                buf['ts'].append(now)
+                buf['trade_id'].append(trade_id)
+                buf['session'].append(session)
+                buf['slot'].append(slot)
+                buf['year'].append(year)
+                buf['month'].append(month)
+                buf['week'].append(week)
+                buf['village'].append(village)
+                buf['item'].append(item)
+                buf['side'].append(side)
+                buf['source'].append(source)
+                buf['tier'].append(tier)
+                buf['qty'].append(qty)
+                buf['price'].append(price)
+                buf['amount'].append(price * qty)
+            if self.buffered_at is None:
+                self.buffered_at = time.monotonic()
+            if len(buf['ts']) >= self.batch_rows or time.monotonic() - self.buffered_at >= self.flush_sec:
+                self._swap()
+
+    def _swap(self):
+        # 잠금을 잡은 상태에서 호출: 현재 버퍼를 쓰기 스레드로 넘김
+        if self.buffer['ts']:
+            self.queue.put(self.buffer)
+            self.buffer = self._empty()
+        self.buffered_at = None
+
+    def flush(self, wait=False):
+        with self.lock:
+            self._swap()
+        if wait:
+            self.queue.join()
+
+    def close(self):
+        self.flush(wait=True)
+
+    def _write_loop(self):
+        while True:
+            batch = self.queue.get()
+            try:
+                self._write(batch)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = repr(e)
+            finally:
+                self.queue.task_done()
+
+    def _write(self, batch):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # 자정을 넘긴 배치는 날짜별로 나눠 씀
+        by_date = {}
+        for i, ts in enumerate(batch['ts']):
+            by_date.setdefault(ts.strftime('%Y-%m-%d'), []).append(i)
+        schema = arrow_schema()
+        for date, idx in by_date.items():
+            if len(idx) == len(batch['ts']):
+                cols = batch
+            else:
+                cols = {name: [batch[name][i] for i in idx] for name in batch}
+            table = pa.Table.from_pydict(cols, schema=schema)
+            part_dir = os.path.join(self.root, f"date={date}")
+            os.makedirs(part_dir, exist_ok=True)
+            self.seq += 1
+            name = f"part-{os.getpid()}-{int(time.time() * 1000)}-{self.seq:06d}.parquet"
+            # 점으로 시작하는 임시 파일은 읽을 때 무시되므로, 다 쓴 뒤 이름을 바꿈
+            tmp = os.path.join(part_dir, f".{name}.tmp")
+            pq.write_table(table, tmp, compression='zstd')
+            os.replace(tmp, os.path.join(part_dir, name))
+            self.rows_written += table.num_rows
+            self.files_written += 1
+
+
+def read_history(root, since=None, until=None, columns=None):
+    # 날짜 파티션(since~until, 'YYYY-MM-DD')만 메모리 매핑으로 읽어 Arrow Table 반환
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    filters = []
+    if since:
+        filters.append(('date', '>=', since))
+    if until:
+        filters.append(('date', '<=', until))
+    partitioning = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+    return pq.read_table(root, columns=columns, filters=filters or None, memory_map=True,
+                         partitioning=partitioning)
+
+
+def summarize(table, keys=('item', 'side')):
+    # 품목/방향별 거래 수, 수량, 금액, 평균 단가
+    import pyarrow.compute as pc
+
+    grouped = table.group_by(list(keys)).aggregate([
+        ('trade_id', 'count_distinct'), ('qty', 'sum'), ('amount', 'sum'),
+    ])
+    avg = pc.divide(pc.cast(grouped['amount_sum'], 'float64'), pc.cast(grouped['qty_sum'], 'float64'))
+    return grouped.append_column('avg_price', avg).sort_by([(k, 'ascending') for k in keys])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="거래 기록 Parquet 집계")
+    parser.add_argument("--root", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".trade_history"))
+    parser.add_argument("--since")
+    parser.add_argument("--until")
+    parser.add_argument("--by", nargs="+", default=["item", "side"], help="집계 기준 열")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    table = read_history(args.root, args.since, args.until,
+                         columns=sorted(set(args.by) | {'trade_id', 'qty', 'amount'}))
+    result = summarize(table, args.by)
+    elapsed = time.perf_counter() - start
+    print(result.to_pandas().to_string(index=False))
+    print(f"\n{table.num_rows:,}행 집계 ({elapsed * 1000:.0f}ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# --- 백그라운드 체결 ---
+# 매수/매도 체결을 스크립트 스레드가 아닌 작업 스레드에서 처리합니다.
+# 세션마다 TradeDesk 하나가 접수된 주문을 순서대로 이어서(파이프라인) 실행하고,
+# 체결 단위(BATCH_SIZE)마다 desk.lock 안에서 플레이어/시장 상태에 반영한 뒤 진행 알림을 큐에 넣습니다.
+# 화면은 프래그먼트가 큐를 비우며 그리고, 세션 상태 후처리(통계, 장부, 거래 기록, 지정가 점검)도
+# 큐를 비우는 스크립트 스레드에서 합니다 (작업 스레드는 st.session_state를 건드리지 않음).
+#
+# 스크립트 스레드에서 플레이어 상태를 바꿀 때(시간 진행, 지정가 체결, 장바구니)는 desk.lock을 잡고,
+# 이동/고용/저장처럼 진행 중인 주문이 끝난 뒤여야 하는 동작은 wait()로 기다립니다.
+
+PROGRESS = 'progress'
+DONE = 'done'
+
+
+def make_pool(workers=4):
+    # 프로세스 전역 작업 스레드 풀 (st.cache_resource로 1개만 생성)
+    return ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="trade")
+
+
+class TradeDesk:
+    def __init__(self, pool, pace=0.05):
+        self.pool = pool
+        self.pace = pace                # 체결 단위 사이 대기 (체결되는 느낌). 스크립트는 막지 않음
+        self.lock = threading.RLock()   # 플레이어 상태 변경 잠금 (작업 스레드 ↔ 스크립트 스레드)
+        self.events = queue.Queue()
+        self.jobs = deque()             # (주문, 체결 생성기)
+        self.running = False
+        self.open = {}                  # 주문 id -> 주문 (완료 알림을 아직 가져가지 않은 것)
+        self.seq = 0
+        self.cond = threading.Condition()
+        self.on_fill = None             # on_fill(주문, 체결수량, 단가): 체결 단위마다 작업 스레드에서 잠금 안에서 호출
+
+    def submit(self, side, pos, item_name, qty, batches):
+        # batches: (체결수량, 단가)를 내보내는 생성기 (game_rules.buy_batches/sell_batches)
+        with self.cond:
+            self.seq += 1
+            job = {'id': self.seq, 'side': side, 'pos': pos, 'item': item_name, 'qty': qty,
+                   'submitted': time.time()}
+            self.jobs.append((job, batches))
+            self.open[job['id']] = job
+            start = not self.running
+            self.running = True
+        if start:
+            self.pool.submit(self._run)
+        return job
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if not self.jobs:
+                    self.running = False
+                    self.cond.notify_all()
+                    return
+                job, batches = self.jobs.popleft()
+            self._execute(job, batches)
+
+    def _execute(self, job, batches):
+        done = amount = 0
+        fills = []
+        error = None
+        while True:
+            # 한 체결 단위씩 잠금 안에서 반영 (스크립트 스레드의 상태 변경과 겹치지 않음)
+            with self.lock:
+                try:
+                    step = next(batches, None)
+                except Exception as e:
+                    step, error = None, str(e)
+                if step is None:
+                    break
+                n, price = step
+                # 반영한 체결 단위와 같은 잠금 안에서 알림 (세션 녹화 순서가 실제 반영 순서와 같도록)
+                if self.on_fill is not None:
+                    self.on_fill(job, n, price)
+            done += n
+            amount += n * price
+            fills.append((price, n))
+            self.events.put((PROGRESS, job, done, price))
+            if self.pace:
+                time.sleep(self.pace)
+        self.events.put((DONE, job, done, amount, fills, error))
+
+    def poll(self):
+        # 쌓인 진행/완료 알림을 모두 꺼냄 (스크립트 스레드에서 호출)
+        out = []
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return out
+            if event[0] == DONE:
+                with self.cond:
+                    self.open.pop(event[1]['id'], None)
+            out.append(event)
+
+    def busy(self):
+        # 실행 중이거나 완료 알림을 아직 처리하지 않은 주문이 있는지
+        return bool(self.open)
+
+    def open_jobs(self):
+        with self.cond:
+            return list(self.open.values())
+
+    def wait(self, timeout=None):
+        # 접수된 주문이 모두 체결될 때까지 대기. 반환: 제시간에 끝났는지
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.running, timeout)
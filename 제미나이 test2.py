@@ -1,14 +1,32 @@
 import streamlit as st
-from streamlit_autorefresh import st_autorefresh  # 이 줄을 추가
-import gspread
-from google.oauth2.service_account import Credentials
-import json
+from sheets_client import (TokenBucket, SheetsMetrics, BackgroundConnection, authorize, sheets_priority,
+                           PRIORITY_SAVE, PRIORITY_REFRESH)
+from session_store import SessionRegistry, state_sizes, EVICTED_KEY
+from limit_orders import OrderBook, BUY, SELL
+from shared_market import SharedMarket, buy_from, sell_to, market_lock
+from liquidation import plan_liquidation
+from domain import Catalog, Player, Inventory
+from sheet_cache import SheetRevisionCache
+from ledger import Ledger
+from market_events import MarketEvents, game_week
+from game_rules import (carry_weight, buy_batches, sell_batches, travel_cost, move, hire, fire, advance_weeks,
+                        save_player, BATCH_SIZE, MERC_CAMP)
+from trade_history import TradeHistory
+from game_config import GAME_SHEETS, PARSERS, sheet_revision, fetch_sheet_rows, join_parsed
+from price_curve import compile_prices
+from config_snapshot import SnapshotFile, publish
+from trade_worker import TradeDesk, make_pool, PROGRESS
+from session_replay import SessionRecorder, recording_path
+from leaderboard import DEFAULT_PATH as LEADERBOARD_PATH, Leaderboard, market_price_of, net_worth, slot_entry
+import copy
 import math
 import time
 from datetime import datetime
 import hashlib
 import uuid
-import random
+import os
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # --- 1. 페이지 설정 및 스타일 ---
 st.set_page_config(
@@ -62,116 +80,171 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- 2. 구글 시트 연결 함수 ---
-@st.cache_resource
-def connect_gsheet():
+def get_secret_table(name):
+    # secrets.toml의 선택 항목 테이블 (없으면 빈 dict)
     try:
-        scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-        creds_info = st.secrets["gspread"]
+        return dict(st.secrets.get(name, {}))
+    except Exception:
+        return {}
+
+@st.cache_resource
+def get_sheets_quota():
+    # 모든 세션이 공유하는 시트 쿼터 (secrets의 [sheets_quota]로 조정 가능)
+    quota = get_secret_table("sheets_quota")
+    per_minute = float(quota.get("requests_per_minute", 60))
+    limiter = TokenBucket(
+        rate=per_minute / 60,
+        capacity=float(quota.get("burst", 10)),
+        reserve=float(quota.get("save_reserve", 2))
+    )
+    return limiter, SheetsMetrics(), int(quota.get("pool_size", 10)), int(quota.get("max_retries", 5))
+
+@st.cache_resource
+def get_sheets_connection():
+    # 서버 시작 후 첫 접속 때 백그라운드에서 인증을 시작 (google-auth/gspread도 이때 import)
+    scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+    creds_info = get_secret_table("gspread")
+    limiter, metrics, pool_size, max_retries = get_sheets_quota()
+    
+    def open_spreadsheet():
+        from google.oauth2.service_account import Credentials
         creds = Credentials.from_service_account_info(creds_info, scopes=scopes)
-        return gspread.authorize(creds).open("조선거상_DB")
-    except Exception as e:
-        st.error(f"❌ 시트 연결 에러: {e}")
+        client = authorize(creds, limiter, metrics, pool_size=pool_size, max_retries=max_retries)
+        return client.open("조선거상_DB")
+    
+    return BackgroundConnection(open_spreadsheet).start()
+
+def connect_gsheet():
+    # 연결 중이면 그대로 반환 (시트를 실제로 쓸 때 완료를 기다림), 실패했으면 None
+    conn = get_sheets_connection()
+    if conn.failed():
+        st.error(f"❌ 시트 연결 에러: {conn.error}")
         return None
+    return conn
+
+def config_snapshot_path():
+    conf = get_secret_table("startup")
+    return conf.get("config_snapshot") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".config_snapshot.bin")
+
+@st.cache_resource
+def get_config_snapshot_file():
+    # 서버 시작 전 prewarm.py가 (또는 다른 워커가) 게시한 설정 스냅샷. 모든 워커가 mmap으로 공유
+    return SnapshotFile(config_snapshot_path())
+
+def current_config_snapshot():
+    return get_config_snapshot_file().current()
+
+def write_config_snapshot(cache, data):
+    # 시트에서 새로 받은 설정/슬롯과 파생 구조를 스냅샷으로 게시 (다음 콜드 스타트와 다른 워커용)
+    try:
+        curve, _ = get_price_book(data[0], data[1])
+        publish(config_snapshot_path(), cache.revision, dict(cache.rows), data, curve)
+    except OSError:
+        pass
+
+def read_config_snapshot():
+    snapshot = current_config_snapshot()
+    return copy.deepcopy(snapshot.parsed) if snapshot is not None else None
 
 # --- 3. 데이터 로드 함수 ---
-@st.cache_data(ttl=60)
+@st.cache_resource
+def get_sheet_cache():
+    # 프로세스 전체가 공유하는 워크시트 캐시 (secrets의 [sheet_cache] check_interval초마다 리비전 확인)
+    conf = get_secret_table("sheet_cache")
+    return SheetRevisionCache(GAME_SHEETS, check_interval=float(conf.get("check_interval", 10)))
+
 def load_game_data():
     doc = connect_gsheet()
     if not doc:
         return None, None, None, None, None, None  # 6개 반환
     
+    cache = get_sheet_cache()
     try:
-        # 설정 데이터 로드
-        set_ws = doc.worksheet("Setting_Data")
-        settings = {r['변수명']: float(r['값']) for r in set_ws.get_all_records()}
-        # volatility 값이 settings 딕셔너리에 자동으로 포함됨
-        
-        # 아이템 정보 로드
-        item_ws = doc.worksheet("Item_Data")
-        items_info = {}
-        for r in item_ws.get_all_records():
-            if r.get('item_name'):
-                name = str(r['item_name']).strip()
-                items_info[name] = {
-                    'base': int(r['base_price']),
-                    'w': int(r['weight'])
-                }
-        
-        # 용병 정보 로드
-        bal_ws = doc.worksheet("Balance_Data")
-        merc_data = {}
-        for r in bal_ws.get_all_records():
-            if r.get('name'):
-                name = str(r['name']).strip()
-                merc_data[name] = {
-                    'price': int(r['price']),
-                    'w_bonus': int(r.get('weight_bonus', 0))
-                }
-        
-        # 마을 데이터 로드
-        vil_ws = doc.worksheet("Village_Data")
-        vil_vals = vil_ws.get_all_values()
-        headers = [h.strip() for h in vil_vals[0]]
-        
-        villages = {}
-        initial_stocks = {}
-        seen_villages = set()
-        
-        for row in vil_vals[1:]:
-            if not row or not row[0].strip():
-                continue
-            v_name = row[0].strip()
-            
-            if v_name in seen_villages:
-                continue
-            seen_villages.add(v_name)
-            
-            try:
-                x = int(row[1]) if len(row) > 1 and row[1] else 0
-                y = int(row[2]) if len(row) > 2 and row[2] else 0
-            except:
-                x, y = 0, 0
-            
-            villages[v_name] = {'items': {}, 'x': x, 'y': y}
-            initial_stocks[v_name] = {}
-            
-            if v_name != "용병 고용소":
-                for i in range(3, len(headers)):
-                    if headers[i] in items_info:
-                        if len(row) > i and row[i].strip():
-                            try:
-                                stock = int(row[i])
-                                villages[v_name]['items'][headers[i]] = stock
-                                initial_stocks[v_name][headers[i]] = stock
-                            except:
-                                pass
-        
-        # 플레이어 데이터 로드
-        play_ws = doc.worksheet("Player_Data")
-        slots = []
-        for r in play_ws.get_all_records():
-            if str(r.get('slot', '')).strip():
-                slots.append({
-                    'slot': int(r['slot']),
-                    'money': int(r.get('money', 0)),
-                    'pos': str(r.get('pos', '한양')),
-                    'inv': json.loads(r.get('inventory', '{}')) if r.get('inventory') else {},
-                    'mercs': json.loads(r.get('mercs', '[]')) if r.get('mercs') else [],
-                    'week': int(r.get('week', 1)),
-                    'month': int(r.get('month', 1)),
-                    'year': int(r.get('year', 1592)),
-                    'last_save': r.get('last_save', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-                })
-        
-        # ✅ city_settings 관련 코드 모두 제거
-        
-        return settings, items_info, merc_data, villages, initial_stocks, slots  # 6개 반환
-    
+        with sheets_priority(PRIORITY_REFRESH):
+            changed = cache.refresh(lambda: sheet_revision(doc.wait()),
+                                    lambda titles: fetch_sheet_rows(doc.wait(), titles),
+                                    seed=current_config_snapshot())
+        data = _parse_game_data(cache)
     except Exception as e:
         st.error(f"❌ 데이터 로드 에러: {e}")
         return None, None, None, None, None, None  # 6개 반환
+    if changed:
+        write_config_snapshot(cache, data)
+    # 세션마다 고쳐 쓸 수 있도록 사본을 반환 (캐시된 파싱 결과는 그대로 보존)
+    return copy.deepcopy(data)
+
+def load_title_data():
+    # 시트 연결이 끝나기 전에는 로컬 사본으로 타이틀 화면을 먼저 그림. 반환 (데이터, 사본 여부)
+    if not get_sheets_connection().ready():
+        snapshot = read_config_snapshot()
+        if snapshot is not None:
+            return snapshot, True
+    return load_game_data(), False
+
+def _parse_game_data(cache):
+    # 워크시트별로 파싱하고, 내용이 바뀐 워크시트만 다시 계산
+    return join_parsed({name: cache.parsed(name, parse, *titles) for name, parse, titles in PARSERS})  # 6개 반환
+
+@st.cache_resource
+def get_catalog(items_info, merc_data, villages):
+    # 시트 설정으로 만든 아이템/용병/마을 카탈로그 (설정이 같으면 모든 세션이 공유)
+    return Catalog(items_info, merc_data, villages)
+
+def bind_catalog(player, items_info, merc_data, villages):
+    # 시트 dict → 타입 모델로 변환. 반환 (player, items_info, merc_data, villages)
+    catalog = get_catalog(items_info, merc_data, villages)
+    if isinstance(player, Player):
+        # 스냅샷 복원 등으로 카탈로그가 바뀌었을 수 있으므로 아이템 id를 다시 매김
+        player.inv = Inventory(catalog, player.inv.to_dict())
+    else:
+        player = Player.from_record(player, catalog)
+    return player, catalog.items, catalog.mercs, catalog.villages
 
 # --- 4. 세션 초기화 함수 ---
+@st.cache_resource
+def get_session_registry():
+    # 방치된 세션의 게임 상태를 스냅샷으로 내보내는 전역 관리자 (secrets의 [session_eviction]로 조정)
+    conf = get_secret_table("session_eviction")
+    snapshot_dir = conf.get("snapshot_dir") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".session_snapshots")
+    return SessionRegistry(
+        snapshot_dir,
+        idle_sec=int(conf.get("idle_sec", 600)),
+        sweep_every=int(conf.get("sweep_every", 60)),
+        forget_sec=int(conf.get("forget_sec", 86400)),
+        is_alive=lambda session_id: Runtime.instance().is_active_session(session_id)
+    )
+
+def track_session():
+    # 접속 기록 + 내보낸 상태 복원 + 다른 방치 세션 정리
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    registry = get_session_registry()
+    if registry.touch(ctx.session_id, st.session_state, ctx.session_state) and st.session_state.get('game_started'):
+        # 시트 설정은 스냅샷에 넣지 않았으므로 캐시에서 다시 채움
+        (st.session_state.settings, items_info, merc_data,
+         villages, st.session_state.initial_stocks, _) = load_game_data()
+        if st.session_state.settings is None:
+            st.session_state.game_started = False
+        else:
+            (st.session_state.player, st.session_state.items_info, st.session_state.merc_data,
+             st.session_state.villages) = bind_catalog(st.session_state.player, items_info, merc_data, villages)
+            if is_shared_market(st.session_state.settings):
+                # 스냅샷에는 공유 시장의 사본이 들어 있으므로 원본에 다시 연결
+                st.session_state.market_data = get_shared_market()
+            if 'recorder' in st.session_state:
+                # 녹화는 복원된 새 상태 객체를 기록
+                st.session_state.recorder.bind(st.session_state.player, st.session_state.market_data, market_events())
+    registry.sweep(current=ctx.session_id)
+
+def track_fragment():
+    # 프래그먼트 실행은 스크립트 처음의 track_session()을 거치지 않으므로 상태를 읽기 전에 직접 호출
+    # (절전에서 깬 브라우저의 타이머 실행처럼 방치 정리 뒤 첫 실행이 프래그먼트일 수 있음)
+    track_session()
+    if EVICTED_KEY in st.session_state or not st.session_state.get('game_started'):
+        # 복원하지 못했으면 전체 화면을 다시 그림 (타이틀 화면으로)
+        st.rerun()
+
 def init_session_state():
     if 'game_started' not in st.session_state:
         st.session_state.game_started = False
@@ -210,10 +283,14 @@ def init_session_state():
         st.session_state.last_save_time = time.time()
     if 'trade_logs' not in st.session_state:
         st.session_state.trade_logs = {}
-    if 'is_trading' not in st.session_state:
-        st.session_state.is_trading = False
     if 'last_qty' not in st.session_state:
         st.session_state.last_qty = {}
+    if 'limit_orders' not in st.session_state:
+        st.session_state.limit_orders = OrderBook()
+    if 'ledger' not in st.session_state:
+        st.session_state.ledger = Ledger()
+    if 'trade_cart' not in st.session_state:
+        st.session_state.trade_cart = {'pos': None, 'lines': []}
 
 # --- 5. 시간 시스템 함수 ---
 def update_game_time(player, settings, market_data, initial_stocks):
@@ -231,92 +308,41 @@ def update_game_time(player, settings, market_data, initial_stocks):
     events = []
     
     if weeks_passed > 0:
-        for _ in range(weeks_passed):
-            player['week'] += 1
-            if player['week'] > 4:
-                player['week'] = 1
-                player['month'] += 1
-                
-                # ⭐ [핵심 추가] 월이 바뀌면 재고를 초기화합니다.
-                for v_name, v_items in initial_stocks.items():
-                    if v_name in market_data:
-                        for item_name, initial_stock_val in v_items.items():
-                            if item_name in market_data[v_name]:
-                                market_data[v_name][item_name]['stock'] = initial_stock_val
-                
+        # 체결 중인 주문과 겹치지 않게 체결 창구 잠금 안에서 진행
+        with trade_desk().lock:
+            # ⭐ 월이 바뀌면 재고를 초기화합니다. (공유 시장은 아래에서 서버 시간 기준으로 한 번만)
+            own_market = None if isinstance(market_data, SharedMarket) else market_data
+            for _ in range(advance_weeks(player, weeks_passed, own_market, initial_stocks)):
                 events.append(("month", "📅 새 달이 밝아 모든 마을의 재고가 초기화되었습니다!"))
-                
-                if player['month'] > 12:
-                    player['month'] = 1
-                    player['year'] += 1
         
-        st.session_state.last_time_update += weeks_passed * seconds_per_week
+            st.session_state.last_time_update += weeks_passed * seconds_per_week
+        
+            if isinstance(market_data, SharedMarket) and market_data.maybe_reset(initial_stocks, seconds_per_month):
+                events.append(("month", "📅 새 달이 밝아 모든 마을의 재고가 초기화되었습니다!"))
+        
+            # 기한이 된 시장 충격만 처리 (공유 시장은 실제 시간 기준 주차로 모든 세션이 같은 충격을 봄)
+            engine = market_events(market_data)
+            tick = int(current_time // seconds_per_week) if isinstance(market_data, SharedMarket) else game_week(player)
+            for message in engine.advance(tick, market_data, settings):
+                events.append(("shock", message))
+            record_action('advance', {'weeks': weeks_passed, 'tick': tick})
+        
+            # 한 주가 지나면 (월초 재고 초기화 포함) 지정가 주문 점검
+            if 'limit_orders' in st.session_state and st.session_state.limit_orders:
+                update_prices(settings, st.session_state.items_info, market_data, initial_stocks)
+                run_limit_orders(player, st.session_state.items_info, market_data, st.session_state.merc_data)
         
         # 주차 알림 저장
+        message = f"🌟 {player['year']}년 {player['month']}월 {player['week']}주차 소식이 도착했습니다."
+        shocks = [m for kind, m in events if kind == "shock"]
+        if shocks:
+            message += "\n\n" + "\n\n".join(shocks)
         st.session_state.event_display = {
-            "message": f"🌟 {player['year']}년 {player['month']}월 {player['week']}주차 소식이 도착했습니다.",
+            "message": message,
             "time": time.time()
         }
     
     return player, events
-    
-    if months_passed > 0:
-        old_month = player['month']
-        old_year = player['year']
-        
-        for _ in range(months_passed):
-            player['week'] += 1
-            if player['week'] > 4:
-                player['week'] = 1
-                player['month'] += 1
-                if player['month'] > 12:
-                    player['month'] = 1
-                    player['year'] += 1
-        
-        st.session_state.last_time_update = current_time
-        st.session_state.last_update = current_time
-        
-        if old_month != player['month'] or old_year != player['year']:
-            events.append(("month", f"🌙 {player['year']}년 {player['month']}월이 시작되었습니다!"))
-            
-            reset_count = 0
-            for v_name in market_data:
-                if v_name in initial_stocks:
-                    for item_name in market_data[v_name]:
-                        if item_name in initial_stocks[v_name]:
-                            old_stock = market_data[v_name][item_name]['stock']
-                            market_data[v_name][item_name]['stock'] = initial_stocks[v_name][item_name]
-                            if old_stock != initial_stocks[v_name][item_name]:
-                                reset_count += 1
-            if reset_count > 0:
-                events.append(("reset", f"🔄 {reset_count}개 품목 재고 초기화"))
-        
-        events.append(("week", f"🌟 {player['year']}년 {player['month']}월 {player['week']}주차"))
-        
-        # ✅ season effect 관련 코드 완전히 삭제됨
-        
-        # volatility -> inventoryResponsivePrice로 변경
-        inventoryResponsivePrice = settings.get('inventoryResponsivePrice', 5000)
-        event_probability = inventoryResponsivePrice / 1000000
-        
-        if random.random() < event_probability:
-            cities = list(market_data.keys())
-            if cities:
-                random_city = random.choice(cities)
-                items_in_city = list(market_data[random_city].keys())
-                if items_in_city:
-                    vol_item = random.choice(items_in_city)
-                    vol_direction = random.choice(["상승", "하락"])
-                    vol_amount = random.randint(10, 30) + int(inventoryResponsivePrice / 1000)
-                    
-                    if vol_direction == "상승":
-                        market_data[random_city][vol_item]['price'] = int(market_data[random_city][vol_item]['price'] * (1 + vol_amount/100))
-                        events.append(("volatility", f"📈 {random_city}의 {vol_item} 가격 {vol_amount}% 급등!"))
-                    else:
-                        market_data[random_city][vol_item]['price'] = int(market_data[random_city][vol_item]['price'] * (1 - vol_amount/100))
-                        events.append(("volatility", f"📉 {random_city}의 {vol_item} 가격 {vol_amount}% 급락!"))
-    
-    return player, events
 
 def get_time_display(player):
     month_names = ["1월", "2월", "3월", "4월", "5월", "6월", 
@@ -324,185 +350,538 @@ def get_time_display(player):
     return f"{player['year']}년 {month_names[player['month']-1]} {player['week']}주차"
 
 # --- 6. 게임 로직 함수들 ---
+@st.cache_resource
+def get_price_table(settings_key, items_key):
+    return compile_prices(dict(settings_key), {name: {'base': base} for name, base in items_key})
+
+def get_price_book(settings, items_info):
+    # Setting_Data의 가격 곡선을 품목별 단가표로 컴파일 (설정/기준가가 같으면 모든 세션이 공유)
+    # 반환 (PriceCurve, {품목: ItemCurve})
+    return get_price_table(tuple(sorted((settings or {}).items())),
+                           tuple((name, info['base']) for name, info in items_info.items()))
+
+def market_events(market_data=None):
+    # 시장의 충격 이벤트 엔진 (공유 시장이면 시장에 하나, 아니면 세션마다 하나)
+    if market_data is None:
+        market_data = st.session_state.get('market_data')
+    if isinstance(market_data, SharedMarket):
+        return market_data.events
+    if 'market_events' not in st.session_state:
+        st.session_state.market_events = MarketEvents()
+    return st.session_state.market_events
+
+@st.cache_resource
+def get_trade_pool():
+    # 매수/매도 체결용 작업 스레드 풀 (secrets의 [trade_worker]: workers, pace)
+    return make_pool(int(get_secret_table("trade_worker").get("workers", 4)))
+
+def trade_desk():
+    # 세션의 체결 창구 (주문을 순서대로 작업 스레드에서 체결)
+    if 'trade_desk' not in st.session_state:
+        pace = float(get_secret_table("trade_worker").get("pace", 0.05))
+        st.session_state.trade_desk = TradeDesk(get_trade_pool(), pace)
+    return st.session_state.trade_desk
+
+# --- 세션 녹화 ---
+def start_recording(player, market_data, events, seed):
+    # secrets의 [session_recording] enabled = true 이면 게임 시작부터 행동을 녹화 (session_replay.py로 재생)
+    conf = get_secret_table("session_recording")
+    rows = get_sheet_cache().rows
+    if not conf.get("enabled", False) or not rows:
+        return None
+    root = conf.get("dir") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".recordings")
+    recorder = SessionRecorder(recording_path(root, player['slot']))
+    try:
+        recorder.start(rows, player, market_data, events, seed)
+    except OSError as e:
+        st.warning(f"⚠️ 세션 녹화를 시작하지 못했습니다: {e}")
+        return None
+    st.session_state.recorder = recorder
+    # 매수/매도는 체결 작업 스레드가 체결 단위마다 반영과 같은 잠금 안에서 기록
+    # (단위 사이에 끼어든 시간 진행/지정가 체결도 실제 반영 순서대로 남음)
+    trade_desk().on_fill = lambda job, n, price: recorder.record(job['side'], {'item': job['item'], 'qty': n, 'price': price})
+    return recorder
+
+def stop_recording():
+    recorder = st.session_state.pop('recorder', None)
+    if recorder is not None:
+        recorder.close()
+    trade_desk().on_fill = None
+
+def record_action(op, args):
+    recorder = st.session_state.get('recorder')
+    if recorder is not None:
+        recorder.record(op, args)
+
+def item_curve(item_name, items_info, settings=None, village=None):
+    # village를 주면 그 마을의 시장 충격 배율을 곱한 단가표
+    if settings is None:
+        settings = st.session_state.get('settings') or {}
+    curve = get_price_book(settings, items_info)[1][item_name]
+    if village is not None:
+        modifier = market_events().modifier(village, item_name)
+        if modifier != 1.0:
+            curve = curve.scaled(modifier)
+    return curve
+
 def update_prices(settings, items_info, market_data, initial_stocks=None):
     if initial_stocks is None:
         initial_stocks = st.session_state.get('initial_stocks', {})
     
-    min_price_rate = settings.get('min_price_rate', 0.4)
-    max_price_rate = settings.get('max_price_rate', 3.0)
-    
-    inventoryResponsivePrice = settings.get('inventoryResponsivePrice', 5000)
+    _, curves = get_price_book(settings, items_info)
+    modifiers = market_events(market_data).modifiers
     
     for v_name, v_data in market_data.items():
         if v_name == "용병 고용소":
             continue
-            
-        for i_name, i_info in v_data.items():
-            if i_name in items_info:
-                base = items_info[i_name]['base']
-                stock = i_info['stock']
-                
-                # ✅ 절대 재고량으로 가격 결정
-                if stock < 100:  # 재고 100개 미만
-                    price_factor = 2.0  # 2배 비쌈
-                elif stock < 500:  # 재고 500개 미만
-                    price_factor = 1.5  # 1.5배 비쌈
-                elif stock < 1000:  # 재고 1000개 미만
-                    price_factor = 1.2  # 1.2배 비쌈
-                elif stock < 2000:  # 재고 2000개 미만
-                    price_factor = 1.0  # 기준가
-                elif stock < 5000:  # 재고 5000개 미만
-                    price_factor = 0.8  # 0.8배 쌈
-                else:  # 재고 5000개 이상
-                    price_factor = 0.6  # 0.6배 쌈
-                
-                i_info['price'] = int(base * price_factor)
+        
+        shocks = modifiers.get(v_name, {})
+        with market_lock(market_data, v_name):
+            for i_name, i_info in v_data.items():
+                if i_name in curves:
+                    # ✅ 재고량으로 가격 결정 (Setting_Data의 가격 곡선, 구간 이분 탐색) × 시장 충격 배율
+                    price = curves[i_name].price(i_info['stock'])
+                    if i_name in shocks:
+                        price = int(price * shocks[i_name])
+                    i_info['price'] = price
                 
                         
-def get_weight(player, items_info, merc_data):
-    cw = 0
-    for item, qty in player['inv'].items():
-        if item in items_info:
-            cw += qty * items_info[item]['w']
-    
-    tw = 200
-    for merc in player['mercs']:
-        if merc in merc_data:
-            tw += merc_data[merc]['w_bonus']
-    
-    return cw, tw
-
 def calculate_max_purchase(player, items_info, market_data, pos, item_name, target_price):
     if item_name not in items_info:
         return 0
     
-    cw, tw = get_weight(player, items_info, st.session_state.merc_data)
+    cw, tw = carry_weight(player, items_info, st.session_state.merc_data)
     item_weight = items_info[item_name]['w']
     
-    max_by_money = player['money'] // target_price if target_price > 0 else 0
     max_by_weight = (tw - cw) // item_weight if item_weight > 0 else 999999
     max_by_stock = market_data[pos][item_name]['stock']
     
+    curve = item_curve(item_name, items_info, village=pos)
+    if target_price == curve.price(max_by_stock):
+        # 살수록 재고가 줄어 오르는 가격을 구간별로 합산해 소지금으로 살 수 있는 수량
+        max_by_money, _ = curve.affordable(max_by_stock, player['money'], min(max_by_weight, max_by_stock))
+    else:
+        max_by_money = player['money'] // target_price if target_price > 0 else 0
+    
     return min(max_by_money, max_by_weight, max_by_stock)
 
-def process_buy(player, items_info, market_data, pos, item_name, qty, progress_placeholder, log_key):
-    total_bought = 0
-    total_spent = 0
-    batch_size = 100 # 연속 체결 단위
-    
-    st.session_state.trade_logs[log_key] = []
-    
-    try:
-        st.session_state.is_trading = True
-        # ... 기존 코드 ...
-    finally:
-        st.session_state.is_trading = False
-    
-    while total_bought < qty:
-        # 1. 매 루프마다 가격 업데이트 (재고 감소 반영)
-        update_prices(st.session_state.settings, items_info, market_data, st.session_state.initial_stocks)
-        target = market_data[pos][item_name]
-        cw, tw = get_weight(player, items_info, st.session_state.merc_data)
-        
-        # 2. 현재 시점 최대 구매 가능 계산 (돈, 무게, 재고)
-        can_pay = player['money'] // target['price'] if target['price'] > 0 else 0
-        can_load = (tw - cw) // items_info[item_name]['w'] if items_info[item_name]['w'] > 0 else 999999
-        
-        # 3. 이번 턴에 체결할 양 (남은양, 100개단위, 재고, 돈, 무게 중 최소값)
-        current_batch = min(batch_size, qty - total_bought, target['stock'], can_pay, can_load)
+def submit_trade(player, items_info, market_data, pos, side, item_name, qty):
+    # 매수/매도를 작업 스레드에 접수 (100개 단위, 가격 구간 경계에서 끊어 구간별 단가로 연속 체결)
+    curve = item_curve(item_name, items_info, village=pos)
+    if side == BUY:
+        batches = buy_batches(player, items_info, st.session_state.merc_data, market_data,
+                              pos, item_name, qty, curve)
+    else:
+        batches = sell_batches(player, market_data, pos, item_name, qty, curve)
+    job = trade_desk().submit(side, pos, item_name, qty, batches)
+    st.session_state.trade_logs[trade_log_key(job)] = []
+    return job
+
+def trade_log_key(job):
+    return f"{job['pos']}_{job['item']}_{job['submitted']}"
+
+def collect_trades():
+    # 작업 스레드의 진행/완료 알림을 로그와 통계에 반영. 반환: 완료된 주문이 있었는지
+    player = st.session_state.player
+    items_info = st.session_state.items_info
+    market_data = st.session_state.market_data
+    finished = False
+    for event in trade_desk().poll():
+        job = event[1]
+        side_text = "구매" if job['side'] == BUY else "판매"
+        if event[0] == PROGRESS:
+            _, _, done, price = event
+            st.session_state.trade_logs.setdefault(trade_log_key(job), []).append(
+                f"➤ {done}/{job['qty']} {side_text} 중... (체결가: {price}냥)")
+            continue
         
-        if current_batch <= 0:
-            break # 더 이상 살 수 없으면 중단
-            
-        # 4. 실제 데이터 반영 (돈 마이너스 방지)
-        cost = current_batch * target['price']
-        player['money'] -= cost
-        total_spent += cost
-        player['inv'][item_name] = player['inv'].get(item_name, 0) + current_batch
-        target['stock'] -= current_batch
-        total_bought += current_batch
+        _, _, done, amount, fills, error = event
+        finished = True
+        if error:
+            st.toast(f"❌ {job['item']} {side_text} 실패: {error}")
+        if done <= 0:
+            if not error:
+                st.toast("❌ 구매 가능한 수량이 없거나 돈/무게가 부족합니다." if job['side'] == BUY
+                         else "❌ 판매할 수 있는 아이템이 없습니다.")
+            continue
         
-        # 5. 실시간 로그 표시
-        log_msg = f"➤ {total_bought}/{qty} 구매 중... (체결가: {target['price']}냥)"
-        st.session_state.trade_logs[log_key].append(log_msg)
+        # 통계/장부 업데이트
+        pnl = record_trade(job['side'], job['item'], done, amount)
+        st.session_state.stats['trade_count'] += 1
+        log_trade_fills(player, job['side'], job['pos'], job['item'], fills, 'manual')
         
-        with progress_placeholder.container():
-            for log in st.session_state.trade_logs[log_key][-5:]:
-                st.markdown(f"<div class='trade-line'>{log}</div>", unsafe_allow_html=True)
+        # ⭐ 결과 메시지를 전역 세션에 저장 (상단 UI에서 출력하기 위함)
+        avg_price = amount // done
+        if job['side'] == BUY:
+            st.session_state.last_trade_result = f"✅ {job['item']} 총 {done}개 매수 완료! (총 {amount:,}냥 | 평균가: {avg_price}냥)"
+        else:
+            st.session_state.last_trade_result = f"✅ {job['item']} 총 {done}개 매도 완료! (수익: {amount:,}냥 | 평균가: {avg_price}냥 | 실현손익: {pnl:+,}냥)"
         
-        time.sleep(0.05) # 체결되는 느낌을 위한 짧은 대기
-
-    # 최종 결과 저장
-    if total_bought > 0:
-        st.session_state.last_trade_result = f"✅ {item_name} 총 {total_bought}개 구매 완료! (총 {total_spent:,}냥)"
+        # 재고가 바뀌어 가격이 움직였으므로 이 칸의 지정가 주문 점검
+        run_limit_orders(player, items_info, market_data, st.session_state.merc_data, [(job['pos'], job['item'])])
+    return finished
+
+# --- 시세표 (표 보기) ---
+def render_market_table(player, items_info, market_data, merc_data, settings):
+    # 모든 품목의 시세/추세/재고/최대 매수를 표 하나로 보여주고, 선택한 품목 하나만 거래 폼으로 거래
+    # (pandas는 표 보기를 켤 때 import)
+    from market_view import market_frame
+    
+    pos = player['pos']
+    cw, tw = carry_weight(player, items_info, merc_data)
+    engine = market_events(market_data)
+    frame = market_frame(market_data[pos], items_info, get_price_book(settings, items_info)[1],
+                         {i: engine.modifier(pos, i) for i in market_data[pos]},
+                         player['money'], tw - cw, player['inv'])
+    
+    f_col1, f_col2 = st.columns([3, 1])
+    query = f_col1.text_input("품목 검색", key="market_filter", placeholder="🔍 품목 검색", label_visibility="collapsed")
+    if f_col2.toggle("살 수 있는 것만", key="market_buyable"):
+        frame = frame[frame['최대 매수'] > 0]
+    if query:
+        frame = frame[frame['품목'].str.contains(query, regex=False)]
+    frame = frame.reset_index(drop=True)
     
-    return total_bought, total_spent
+    event = st.dataframe(
+        frame, use_container_width=True, hide_index=True,
+        on_select="rerun", selection_mode="single-row", key="market_table",
+        column_config={
+            '가격': st.column_config.NumberColumn(format="%d냥"),
+            '기준가 대비': st.column_config.NumberColumn(format="%+d%%"),
+            '재고': st.column_config.NumberColumn(format="%d개"),
+            '보유': st.column_config.NumberColumn(format="%d개"),
+            '무게': st.column_config.NumberColumn(format="%d근"),
+            '최대 매수': st.column_config.NumberColumn(format="⚡ %d개"),
+        }
+    )
+    
+    names = list(frame['품목'])
+    if not names:
+        st.info("조건에 맞는 품목이 없습니다.")
+        return
+    rows = event.selection.rows if event is not None and hasattr(event, 'selection') else []
+    selected = names[rows[0]] if rows and rows[0] < len(names) else names[0]
+    
+    # --- 선택한 품목 거래 폼 ---
+    with st.form("market_trade_form"):
+        t_col1, t_col2, t_col3, t_col4 = st.columns([2, 1, 1, 1])
+        # 표에서 다른 행을 고르면 선택 상자도 그 품목으로 바뀌도록 key에 선택 품목을 넣음
+        item_name = t_col1.selectbox("품목", names, index=names.index(selected),
+                                     key=f"market_trade_item_{selected}", label_visibility="collapsed")
+        qty = t_col2.number_input("수량", min_value=1, value=1, step=1, key="market_trade_qty", label_visibility="collapsed")
+        buy = t_col3.form_submit_button("💰 매수", use_container_width=True)
+        sell = t_col4.form_submit_button("📦 매도", use_container_width=True)
+    
+    if buy or sell:
+        submit_trade(player, items_info, market_data, pos, BUY if buy else SELL, item_name, int(qty))
+        st.rerun()
+
+# --- 마을 간 거리 ---
+@st.cache_data
+def get_village_distances(village_coords):
+    # village_coords: ((마을, x, y), ...) → {출발: {도착: 거리}} (마을 좌표가 같으면 재계산하지 않음)
+    return {
+        a: {b: math.sqrt((ax - bx)**2 + (ay - by)**2) for b, bx, by in village_coords}
+        for a, ax, ay in village_coords
+    }
 
-def process_sell(player, items_info, market_data, pos, item_name, qty, progress_placeholder, log_key):
-    total_sold = 0
-    total_earned = 0
-    batch_size = 100
+def village_distances(villages):
+    key = tuple((v, d['x'], d['y']) for v, d in villages.items())
+    snapshot = current_config_snapshot()
+    if snapshot is not None and snapshot.villages_key == key:
+        # 공유 스냅샷의 거리 행렬을 그대로 사용 (워커마다 다시 계산하지 않음)
+        return snapshot.distances
+    return get_village_distances(key)
+
+# --- 일괄 처분 계획 ---
+def plan_inventory_liquidation(player, items_info, market_data, villages, settings):
+    def segments(v_name, item_name):
+        cell = market_data.get(v_name, {}).get(item_name)
+        if cell is None or item_name not in items_info:
+            return None
+        return item_curve(item_name, items_info, settings, v_name).sell_segments(cell['stock'])
     
-    st.session_state.trade_logs[log_key] = []
+    inv = {i: q for i, q in player['inv'].items() if q > 0 and i in items_info}
+    return plan_liquidation(inv, player['pos'], list(market_data.keys()), village_distances(villages),
+                            settings.get('travel_cost', 15), segments)
+
+# --- 장바구니 일괄 거래 ---
+def process_cart(player, items_info, market_data, merc_data, pos, lines, commit=True):
+    # 장바구니 전체를 한 번에 계산하여 모두 체결 가능할 때만 반영 (매도 먼저 → 확보한 돈/무게로 매수)
+    # 반환: (결과 목록 [(line, 수량, 금액)], 오류 목록). 오류가 있으면 아무것도 바뀌지 않음
+    batch_size = BATCH_SIZE
+    ordered = [l for l in lines if l['side'] == SELL] + [l for l in lines if l['side'] == BUY]
+    errors = []
+    results = []
+    line_fills = []
     
-    while total_sold < qty:
-        update_prices(st.session_state.settings, items_info, market_data, st.session_state.initial_stocks)
-        current_price = market_data[pos][item_name]['price']
-        
-        # 내가 가진 개수와 100개 단위 중 작은 값
-        current_batch = min(batch_size, qty - total_sold, player['inv'].get(item_name, 0))
+    with trade_desk().lock, market_lock(market_data, pos):
+        village = market_data.get(pos, {})
+        cells = {l['item']: dict(village[l['item']]) for l in lines if l['item'] in village}
+        sim = {'money': player['money'], 'inv': dict(player['inv']), 'mercs': player['mercs']}
+        cw, tw = carry_weight(sim, items_info, merc_data)
         
-        if current_batch <= 0:
-            break
+        for line in ordered:
+            item_name = line['item']
+            if item_name not in cells or item_name not in items_info:
+                errors.append(f"{item_name}: 이 마을에서 거래하지 않는 품목")
+                continue
+            cell = cells[item_name]
+            item_weight = items_info[item_name]['w']
+            curve = item_curve(item_name, items_info, village=pos)
+            done = 0
+            amount = 0
+            fills = []
             
-        # 데이터 반영
-        player['money'] += current_batch * current_price
-        player['inv'][item_name] -= current_batch
-        market_data[pos][item_name]['stock'] += current_batch
-        total_sold += current_batch
-        total_earned += current_batch * current_price
-        
-        log_msg = f"➤ {total_sold}/{qty} 판매 중... (체결가: {current_price}냥)"
-        st.session_state.trade_logs[log_key].append(log_msg)
+            # 수동 매수/매도와 같은 체결 규칙 (100개 단위, 가격 구간 경계에서 끊음)
+            while done < line['qty']:
+                want = min(batch_size, line['qty'] - done)
+                if line['side'] == SELL:
+                    n, price = sell_to(cell, min(want, sim['inv'].get(item_name, 0)), curve)
+                else:
+                    capacity = (tw - cw) // item_weight if item_weight > 0 else 999999
+                    n, price = buy_from(cell, want, sim['money'], capacity, curve)
+                if n <= 0:
+                    break
+                sign = 1 if line['side'] == BUY else -1
+                sim['money'] -= sign * n * price
+                sim['inv'][item_name] = sim['inv'].get(item_name, 0) + sign * n
+                cw += sign * n * item_weight
+                done += n
+                amount += n * price
+                fills.append((price, n))
+            
+            if done < line['qty']:
+                if line['side'] == SELL:
+                    reason = "보유 수량 부족"
+                elif cell['stock'] <= 0:
+                    reason = "재고 부족"
+                elif sim['money'] < curve.price(cell['stock']):
+                    reason = "소지금 부족"
+                else:
+                    reason = "무게 초과"
+                side_text = "매도" if line['side'] == SELL else "매수"
+                errors.append(f"{item_name} {side_text} {line['qty']}개 중 {done}개만 가능 ({reason})")
+            results.append((line, done, amount))
+            line_fills.append(fills)
         
-        with progress_placeholder.container():
-            for log in st.session_state.trade_logs[log_key][-5:]:
-                st.markdown(f"<div class='trade-line'>{log}</div>", unsafe_allow_html=True)
+        if errors or not commit:
+            return results, errors
         
-        time.sleep(0.05)
+        # 모두 가능할 때만 시장과 플레이어에 한꺼번에 반영
+        for item_name, cell in cells.items():
+            village[item_name].update(cell)
+        player['money'] = sim['money']
+        player['inv'].clear()
+        player['inv'].update(sim['inv'])
+        record_action('fill', {'village': pos, 'trades': [
+            {'side': line['side'], 'item': line['item'], 'fills': fills}
+            for (line, _, _), fills in zip(results, line_fills) if fills
+        ]})
+    
+    for (line, _, _), fills in zip(results, line_fills):
+        log_trade_fills(player, line['side'], pos, line['item'], fills, 'cart')
+    return results, errors
+
+# --- 공유 시장 ---
+def is_shared_market(settings):
+    # Setting_Data의 shared_market = 1 이면 모든 플레이어가 같은 시장에서 거래
+    return bool(settings) and settings.get('shared_market', 0) >= 1
+
+def build_market_data(villages, items_info):
+    snapshot = current_config_snapshot()
+    revision = get_sheet_cache().revision
+    if snapshot is not None and revision is not None and snapshot.revision == revision:
+        # 공유 스냅샷의 초기 재고/가격표로 바로 만듦 (시트 리비전이 같을 때만)
+        return snapshot.market_template()
+    market_data = {}
+    for v_name, v_data in villages.items():
+        if v_name != "용병 고용소":
+            market_data[v_name] = {}
+            for item_name, stock in v_data['items'].items():
+                market_data[v_name][item_name] = {'stock': stock, 'price': items_info[item_name]['base']}
+    return market_data
 
-    if total_sold > 0:
-        st.session_state.last_trade_result = f"✅ {item_name} 총 {total_sold}개 판매 완료! (총 {total_earned:,}냥)"
+@st.cache_resource
+def get_shared_market():
+    # 프로세스 전체에서 하나뿐인 시장 (마을별 잠금 포함)
+    settings, items_info, _, villages, initial_stocks, _ = load_game_data()
+    if settings is None:
+        raise RuntimeError("게임 데이터를 불러오지 못해 공유 시장을 만들 수 없습니다.")
+    market = SharedMarket(build_market_data(villages, items_info))
+    market.events = MarketEvents()
+    update_prices(settings, items_info, market, initial_stocks)
+    return market
+
+# --- 지정가 주문 체결 ---
+def fill_limit_order(order, player, items_info, cell, merc_data, fills=None):
+    # 가격 구간 단위로 체결 (구간 안에서는 가격이 같으므로 한 번에 계산). fills가 있으면 (단가, 수량)을 추가
+    item_name = order['item']
+    curve = item_curve(item_name, items_info, village=order['village'])
+    item_weight = items_info[item_name]['w']
+    filled = 0
+    amount = 0
+    
+    while order['qty'] > 0:
+        price = curve.price(cell['stock'])
+        lo, hi = curve.tier_range(cell['stock'])
         
-    return total_sold, total_earned
+        if order['side'] == BUY:
+            if price > order['limit'] or price <= 0:
+                break
+            cw, tw = carry_weight(player, items_info, merc_data)
+            can_load = (tw - cw) // item_weight if item_weight > 0 else 999999
+            n = min(order['qty'], cell['stock'] - lo + 1, cell['stock'], player['money'] // price, can_load)
+            if n <= 0:
+                break
+            player['money'] -= n * price
+            player['inv'][item_name] = player['inv'].get(item_name, 0) + n
+            cell['stock'] -= n
+        else:
+            if price < order['limit']:
+                break
+            n = min(order['qty'], hi - cell['stock'], player['inv'].get(item_name, 0))
+            if n <= 0:
+                break
+            player['money'] += n * price
+            player['inv'][item_name] -= n
+            cell['stock'] += n
+        
+        order['qty'] -= n
+        order['filled'] += n
+        filled += n
+        amount += n * price
+        if fills is not None:
+            fills.append((price, n))
+    
+    cell['price'] = curve.price(cell['stock'])
+    return filled, amount
+
+def run_limit_orders(player, items_info, market_data, merc_data, cells=None):
+    # cells: 재고가 바뀐 (마을, 품목) 목록. None이면 주문이 걸린 모든 칸
+    book = st.session_state.limit_orders
+    if not book:
+        return []
+    
+    fills = []
+    for v_name, item_name in (cells if cells is not None else book.active_cells()):
+        cell = market_data.get(v_name, {}).get(item_name)
+        if cell is None or item_name not in items_info:
+            continue
+        
+        # 공유 시장이면 이 마을의 잠금 안에서 가격 확인과 체결을 함께 처리 (체결 창구 잠금 → 마을 잠금 순서)
+        with trade_desk().lock, market_lock(market_data, v_name):
+            cell['price'] = item_curve(item_name, items_info, village=v_name).price(cell['stock'])
+            
+            for side in (BUY, SELL):
+                # 최우선 주문도 조건 밖이면 이 칸은 건너뜀
+                best = book.best_limit(v_name, item_name, side)
+                if best is None or (cell['price'] > best if side == BUY else cell['price'] < best):
+                    continue
+                
+                for order in book.triggered(v_name, item_name, side, cell['price']):
+                    tiers = []
+                    filled, amount = fill_limit_order(order, player, items_info, cell, merc_data, tiers)
+                    if filled > 0:
+                        fills.append((order, filled, amount, tiers))
+                        record_action('fill', {'village': v_name, 'trades': [{'side': side, 'item': item_name, 'fills': tiers}]})
+                    # 가격이 이 주문의 지정가를 넘어가면 뒤쪽(더 불리한) 주문도 체결 불가
+                    if cell['price'] > order['limit'] if side == BUY else cell['price'] < order['limit']:
+                        break
+        book.prune(v_name, item_name)
+    
+    for order, filled, amount, tiers in fills:
+        log_trade_fills(player, order['side'], order['village'], order['item'], tiers, 'limit')
+        side_text = "매수" if order['side'] == BUY else "매도"
+        msg = f"📌 {order['village']} {order['item']} 지정가 {side_text} {filled}개 체결 (총 {amount:,}냥 | 평균가: {amount // filled}냥)"
+        st.session_state.trade_logs[f"{order['village']}_{order['item']}_order_{time.time()}"] = [msg]
+        record_trade(order['side'], order['item'], filled, amount)
+        st.session_state.stats['trade_count'] += 1
+        st.toast(msg)
+    
+    return fills
+
+# --- 거래 기록 ---
+@st.cache_resource
+def get_trade_history():
+    # 분석용 거래 기록 (secrets의 [trade_history]: enabled, dir, batch_rows, flush_sec)
+    conf = get_secret_table("trade_history")
+    if not conf.get("enabled", True):
+        return None
+    root = conf.get("dir") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".trade_history")
+    return TradeHistory(root, batch_rows=int(conf.get("batch_rows", 500)), flush_sec=float(conf.get("flush_sec", 30)))
+
+def log_trade_fills(player, side, village, item_name, fills, source):
+    # 체결가별 (단가, 수량) 목록을 거래 기록 버퍼에 추가
+    history = get_trade_history()
+    if history is not None and fills:
+        history.record(side, village, item_name, fills, player['slot'], st.session_state.device_id,
+                       (player['year'], player['month'], player['week']), source)
+
+def record_trade(side, item_name, qty, amount):
+    # 전체 통계와 품목별 원가/손익 장부를 함께 갱신 (거래 1건당 O(1))
+    stats = st.session_state.stats
+    if side == BUY:
+        stats['total_bought'] += qty
+        stats['total_spent'] += amount
+        st.session_state.ledger.buy(item_name, qty, amount)
+        return 0
+    stats['total_sold'] += qty
+    stats['total_earned'] += amount
+    return st.session_state.ledger.sell(item_name, qty, amount)
+
+# --- 거상 순위 ---
+@st.cache_resource
+def get_leaderboard():
+    # 모든 슬롯의 순자산 순위 (secrets의 [leaderboard]: path, size). 로컬 파일이 있으면 그대로 이어서 사용
+    conf = get_secret_table("leaderboard")
+    board = Leaderboard(conf.get("path") or LEADERBOARD_PATH, size=int(conf.get("size", 10)))
+    board.sync()
+    return board
+
+def rebuild_leaderboard(slots, settings, items_info, initial_stocks):
+    # 로컬 순위 파일이 없을 때(콜드 스타트)만 시트의 슬롯으로 만듦. 시세는 각 마을의 초기 재고 가격
+    _, curves = get_price_book(settings, items_info)
+    entries = []
+    for s in slots:
+        if s.get('load_error'):
+            continue  # 읽지 못한 슬롯은 순위에서 뺌 (다시 읽을 수 있게 되면 저장할 때 들어감)
+        stocks = initial_stocks.get(s['pos'], {})
+        cells = {i: {'price': curves[i].price(stock)} for i, stock in stocks.items() if i in curves}
+        entries.append(slot_entry(s['slot'], net_worth(s['money'], s['inv'], market_price_of(items_info, cells)), s))
+    get_leaderboard().rebuild(entries)
+
+def render_leaderboard(slots, settings, items_info, initial_stocks, from_snapshot):
+    board = get_leaderboard()
+    board.sync()  # 다른 워커가 저장한 슬롯 반영
+    if not board.ready and slots and not from_snapshot:
+        rebuild_leaderboard(slots, settings, items_info, initial_stocks)
+    ranking = board.ranking()
+    if ranking:
+        st.subheader("🏆 거상 순위")
+        medals = ["🥇", "🥈", "🥉"]
+        st.markdown("  \n".join(
+            f"{medals[n] if n < 3 else f'{n + 1}.'} **슬롯 {e['slot']}** · {e['worth']:,}냥 "
+            f"(💰 {e['money']:,} · 📍 {e['pos']} · {e['year']}년 {e['month']}월)"
+            for n, e in enumerate(ranking)))
 
 def save_player_data(doc, player, stats, device_id):
+    # 접수된 매수/매도까지 끝난 상태를 저장
+    trade_desk().wait()
+    # 저장은 설정 새로고침보다 먼저 쿼터를 배정받음
+    with sheets_priority(PRIORITY_SAVE):
+        saved = _write_player_data(doc, player, stats, device_id)
+    if saved:
+        get_sheet_cache().expire()  # 바뀐 슬롯 정보를 다음 로드에서 바로 반영
+    return saved
+
+def _write_player_data(doc, player, stats, device_id):
     try:
-        play_ws = doc.worksheet("Player_Data")
-        all_records = play_ws.get_all_records()
-        
-        row_idx = None
-        for i, record in enumerate(all_records, start=2):
-            if record.get('slot') == player['slot']:
-                row_idx = i
-                break
-        
-        if row_idx:
-            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            save_values = [
-                player['slot'],
-                player['money'],
-                player['pos'],
-                json.dumps(player['mercs'], ensure_ascii=False),
-                json.dumps(player['inv'], ensure_ascii=False),
-                now,
-                player['week'],
-                player['month'],
-                player['year'],
-                device_id
-            ]
-            play_ws.update(f'A{row_idx}:J{row_idx}', [save_values])
-            return True
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # 명령 API와 같은 저장 (저장되면 이 슬롯의 거상 순위도 갱신)
+        return save_player(doc.worksheet("Player_Data"), player, device_id, now,
+                           st.session_state.get('settings') or {}, st.session_state.get('items_info') or {},
+                           st.session_state.get('market_data') or {}, get_leaderboard())
     except Exception as e:
         st.error(f"❌ 저장 실패: {e}")
         return False
@@ -573,7 +952,8 @@ def save_player_data(doc, player, stats, device_id):
             initial_stocks = st.session_state.initial_stocks
         
 # --- 7. 메인 실행 ---
-doc = connect_gsheet()
+doc = connect_gsheet()  # 인증은 백그라운드에서 진행되므로 첫 화면을 막지 않음
+track_session()
 init_session_state()
 
 # ⭐ 1. 자동 새로고침 (반드시 코드 최상단에 위치)
@@ -587,23 +967,35 @@ if doc:
         st.title("🏯 조선거상 미니")
         st.markdown("---")
         
-        # 데이터 로드
-        settings, items_info, merc_data, villages, initial_stocks, slots = load_game_data()        
+        # 데이터 로드 (시트 연결 전이면 로컬 사본)
+        (settings, items_info, merc_data, villages, initial_stocks, slots), from_snapshot = load_title_data()
+        if from_snapshot:
+            st.caption("☁️ 시트 연결 중... 마지막으로 불러온 정보를 표시합니다.")
         
         if slots:
             st.subheader("📋 세이브 슬롯 선택")
             cols = st.columns(3)
             for i, s in enumerate(slots[:3]):
                 with cols[i]:
-                    st.info(f"**슬롯 {s['slot']}**\n\n📍 {s['pos']}\n💰 {s['money']:,}냥\n📅 {s['year']}년 {s['month']}월")
+                    if s.get('load_error'):
+                        st.error(f"**슬롯 {s['slot']}**\n\n⚠️ 세이브를 읽지 못했습니다: {s['load_error']}")
+                    else:
+                        st.info(f"**슬롯 {s['slot']}**\n\n📍 {s['pos']}\n💰 {s['money']:,}냥\n📅 {s['year']}년 {s['month']}월")
             
             slot_choice = st.selectbox("슬롯 번호", options=[1, 2, 3], index=0)
             
             if st.button("🎮 게임 시작", use_container_width=True):
-                selected = next((s for s in slots if s['slot'] == slot_choice), None)
-                if selected:
+                if from_snapshot:
+                    # 사본의 슬롯은 오래됐을 수 있으므로 시트에서 다시 읽음
+                    settings, items_info, merc_data, villages, initial_stocks, slots = load_game_data()
+                selected = next((s for s in slots or [] if s['slot'] == slot_choice), None)
+                if selected and selected.get('load_error'):
+                    # 빈 인벤토리로 시작해 저장하면 시트의 원래 세이브를 덮어쓰므로 시작하지 않음
+                    st.error(f"❌ 슬롯 {slot_choice}의 세이브를 읽지 못해 시작할 수 없습니다: {selected['load_error']}")
+                elif selected:
                     # ✅ 모든 중요 데이터를 세션에 저장 (NameError 방지 핵심)
-                    st.session_state.player = selected
+                    player, items_info, merc_data, villages = bind_catalog(selected, items_info, merc_data, villages)
+                    st.session_state.player = player
                     st.session_state.settings = settings
                     st.session_state.items_info = items_info
                     st.session_state.merc_data = merc_data
@@ -611,17 +1003,26 @@ if doc:
                     st.session_state.initial_stocks = initial_stocks
                     st.session_state.last_time_update = time.time()
                     st.session_state.trade_logs = {}
+                    # 세이브에는 취득 원가가 없으므로 기존 보유분은 기준가로 시작
+                    st.session_state.ledger = Ledger.opening(player['inv'], lambda i: items_info[i]['base'] if i in items_info else 0)
                     
-                    market_data = {}
-                    for v_name, v_data in villages.items():
-                        if v_name != "용병 고용소":
-                            market_data[v_name] = {}
-                            for item_name, stock in v_data['items'].items():
-                                market_data[v_name][item_name] = {'stock': stock, 'price': items_info[item_name]['base']}
+                    stop_recording()
+                    if is_shared_market(settings):
+                        # 🌐 공유 시장 모드: 모든 플레이어가 같은 시장 인스턴스를 사용
+                        market_data = get_shared_market()
+                    else:
+                        market_data = build_market_data(villages, items_info)
+                        # 녹화한 세션을 그대로 재생할 수 있도록 시장 충격 시드를 정해 둠
+                        seed = int.from_bytes(os.urandom(4), 'big')
+                        st.session_state.market_events = MarketEvents(seed)
+                        start_recording(player, market_data, st.session_state.market_events, seed)
                     
                     st.session_state.market_data = market_data
                     st.session_state.game_started = True
                     st.rerun()
+        
+        if settings is not None:
+            render_leaderboard(slots, settings, items_info, initial_stocks, from_snapshot)
     
     else:
         # 🎮 2. 게임 시작 후 데이터 불러오기
@@ -639,7 +1040,7 @@ if doc:
 
         # ⚖️ 4. 가격 및 무게 업데이트
         update_prices(settings, items_info, market_data, initial_stocks)
-        cw, tw = get_weight(player, items_info, merc_data)
+        cw, tw = carry_weight(player, items_info, merc_data)
 
         # 📢 5. 상단 알림 메시지 (5초 노출 로직)
         if 'event_display' in st.session_state:
@@ -665,14 +1066,8 @@ if doc:
         # ⭐ 시간 전용 프래그먼트 (새로고침 없이 내부 데이터만 갱신)
         @st.fragment(run_every="1s")
         def sync_time_ui():
-            # 거래 중이면 시간 업데이트 건너뛰기
-            if st.session_state.get('is_trading', False):
-                t_col1, t_col2 = st.columns(2)
-                t_col1.metric("📅 시간", get_time_display(st.session_state.player))
-                t_col2.metric("⏰ 다음 주까지", "거래중...")
-                return
-            
-            # 정상적인 시간 업데이트...
+            track_fragment()
+            # 체결 중이어도 시간은 흐름 (상태 변경은 체결 창구 잠금으로 체결 단위와 겹치지 않음)
             st.session_state.player, _ = update_game_time(
                 st.session_state.player, 
                 st.session_state.settings, 
@@ -693,6 +1088,21 @@ if doc:
 
         sync_time_ui()
 
+        # ⭐ 체결 프래그먼트: 작업 스레드의 진행 상황을 받아 그림 (진행 중인 주문이 있을 때만 주기적으로 실행)
+        @st.fragment(run_every=0.3 if trade_desk().busy() else None)
+        def trade_progress_ui():
+            track_fragment()
+            if collect_trades():
+                # 소지금/무게/재고와 결과 메시지를 한꺼번에 갱신
+                st.rerun()
+            for job in trade_desk().open_jobs():
+                side_text = "매수" if job['side'] == BUY else "매도"
+                logs = st.session_state.trade_logs.get(trade_log_key(job)) or ["➤ 체결 대기 중..."]
+                st.markdown(f"<div class='trade-line'>⏳ {job['pos']} {job['item']} {side_text} {job['qty']}개 · {logs[-1]}</div>",
+                            unsafe_allow_html=True)
+
+        trade_progress_ui()
+
        # --- 7. 탭 메뉴 구성 ---
         # 세션에 tab_key가 없으면 0으로 초기화 (에러 방지)
         if 'tab_key' not in st.session_state:
@@ -706,7 +1116,7 @@ if doc:
             
         
         with tab1:
-            if player['pos'] == "용병 고용소":
+            if player['pos'] == MERC_CAMP:
                 st.subheader("⚔️ 용병 고용")
                 if merc_data:
                     # settings에서 최대 용병 수 가져오기
@@ -717,7 +1127,7 @@ if doc:
                     
                     for name, data in merc_data.items():
                         # 같은 이름의 용병이 몇 명 있는지 확인
-                        count = sum(1 for m in player['mercs'] if m == name)
+                        count = player['mercs'].count(name)
                         
                         with st.container():
                             st.info(f"**{name}** (고용중: {count}명)\n\n"
@@ -729,16 +1139,15 @@ if doc:
                                 st.button(f"❌ 최대 인원({max_mercs}명)", key=f"merc_{name}_full", disabled=True, use_container_width=True)
                             else:
                                 if st.button(f"⚔️ {name} 고용", key=f"merc_{name}_{count}", use_container_width=True):
-                                    if player['money'] >= data['price']:
-                                        player['money'] -= data['price']
-                                        player['mercs'].append(name)
-                                        cw, tw = get_weight(player, items_info, merc_data)
-                                        weight_placeholder.metric("⚖️ 무게", f"{cw}/{tw}근")
-                                        money_placeholder.metric("💰 소지금", f"{player['money']:,}냥")
+                                    try:
+                                        trade_desk().wait()  # 접수된 매수/매도가 끝난 뒤 고용
+                                        hire(player, merc_data, settings, name)
+                                        record_action('hire', name)
+                                    except ValueError as e:
+                                        st.error(f"❌ {e}")
+                                    else:
                                         st.success(f"✅ {name} 고용 완료! (총 {len(player['mercs'])}/{max_mercs}명)")
                                         st.rerun()
-                                    else:
-                                        st.error("❌ 잔액 부족")
                 else:
                     st.warning("고용 가능한 용병이 없습니다.")
             
@@ -747,139 +1156,209 @@ if doc:
                 items = list(market_data[player['pos']].keys())
                 if items:
                     st.subheader(f"🛒 {player['pos']} 시세")
+                    # 품목이 많으면 표 하나로 보여주는 간단 보기 (품목마다 위젯을 그리지 않음)
+                    compact = st.toggle("📋 표로 보기", key="market_compact",
+                                        value=len(items) >= int(settings.get('compact_market_items', 15)))
                     
-                    for item_name in items:
-                        d = market_data[player['pos']][item_name]
-                        base_price = items_info[item_name]['base']
+                    if compact:
+                        render_market_table(player, items_info, market_data, merc_data, settings)
+                    else:
+                        for item_name in items:
+                            d = market_data[player['pos']][item_name]
+                            base_price = items_info[item_name]['base']
                         
-                        if d['price'] > base_price * 1.2:
-                            price_class = "price-up"
-                            trend = "▲▲"
-                        elif d['price'] > base_price:
-                            price_class = "price-up"
-                            trend = "▲"
-                        elif d['price'] < base_price * 0.8:
-                            price_class = "price-down"
-                            trend = "▼▼"
-                        elif d['price'] < base_price:
-                            price_class = "price-down"
-                            trend = "▼"
-                        else:
-                            price_class = "price-same"
-                            trend = "■"
+                            if d['price'] > base_price * 1.2:
+                                price_class = "price-up"
+                                trend = "▲▲"
+                            elif d['price'] > base_price:
+                                price_class = "price-up"
+                                trend = "▲"
+                            elif d['price'] < base_price * 0.8:
+                                price_class = "price-down"
+                                trend = "▼▼"
+                            elif d['price'] < base_price:
+                                price_class = "price-down"
+                                trend = "▼"
+                            else:
+                                price_class = "price-same"
+                                trend = "■"
+                            if market_events(market_data).modifier(player['pos'], item_name) != 1.0:
+                                trend += " ⚡"   # 시장 충격 진행 중
                         
-                        with st.container():
-                            st.markdown(f"**{item_name}** {trend}")
+                            with st.container():
+                                st.markdown(f"**{item_name}** {trend}")
                             
-                            # 저장된 결과 로그 표시
-                            result_key = f"result_{player['pos']}_{item_name}"
-                            if result_key in st.session_state:
-                                st.markdown(f"<div class='trade-complete'>{st.session_state[result_key]}</div>", unsafe_allow_html=True)
+                                # 저장된 결과 로그 표시
+                                result_key = f"result_{player['pos']}_{item_name}"
+                                if result_key in st.session_state:
+                                    st.markdown(f"<div class='trade-complete'>{st.session_state[result_key]}</div>", unsafe_allow_html=True)
                             
-                            col1, col2, col3 = st.columns([2,1,1])
-                            price_ph = col1.empty()
-                            price_ph.markdown(f"<span class='{price_class}'>{d['price']:,}냥</span>", unsafe_allow_html=True)
+                                col1, col2, col3 = st.columns([2,1,1])
+                                price_ph = col1.empty()
+                                price_ph.markdown(f"<span class='{price_class}'>{d['price']:,}냥</span>", unsafe_allow_html=True)
                             
-                            stock_ph = col2.empty()
-                            stock_ph.write(f"📦 {d['stock']}개")
+                                stock_ph = col2.empty()
+                                stock_ph.write(f"📦 {d['stock']}개")
                             
-                            max_buy = calculate_max_purchase(
-                                player, items_info, market_data, 
-                                player['pos'], item_name, d['price']
-                            )
-                            max_ph = col3.empty()
-                            max_ph.write(f"⚡ {max_buy}개")
+                                max_buy = calculate_max_purchase(
+                                    player, items_info, market_data, 
+                                    player['pos'], item_name, d['price']
+                                )
+                                max_ph = col3.empty()
+                                max_ph.write(f"⚡ {max_buy}개")
                             
-                            col_a, col_b, col_c = st.columns([2,1,1])
+                                col_a, col_b, col_c = st.columns([2,1,1])
                             
-                            default_qty = st.session_state.last_qty.get(f"{player['pos']}_{item_name}", "1")
-                            qty = col_a.text_input("수량", value=default_qty, key=f"qty_{player['pos']}_{item_name}", label_visibility="collapsed")
+                                default_qty = st.session_state.last_qty.get(f"{player['pos']}_{item_name}", "1")
+                                qty = col_a.text_input("수량", value=default_qty, key=f"qty_{player['pos']}_{item_name}", label_visibility="collapsed")
                             
-                            # 진행상황 표시 영역
-                            progress_ph = st.empty()
+                                # 진행상황 표시 영역
+                                progress_ph = st.empty()
                             
-                            # 저장된 로그가 있으면 표시
-                            for key in list(st.session_state.trade_logs.keys()):
-                                if key.startswith(f"{player['pos']}_{item_name}"):
-                                    with progress_ph.container():
-                                        st.markdown("<div class='trade-progress'>", unsafe_allow_html=True)
-                                        for log in st.session_state.trade_logs[key][-10:]:
-                                            st.markdown(f"<div class='trade-line'>{log}</div>", unsafe_allow_html=True)
-                                        st.markdown("</div>", unsafe_allow_html=True)
-                                    break
+                                # 저장된 로그가 있으면 표시
+                                for key in list(st.session_state.trade_logs.keys()):
+                                    if key.startswith(f"{player['pos']}_{item_name}"):
+                                        with progress_ph.container():
+                                            st.markdown("<div class='trade-progress'>", unsafe_allow_html=True)
+                                            for log in st.session_state.trade_logs[key][-10:]:
+                                                st.markdown(f"<div class='trade-line'>{log}</div>", unsafe_allow_html=True)
+                                            st.markdown("</div>", unsafe_allow_html=True)
+                                        break
                             
-                            # --- 💰 매수 버튼 로직 ---
-                            if col_b.button("💰 매수", key=f"buy_{item_name}", use_container_width=True):
-                                try:
-                                    qty_int = int(qty)
-                                    if qty_int > 0:
-                                        # 1. 100개씩 끊어서 살 수 있는 로직(process_buy) 호출
-                                        # 실제 최대 가능 수량은 함수 내부에서 다시 정밀하게 계산하므로 qty_int를 그대로 넘깁니다.
-                                        log_key = f"{player['pos']}_{item_name}_{time.time()}"
-                                        
-                                        bought, spent = process_buy(
-                                            player, items_info, market_data,
-                                            player['pos'], item_name, qty_int, progress_ph, log_key
-                                        )
+                                # --- 💰 매수 버튼 로직 ---
+                                if col_b.button("💰 매수", key=f"buy_{item_name}", use_container_width=True):
+                                    try:
+                                        qty_int = int(qty)
+                                        if qty_int > 0:
+                                            # 1. 100개씩 끊어서 사는 주문을 작업 스레드에 접수 (화면은 멈추지 않음)
+                                            # 실제 최대 가능 수량은 체결하면서 다시 정밀하게 계산하므로 qty_int를 그대로 넘깁니다.
+                                            submit_trade(player, items_info, market_data, player['pos'], BUY, item_name, qty_int)
                                         
-                                        if bought > 0:
-                                            # 통계 업데이트
-                                            st.session_state.stats['total_bought'] += bought
-                                            st.session_state.stats['total_spent'] += spent
-                                            st.session_state.stats['trade_count'] += 1
-                                            
-                                            # ⭐ 핵심: 결과 메시지를 전역 세션에 저장 (상단 UI에서 출력하기 위함)
-                                            avg_price = spent // bought
-                                            st.session_state.last_trade_result = f"✅ {item_name} 총 {bought}개 매수 완료! (총 {spent:,}냥 | 평균가: {avg_price}냥)"
-                                            
                                             # 입력을 '1'로 초기화 (선택 사항)
                                             st.session_state.last_qty[f"{player['pos']}_{item_name}"] = "1"
-                                            
-                                            # 화면 전체를 갱신하여 상단 소지금/무게/로그를 한꺼번에 업데이트
+                                        
+                                            # 진행 상황은 체결 프래그먼트가 보여주고, 끝나면 화면 전체를 갱신합니다.
                                             st.rerun()
                                         else:
-                                            st.error("❌ 구매 가능한 수량이 없거나 돈/무게가 부족합니다.")
-                                    else:
-                                        st.error("❌ 0보다 큰 수량을 입력하세요")
-                                except ValueError:
-                                    st.error("❌ 올바른 숫자를 입력하세요")
-
-                            # --- 📦 매도 버튼 로직 ---
-                            if col_c.button("📦 매도", key=f"sell_{item_name}", use_container_width=True):
-                                try:
-                                    qty_int = int(qty)
-                                    if qty_int > 0:
-                                        log_key = f"{player['pos']}_{item_name}_{time.time()}"
+                                            st.error("❌ 0보다 큰 수량을 입력하세요")
+                                    except ValueError:
+                                        st.error("❌ 올바른 숫자를 입력하세요")
+
+                                # --- 📦 매도 버튼 로직 ---
+                                if col_c.button("📦 매도", key=f"sell_{item_name}", use_container_width=True):
+                                    try:
+                                        qty_int = int(qty)
+                                        if qty_int > 0:
+                                            # 1. 100개씩 연속 체결하는 주문을 작업 스레드에 접수
+                                            submit_trade(player, items_info, market_data, player['pos'], SELL, item_name, qty_int)
                                         
-                                        # 1. 100개씩 연속 체결하는 함수 호출
-                                        sold, earned = process_sell(
-                                            player, items_info, market_data,
-                                            player['pos'], item_name, qty_int, progress_ph, log_key
-                                        )
-                                        
-                                        if sold > 0:
-                                            # 통계 업데이트 (기존 코드 유지)
-                                            st.session_state.stats['total_sold'] += sold
-                                            st.session_state.stats['total_earned'] += earned
-                                            st.session_state.stats['trade_count'] += 1
-                                            
-                                            # ⭐ [중요] 매수와 똑같은 변수명을 사용하여 결과를 저장합니다.
-                                            avg_price = earned // sold
-                                            st.session_state.last_trade_result = f"✅ {item_name} 총 {sold}개 매도 완료! (수익: {earned:,}냥 | 평균가: {avg_price}냥)"
-                                            
                                             # 입력값 초기화
                                             st.session_state.last_qty[f"{player['pos']}_{item_name}"] = "1"
-                                            
-                                            # ⭐ [중요] 화면을 새로고침해야 상단 UI에 결과가 뜹니다.
-                                            st.rerun() 
+                                            st.rerun()
                                         else:
-                                            st.error("❌ 판매할 수 있는 아이템이 없습니다.")
-                                    else:
-                                        st.error("❌ 0보다 큰 수량을 입력하세요")
-                                except ValueError:
-                                    st.error("❌ 올바른 숫자를 입력하세요")
+                                            st.error("❌ 0보다 큰 수량을 입력하세요")
+                                    except ValueError:
+                                        st.error("❌ 올바른 숫자를 입력하세요")
                             
-                            st.divider()
+                                st.divider()
+                    
+                    # --- 🧺 장바구니 ---
+                    cart = st.session_state.trade_cart
+                    if cart['pos'] != player['pos']:
+                        cart['pos'] = player['pos']
+                        cart['lines'] = []
+                    
+                    with st.expander(f"🧺 장바구니 ({len(cart['lines'])}건)"):
+                        k_col1, k_col2, k_col3, k_col4 = st.columns([2, 1, 1, 1])
+                        cart_item = k_col1.selectbox("품목", items, key="cart_item")
+                        cart_side = k_col2.selectbox("구분", ["매도", "매수"], key="cart_side")
+                        cart_qty = k_col3.number_input("수량", min_value=1, value=1, key="cart_qty")
+                        if k_col4.button("➕ 담기", key="cart_add", use_container_width=True):
+                            side = SELL if cart_side == "매도" else BUY
+                            for line in cart['lines']:
+                                if line['item'] == cart_item and line['side'] == side:
+                                    line['qty'] += int(cart_qty)
+                                    break
+                            else:
+                                cart['lines'].append({'side': side, 'item': cart_item, 'qty': int(cart_qty)})
+                        
+                        if cart['lines']:
+                            preview, cart_errors = process_cart(player, items_info, market_data, merc_data,
+                                                                player['pos'], cart['lines'], commit=False)
+                            for idx, (line, done, amount) in enumerate(preview):
+                                l_col1, l_col2 = st.columns([4, 1])
+                                side_text = "매도" if line['side'] == SELL else "매수"
+                                l_col1.write(f"• {side_text} **{line['item']}** {line['qty']}개 (예상 {amount:,}냥)")
+                                if l_col2.button("빼기", key=f"cart_del_{line['side']}_{line['item']}", use_container_width=True):
+                                    cart['lines'].remove(line)
+                                    st.rerun()
+                            
+                            net = sum(a if l['side'] == SELL else -a for l, _, a in preview)
+                            st.caption(f"예상 소지금 변화: {net:+,}냥")
+                            for err in cart_errors:
+                                st.error(f"❌ {err}")
+                            
+                            if st.button("✅ 일괄 체결", key="cart_execute", use_container_width=True, disabled=bool(cart_errors)):
+                                results, cart_errors = process_cart(player, items_info, market_data, merc_data,
+                                                                    player['pos'], cart['lines'])
+                                if cart_errors:
+                                    for err in cart_errors:
+                                        st.error(f"❌ {err}")
+                                else:
+                                    summary = []
+                                    log_key = f"{player['pos']}_cart_{time.time()}"
+                                    st.session_state.trade_logs[log_key] = []
+                                    for line, done, amount in results:
+                                        side_text = "매도" if line['side'] == SELL else "매수"
+                                        record_trade(line['side'], line['item'], done, amount)
+                                        st.session_state.trade_logs[log_key].append(
+                                            f"➤ {line['item']} {done}개 {side_text} (평균가: {amount // done}냥)")
+                                        summary.append(f"{line['item']} {side_text} {done}개")
+                                    st.session_state.stats['trade_count'] += 1
+                                    
+                                    net = sum(a if l['side'] == SELL else -a for l, _, a in results)
+                                    st.session_state.last_trade_result = f"✅ 일괄 체결 완료! {', '.join(summary)} (소지금 {net:+,}냥)"
+                                    cart['lines'] = []
+                                    run_limit_orders(player, items_info, market_data, merc_data,
+                                                     [(player['pos'], line['item']) for line, _, _ in results])
+                                    st.rerun()
+                    
+                    # --- 📌 지정가 주문 ---
+                    with st.expander(f"📌 지정가 주문 ({len(st.session_state.limit_orders)}건 대기)"):
+                        with st.form("limit_order_form", clear_on_submit=True):
+                            o_col1, o_col2 = st.columns(2)
+                            order_village = o_col1.selectbox("마을", list(market_data.keys()),
+                                                             index=list(market_data.keys()).index(player['pos']))
+                            order_item = o_col2.selectbox("품목", list(items_info.keys()))
+                            o_col3, o_col4, o_col5 = st.columns(3)
+                            order_side = o_col3.radio("구분", ["매수", "매도"], horizontal=True)
+                            order_limit = o_col4.number_input("지정가(냥)", min_value=1, value=100)
+                            order_qty = o_col5.number_input("수량", min_value=1, value=100)
+                            if st.form_submit_button("📌 주문 등록", use_container_width=True):
+                                if order_item not in market_data[order_village]:
+                                    st.error(f"❌ {order_village}에서는 {order_item}을(를) 거래하지 않습니다.")
+                                else:
+                                    try:
+                                        st.session_state.limit_orders.add(
+                                            order_village, order_item,
+                                            BUY if order_side == "매수" else SELL,
+                                            order_limit, order_qty
+                                        )
+                                        # 등록 즉시 현재가로 한 번 점검
+                                        run_limit_orders(player, items_info, market_data, merc_data, [(order_village, order_item)])
+                                        st.rerun()
+                                    except ValueError as e:
+                                        st.error(f"❌ {e}")
+                        
+                        for order in st.session_state.limit_orders.orders():
+                            side_text = "매수" if order['side'] == BUY else "매도"
+                            mark = "≤" if order['side'] == BUY else "≥"
+                            c1, c2 = st.columns([4, 1])
+                            c1.write(f"• {order['village']} **{order['item']}** {side_text} "
+                                     f"{order['qty']}개 (가격 {mark} {order['limit']:,}냥, 체결 {order['filled']}개)")
+                            if c2.button("취소", key=f"cancel_order_{order['id']}", use_container_width=True):
+                                st.session_state.limit_orders.cancel(order['id'])
+                                st.rerun()
                 else:
                     st.warning("이 마을에는 판매 품목이 없습니다.")
             else:
@@ -888,25 +1367,61 @@ if doc:
         with tab2:
             st.subheader("📦 내 인벤토리")
             if player['inv']:
+                ledger = st.session_state.ledger
+                here = market_data.get(player['pos'], {})
                 total_value = 0
                 total_weight = 0
                 
                 for item, qty in sorted(player['inv'].items()):
                     if qty > 0 and item in items_info:
-                        item_value = items_info[item]['base'] * qty
+                        # 현재 마을 시세로 평가 (이 마을에서 거래하지 않는 품목은 기준가)
+                        price = here[item]['price'] if item in here else items_info[item]['base']
+                        item_value = price * qty
                         item_weight = items_info[item]['w'] * qty
                         total_value += item_value
                         total_weight += item_weight
+                        pnl = ledger.unrealised(item, price)
                         
-                        col1, col2, col3 = st.columns([2,1,1])
+                        col1, col2, col3, col4 = st.columns([2,1,1,2])
                         col1.write(f"• **{item}**")
                         col2.write(f"{qty}개")
                         col3.write(f"{item_weight}근")
+                        col4.write(f"평균 {ledger.avg_cost(item):,.0f}냥 · {'🟢' if pnl >= 0 else '🔴'} {pnl:+,}냥")
                 
                 st.divider()
                 col1, col2 = st.columns(2)
-                col1.info(f"💰 총 가치: {total_value:,}냥")
+                col1.info(f"💰 총 가치: {total_value:,}냥 ({player['pos']} 시세)")
                 col2.info(f"⚖️ 총 무게: {total_weight}/{tw}근")
+                st.caption(f"취득 원가 {ledger.cost_total:,}냥 · 평가손익 {total_value - ledger.cost_total:+,}냥")
+                
+                # --- 💹 일괄 처분 계획 ---
+                with st.expander("💹 일괄 처분 계획"):
+                    st.caption("재고 구간별 가격과 이동비를 고려해 여러 마을에 나눠 팔 때의 예상 수익입니다.")
+                    if st.toggle("계획 계산", key="show_liquidation"):
+                        plan = plan_inventory_liquidation(player, items_info, market_data, villages, settings)
+                        if plan['route']:
+                            st.write("**🗺️ 경로:** " + " → ".join([player['pos']] + plan['route']))
+                        for v_name in [player['pos']] + plan['route']:
+                            if v_name not in plan['plan']:
+                                continue
+                            st.write(f"**{v_name}**")
+                            for item, (qty, amount) in sorted(plan['plan'][v_name].items()):
+                                st.write(f"• {item} {qty}개 → {amount:,}냥 (평균 {amount // qty}냥)")
+                        
+                        p_col1, p_col2, p_col3 = st.columns(3)
+                        p_col1.metric("예상 매출", f"{plan['revenue']:,}냥")
+                        p_col2.metric("이동비", f"{plan['travel_cost']:,}냥")
+                        p_col3.metric("순수익", f"{plan['net']:,}냥", delta=f"{plan['net'] - plan['local_net']:+,}냥 (여기서 전부 매도 대비)")
+                        if plan['unsold']:
+                            st.warning("팔 곳이 없는 품목: " + ", ".join(f"{i} {q}개" for i, q in plan['unsold'].items()))
+                        
+                        here = plan['plan'].get(player['pos'])
+                        if here and st.button("🧺 이 마을 몫을 장바구니에 담기", key="plan_to_cart", use_container_width=True):
+                            cart = st.session_state.trade_cart
+                            cart['pos'] = player['pos']
+                            cart['lines'] = [l for l in cart['lines'] if l['side'] != SELL or l['item'] not in here]
+                            cart['lines'] += [{'side': SELL, 'item': i, 'qty': q} for i, (q, _) in here.items()]
+                            st.rerun()
             else:
                 st.write("인벤토리가 비어있습니다")
         
@@ -918,12 +1433,7 @@ if doc:
                 
                 total_bonus = 0
                 
-                # 용병 목록을 딕셔너리로 변환하여 카운트
-                merc_count = {}
-                for merc in player['mercs']:
-                    merc_count[merc] = merc_count.get(merc, 0) + 1
-                
-                for merc, count in merc_count.items():
+                for merc, count in list(player['mercs'].counts().items()):
                     if merc in merc_data:
                         bonus = merc_data[merc]['w_bonus']
                         refund = int(merc_data[merc]['price'] * fire_refund_rate)
@@ -936,12 +1446,10 @@ if doc:
                         
                         # 해고 버튼
                         if col4.button(f"❌ 해고", key=f"fire_{merc}", use_container_width=True):
-                            # 해당 용병 1명 제거
-                            for i, m in enumerate(player['mercs']):
-                                if m == merc:
-                                    player['mercs'].pop(i)
-                                    player['money'] += refund
-                                    break
+                            # 해당 용병 1명 제거 (접수된 매수/매도가 끝난 뒤)
+                            trade_desk().wait()
+                            fire(player, merc_data, settings, merc)
+                            record_action('fire', merc)
                             st.success(f"✅ {merc} 1명 해고 완료! ({refund:,}냥 환불)")
                             st.rerun()
                 
@@ -969,6 +1477,27 @@ if doc:
                 profit_color = "🔴" if net_profit < 0 else "🟢"
                 st.metric(f"{profit_color} 순이익", f"{net_profit:,}냥")
             
+            # 품목별 손익 (장부에 저장된 합계만 읽음)
+            ledger = st.session_state.ledger
+            here = market_data.get(player['pos'], {})
+            rows = []
+            for item in sorted(set(ledger.positions) | set(ledger.realised)):
+                price = here[item]['price'] if item in here else items_info.get(item, {}).get('base', 0)
+                rows.append({
+                    '품목': item,
+                    '보유': ledger.qty(item),
+                    '평균단가': round(ledger.avg_cost(item)),
+                    f'현재가({player["pos"]})': price,
+                    '평가손익': ledger.unrealised(item, price),
+                    '실현손익': ledger.realised.get(item, 0),
+                })
+            unrealised_total = sum(r['평가손익'] for r in rows)
+            p_col1, p_col2 = st.columns(2)
+            p_col1.metric("✅ 실현손익", f"{ledger.realised_total:+,}냥")
+            p_col2.metric("📈 평가손익", f"{unrealised_total:+,}냥")
+            if rows:
+                st.dataframe(rows, use_container_width=True, hide_index=True)
+            
             st.divider()
             
             # 거래 내역 (최근 거래 로그)
@@ -1000,6 +1529,7 @@ if doc:
                     'total_earned': 0,
                     'trade_count': 0
                 }
+                st.session_state.ledger.reset_realised()
                 st.rerun()
         
         with tab5:
@@ -1012,10 +1542,10 @@ if doc:
                 move_options = []
                 move_dict = {}
                 
+                distances = village_distances(villages)
                 for t in towns:
                     if t != player['pos']:
-                        dist = math.sqrt((curr_v['x'] - villages[t]['x'])**2 + (curr_v['y'] - villages[t]['y'])**2)
-                        cost = int(dist * settings.get('travel_cost', 15))
+                        cost = travel_cost(distances, settings, player['pos'], t)
                         option_text = f"{t} (💰 {cost:,}냥)"
                         move_options.append(option_text)
                         move_dict[option_text] = (t, cost)
@@ -1026,18 +1556,19 @@ if doc:
                     dest, cost = move_dict[selected_text]
                     
                     if st.button("🚀 이동", use_container_width=True):
-                        if player['money'] >= cost:
-                            player['money'] -= cost
-                            player['pos'] = dest
-                            
+                        try:
+                            trade_desk().wait()  # 접수된 매수/매도는 지금 마을에서 마저 체결
+                            move(player, villages, distances, settings, dest)
+                            record_action('move', dest)
+                        except ValueError as e:
+                            st.error(f"❌ {e}")
+                        else:
                             # 거래 로그 삭제 (선택사항)
                             if 'last_trade_result' in st.session_state:
                                 del st.session_state['last_trade_result']
                             
                             st.success(f"✅ {dest}(으)로 이동했습니다!")
                             st.rerun()
-                        else:
-                            st.error("❌ 잔액이 부족합니다.")
                     
                 st.divider()
             
@@ -1047,13 +1578,36 @@ if doc:
             
             st.divider()
             
+            with st.expander("📈 시트 통신 현황"):
+                _, sheets_metrics, _, _ = get_sheets_quota()
+                m = sheets_metrics.snapshot()
+                m_col1, m_col2, m_col3 = st.columns(3)
+                m_col1.metric("요청 (저장/갱신)", f"{m['requests']['save']}/{m['requests']['refresh']}")
+                m_col2.metric("스로틀 대기", f"{m['throttled']['save'] + m['throttled']['refresh']}회 ({m['throttle_wait_sec']}초)")
+                m_col3.metric("재시도", f"{m['retries']}회 (429: {m['quota_errors']})")
+                st.caption(f"재시도 대기 {m['retry_wait_sec']}초 · 최종 실패 {m['failures']}회")
+                c = get_sheet_cache().stats()
+                st.caption(f"시트 리비전 {c['revision']} · 확인 {c['checks']}회 · 다시 받음 {c['reloads']}회 · "
+                           + ", ".join(f"{t} {n}회" for t, n in c['changes'].items()) + " 변경")
+            
+            with st.expander("🧠 세션 메모리 (관리자)"):
+                my_sizes = state_sizes(st.session_state, list(st.session_state.keys()))
+                st.write(f"**이 세션: {sum(my_sizes.values()) / 1024:,.1f}KB**")
+                st.dataframe(
+                    [{'key': k, 'KB': round(v / 1024, 1)} for k, v in sorted(my_sizes.items(), key=lambda kv: -kv[1])],
+                    use_container_width=True, hide_index=True
+                )
+                registry = get_session_registry()
+                st.write(f"**전체 세션: {len(registry.entries)}개** (스냅샷 보관 {registry.evictions}회 · 복원 {registry.rehydrations}회)")
+                st.dataframe(registry.report(), use_container_width=True, hide_index=True)
+            
             if st.button("💾 저장", use_container_width=True):
                 if save_player_data(doc, player, st.session_state.stats, st.session_state.device_id):
                     st.success("✅ 저장 완료!")
             
             if st.button("🚪 메인으로", use_container_width=True):
                 st.session_state.game_started = False
-                st.cache_data.clear()
+                get_sheet_cache().expire()  # 타이틀의 슬롯 정보를 바로 다시 확인
                 st.rerun()
 
 